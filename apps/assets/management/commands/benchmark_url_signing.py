@@ -0,0 +1,77 @@
+import datetime
+import time
+
+from botocore.signers import CloudFrontSigner
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from utils.s3_utils import CloudFrontURLSigner
+
+
+def legacy_rsa_signer(message):
+    # Implementación anterior: parsea el PEM en cada firma
+    private_key = serialization.load_pem_private_key(
+        settings.AWS_CLOUDFRONT_KEY, password=None, backend=default_backend()
+    )
+    return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+
+
+def legacy_signed_url(key, expires_in=60):
+    # Implementación anterior: un CloudFrontSigner nuevo por URL
+    signer = CloudFrontSigner(str(settings.AWS_CLOUDFRONT_KEY_ID), legacy_rsa_signer)
+    expire_date = timezone.now() + datetime.timedelta(seconds=expires_in)
+    return signer.generate_presigned_url(
+        f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}", date_less_than=expire_date
+    )
+
+
+class Command(BaseCommand):
+    help = "Compara el coste por URL firmada de CloudFront antes y después del signer cacheado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--urls", type=int, default=200, help="URLs distintas a firmar.")
+        parser.add_argument("--page-size", type=int, default=100, help="Productos por página en el benchmark por lote.")
+
+    def measure(self, label, sign, keys):
+        started = time.perf_counter()
+        for key in keys:
+            sign(key)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<48} {elapsed / len(keys) * 1e6:10.1f} µs/URL")
+
+    def fresh_signer(self):
+        signer = CloudFrontURLSigner()
+        # Evita que el benchmark lea firmas de otras ejecuciones en redis
+        signer.cache_prefix = f"{signer.cache_prefix}:benchmark:{time.time_ns()}"
+        return signer
+
+    def measure_page(self, label, sign_page, keys):
+        started = time.perf_counter()
+        sign_page(keys)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<48} {elapsed * 1000:10.1f} ms/página")
+
+    def handle(self, *args, **options):
+        keys = [f"media/benchmark/{i}.png" for i in range(options["urls"])]
+        signer = self.fresh_signer()
+
+        self.measure("antes (PEM + signer por URL)", legacy_signed_url, keys)
+        self.measure("después, primera firma (RSA + redis)", signer.sign, keys)
+        self.measure("después, misma ventana (LRU)", signer.sign, keys)
+        self.measure("después, otra petición con expires_in=30 (LRU)", lambda key: signer.sign(key, 30), keys)
+        signer._lru.clear()
+        self.measure("después, otro proceso (redis)", signer.sign, keys)
+
+        # Página de listado sin nada cacheado: una firma por elemento vs. un lote
+        page = [f"media/benchmark/page/{i}.png" for i in range(options["page_size"])]
+        self.stdout.write(f"\nPágina de {len(page)} productos sin caché:")
+        signer = self.fresh_signer()
+        self.measure_page("una firma por elemento", lambda keys: [signer.sign(key) for key in keys], page)
+        signer = self.fresh_signer()
+        self.measure_page("lote secuencial (sign_many)", lambda keys: signer.sign_many(keys, max_workers=1), page)
+        signer = self.fresh_signer()
+        self.measure_page("lote con hilos (sign_many)", lambda keys: signer.sign_many(keys), page)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from utils.s3_utils import url_signer
+
+
+class CloudFrontSignedCookieMiddleware(MiddlewareMixin):
+    """
+    En modo AWS_CLOUDFRONT_DELIVERY = "signed_cookie" entrega (una vez por sesión
+    del navegador) las cookies firmadas de CloudFront que dan acceso a MEDIA_LOCATION.
+    Las cookies caducan en el navegador antes que la política, así se renuevan
+    con la siguiente petición a la API mientras la política anterior sigue vigente.
+    """
+
+    def process_response(self, request, response):
+        if not url_signer.uses_signed_cookies:
+            return response
+        if "CloudFront-Policy" in request.COOKIES:
+            return response
+
+        cookies, expires_at = url_signer.signed_cookies()
+        max_age = max(int(expires_at - time.time() - url_signer.grace / 2), 60)
+        for name, value in cookies.items():
+            response.set_cookie(
+                name,
+                value,
+                max_age=max_age,
+                domain=settings.AWS_CLOUDFRONT_COOKIE_DOMAIN,
+                secure=True,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
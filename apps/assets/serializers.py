@@ -1,31 +1,86 @@
-import datetime
+from collections import defaultdict
 
+from django.db import models
 from rest_framework import serializers
-from botocore.signers import CloudFrontSigner
-from django.conf import settings
-from django.utils import timezone
 
-from utils.s3_utils import rsa_signer
+from utils.s3_utils import get_cloudfront_signed_url, url_signer
 from .models import Media
 
+# Clave del context donde se guardan las URLs firmadas en lote: {(key, expires_in): url}
+SIGNED_URLS_CONTEXT_KEY = "signed_urls"
 
-class MediaSerializer(serializers.ModelSerializer):
+
+def get_expires_in(context):
+    return context.get("expires_in", MediaSerializer.DEFAULT_EXPIRES_IN)
+
+
+def sign_media_keys(context, keys):
+    """
+    Firma en una pasada (ver CloudFrontURLSigner.sign_many) los pares
+    (key, expires_in) que aún no están en el context.
+    """
+    signed = context.setdefault(SIGNED_URLS_CONTEXT_KEY, {})
+    pending = defaultdict(set)
+    for key, expires_in in keys:
+        if key and (key, expires_in) not in signed:
+            pending[expires_in].add(key)
+    for expires_in, batch in pending.items():
+        for key, url in url_signer.sign_many(batch, expires_in).items():
+            signed[(key, expires_in)] = url
+
+
+def get_media_url(context, key, expires_in=None):
+    """
+    URL firmada de `key`: la del lote del context si existe, si no se firma aquí.
+    """
+    if not key:
+        return None
+    if expires_in is None:
+        expires_in = get_expires_in(context)
+    url = context.get(SIGNED_URLS_CONTEXT_KEY, {}).get((key, expires_in))
+    return url if url is not None else get_cloudfront_signed_url(key, expires_in=expires_in)
+
+
+class BatchSignedListSerializer(serializers.ListSerializer):
+    """
+    Antes de serializar la lista recoge las keys de media de todos los elementos
+    (child.get_media_keys) y las firma en lote.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        sign_media_keys(self.context, (key for item in items for key in self.child.get_media_keys(item)))
+        return super().to_representation(items)
+
+
+class BatchSignedMediaMixin:
+    """
+    Para serializers con URLs de media. Implementan get_media_keys(obj), que devuelve
+    los pares (key, expires_in) que van a firmar, y usan get_media_url() para leerlas.
+    Como raíz firman todo en lote antes de serializar; con many=True lo hace
+    Meta.list_serializer_class = BatchSignedListSerializer.
+    """
+
+    def get_media_keys(self, obj):
+        return ()
+
+    def to_representation(self, instance):
+        if self.parent is None:
+            sign_media_keys(self.context, self.get_media_keys(instance))
+        return super().to_representation(instance)
+
+
+class MediaSerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
     DEFAULT_EXPIRES_IN = 60
 
     class Meta:
         model = Media
         fields = "__all__"
+        list_serializer_class = BatchSignedListSerializer
+
+    def get_media_keys(self, obj):
+        return [(obj.key, get_expires_in(self.context))]
 
     def get_url(self, obj):
-        if not obj.key:
-            return None
-        
-        key_id = str(settings.AWS_CLOUDFRONT_KEY_ID)
-        obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{obj.key}"
-
-        cloudfront_signer = CloudFrontSigner(key_id, rsa_signer)
-        expires_in = self.context.get("expires_in", self.DEFAULT_EXPIRES_IN)
-        expire_date = timezone.now() + datetime.timedelta(seconds=expires_in)
-        signed_url = cloudfront_signer.generate_presigned_url(obj_url, date_less_than=expire_date)
-        return signed_url
\ No newline at end of file
+        return get_media_url(self.context, obj.key)
@@ -1,3 +1,190 @@
-from django.test import TestCase
+import base64
+import json
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+
+from utils import s3_utils
+from utils.s3_utils import CloudFrontURLSigner
+from .middleware import CloudFrontSignedCookieMiddleware
+
+# Clave RSA de prueba, generada una vez por proceso
+TEST_PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+TEST_PRIVATE_KEY_PEM = TEST_PRIVATE_KEY.private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption(),
+)
+
+NOW = 1_700_000_000
+
+signer_settings = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    AWS_CLOUDFRONT_KEY=TEST_PRIVATE_KEY_PEM,
+    AWS_CLOUDFRONT_KEY_ID="KTEST",
+    AWS_CLOUDFRONT_DOMAIN="cdn.example.com",
+    AWS_CLOUDFRONT_COOKIE_DOMAIN=".example.com",
+    MEDIA_LOCATION="media",
+)
+
+
+def cloudfront_b64decode(value):
+    return base64.b64decode(value.replace("-", "+").replace("_", "=").replace("~", "/"))
+
+
+@signer_settings
+class CloudFrontURLSignerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        s3_utils.get_cloudfront_private_key.cache_clear()
+        self.addCleanup(s3_utils.get_cloudfront_private_key.cache_clear)
+        self.now = NOW
+        patcher = mock.patch("utils.s3_utils.time.time", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_signer(self, **kwargs):
+        kwargs.setdefault("window", 3600)
+        kwargs.setdefault("grace", 0)
+        return CloudFrontURLSigner(delivery=s3_utils.SIGNED_URL_DELIVERY, **kwargs)
+
+    def test_private_key_is_parsed_once(self):
+        signer = self.make_signer()
+        with mock.patch(
+            "utils.s3_utils.serialization.load_pem_private_key", return_value=TEST_PRIVATE_KEY,
+        ) as load_key:
+            signer.sign("media/a.jpg")
+            signer.sign("media/b.jpg")
+            self.make_signer().sign("media/c.jpg")
+
+        self.assertEqual(load_key.call_count, 1)
+
+    def test_sign_hits_local_lru_then_shared_cache(self):
+        signer = self.make_signer()
+        url = signer.sign("media/a.jpg")
+        query = parse_qs(urlsplit(url).query)
+        self.assertTrue(url.startswith("https://cdn.example.com/media/a.jpg?"))
+        self.assertEqual(query["Key-Pair-Id"], ["KTEST"])
+
+        with mock.patch.object(CloudFrontURLSigner, "_generate") as generate, \
+                mock.patch("utils.s3_utils.cache.get") as cache_get:
+            self.assertEqual(signer.sign("media/a.jpg"), url)
+        generate.assert_not_called()
+        cache_get.assert_not_called()
+
+        # Otro proceso (LRU vacío) reutiliza la URL guardada en la caché compartida
+        with mock.patch.object(CloudFrontURLSigner, "_generate") as generate:
+            self.assertEqual(self.make_signer().sign("media/a.jpg"), url)
+        generate.assert_not_called()
+
+    def test_sign_many_deduplicates_and_only_signs_missing_keys(self):
+        signer = self.make_signer()
+        cached_url = signer.sign("media/a.jpg")
+        other = self.make_signer()
+        already_local = other.sign("media/b.jpg")
+
+        fake_generate = mock.Mock(side_effect=lambda key, expires_at: f"signed:{key}")
+        with mock.patch.object(other, "_generate", fake_generate):
+            urls = other.sign_many(["media/a.jpg", "media/b.jpg", "media/c.jpg", "media/c.jpg", "", None])
+
+        self.assertEqual(urls, {
+            "media/a.jpg": cached_url, "media/b.jpg": already_local, "media/c.jpg": "signed:media/c.jpg",
+        })
+        self.assertEqual([call.args[0] for call in fake_generate.call_args_list], ["media/c.jpg"])
+        # Lo firmado en lote queda memoizado para las firmas individuales
+        self.assertEqual(self.make_signer().sign("media/c.jpg"), "signed:media/c.jpg")
+
+    def test_sign_many_matches_sign_with_a_thread_pool(self):
+        keys = [f"media/{index}.jpg" for index in range(40)]
+        urls = self.make_signer().sign_many(keys, max_workers=4)
+
+        cache.clear()
+        signer = self.make_signer()
+        self.assertEqual(urls, {key: signer.sign(key) for key in keys})
+
+    def test_expiry_rounds_up_to_the_window_end_plus_grace(self):
+        signer = self.make_signer(window=3600, grace=7200)
+        window_start = NOW // 3600 * 3600
+
+        self.now = window_start + 10
+        self.assertEqual(signer.expiry_for(60), window_start + 3600 + 7200)
+        # Un plazo que cruza el final de la ventana pasa a la siguiente
+        self.assertEqual(signer.expiry_for(3600), window_start + 2 * 3600 + 7200)
+
+        url = signer.sign("media/a.jpg", expires_in=60)
+        self.assertEqual(parse_qs(urlsplit(url).query)["Expires"], [str(window_start + 3600 + 7200)])
+
+    def test_same_window_returns_the_same_url(self):
+        window_start = NOW // 3600 * 3600
+        self.now = window_start + 5
+        first = self.make_signer(grace=7200).sign("media/a.jpg")
+
+        cache.clear()
+        self.now = window_start + 3500
+        self.assertEqual(self.make_signer(grace=7200).sign("media/a.jpg"), first)
+
+        self.now = window_start + 3600
+        self.assertNotEqual(self.make_signer(grace=7200).sign("media/a.jpg"), first)
+
+
+@signer_settings
+class CloudFrontSignedCookieMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        s3_utils.get_cloudfront_private_key.cache_clear()
+        self.addCleanup(s3_utils.get_cloudfront_private_key.cache_clear)
+        self.now = NOW // 3600 * 3600 + 600
+        for target in ("utils.s3_utils.time.time", "apps.assets.middleware.time.time"):
+            patcher = mock.patch(target, side_effect=lambda: self.now)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.signer = CloudFrontURLSigner(window=3600, grace=7200, delivery=s3_utils.SIGNED_COOKIE_DELIVERY)
+        patcher = mock.patch("apps.assets.middleware.url_signer", self.signer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = CloudFrontSignedCookieMiddleware(lambda request: HttpResponse())
+
+    def test_sets_a_verifiable_policy_cookie_once(self):
+        response = self.middleware(RequestFactory().get("/api/products/list/"))
+
+        expires_at = NOW // 3600 * 3600 + 3600 + 7200
+        self.assertEqual(
+            set(response.cookies), {"CloudFront-Policy", "CloudFront-Signature", "CloudFront-Key-Pair-Id"},
+        )
+        policy_cookie = response.cookies["CloudFront-Policy"]
+        self.assertEqual(policy_cookie["domain"], ".example.com")
+        self.assertTrue(policy_cookie["secure"])
+        self.assertTrue(policy_cookie["httponly"])
+        # La cookie caduca a mitad del margen de gracia
+        self.assertEqual(policy_cookie["max-age"], expires_at - self.now - 3600)
+
+        policy = cloudfront_b64decode(policy_cookie.value)
+        statement = json.loads(policy)["Statement"][0]
+        self.assertEqual(statement["Resource"], "https://cdn.example.com/media/*")
+        self.assertEqual(statement["Condition"]["DateLessThan"]["AWS:EpochTime"], expires_at)
+        TEST_PRIVATE_KEY.public_key().verify(
+            cloudfront_b64decode(response.cookies["CloudFront-Signature"].value),
+            policy, padding.PKCS1v15(), hashes.SHA1(),
+        )
+        self.assertEqual(response.cookies["CloudFront-Key-Pair-Id"].value, "KTEST")
+
+        request = RequestFactory().get("/api/products/list/")
+        request.COOKIES["CloudFront-Policy"] = policy_cookie.value
+        self.assertEqual(dict(self.middleware(request).cookies), {})
+
+    def test_cookie_mode_returns_plain_urls_and_signs_the_policy_once_per_window(self):
+        self.assertEqual(self.signer.sign("media/a.jpg"), "https://cdn.example.com/media/a.jpg")
+        self.assertEqual(
+            self.signer.sign_many(["media/a.jpg"]), {"media/a.jpg": "https://cdn.example.com/media/a.jpg"},
+        )
+
+        with mock.patch("utils.s3_utils.rsa_signer", wraps=s3_utils.rsa_signer) as rsa_signer:
+            first = self.middleware(RequestFactory().get("/")).cookies["CloudFront-Signature"].value
+            self.now += 60
+            second = self.middleware(RequestFactory().get("/")).cookies["CloudFront-Signature"].value
+        self.assertEqual(first, second)
+        self.assertEqual(rsa_signer.call_count, 1)
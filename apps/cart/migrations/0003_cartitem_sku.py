@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_productvariant'),
+        ('cart', '0002_cart_coupon_alter_cart_shipping_address_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='sku',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.productvariant'),
+        ),
+    ]
@@ -9,7 +9,7 @@ from django_countries.fields import CountryField
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
-from apps.products.models import Size, Weight, Material, Color, Flavor
+from apps.products.models import Size, Weight, Material, Color, Flavor, ProductVariant, VARIANT_OPTION_FIELDS
 from apps.addresses.models import ShippingAddress
 
 
@@ -310,6 +310,9 @@ class CartItem(models.Model):
     material     = models.ForeignKey(Material, on_delete=models.SET_NULL, null=True, blank=True)
     color        = models.ForeignKey(Color, on_delete=models.SET_NULL, null=True, blank=True)
     flavor       = models.ForeignKey(Flavor, on_delete=models.SET_NULL, null=True, blank=True)
+    # SKU de la combinación elegida (si el producto la tiene); se resuelve en save()
+    sku          = models.ForeignKey(ProductVariant, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+')
 
     count        = models.PositiveIntegerField(default=1)
     coupon       = models.ForeignKey(Coupon, null=True, blank=True, on_delete=models.SET_NULL)
@@ -323,6 +326,47 @@ class CartItem(models.Model):
         ]
         indexes = [models.Index(fields=["content_type", "object_id"])]
 
+    # Campos que determinan el SKU del ítem
+    SKU_KEY_FIELDS = ("content_type", "object_id", *VARIANT_OPTION_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_sku_key = instance.sku_key()
+        return instance
+
+    def sku_key(self):
+        """
+        Producto y opciones elegidas (los campos diferidos cuentan como None).
+        """
+        return tuple(self.__dict__.get(self._meta.get_field(field).attname) for field in self.SKU_KEY_FIELDS)
+
+    def save(self, *args, **kwargs):
+        # Sólo se vuelve a resolver el SKU si cambió el producto o alguna opción:
+        # cambiar `count` no cuesta una consulta más
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(self.SKU_KEY_FIELDS):
+            if self._state.adding or self.sku_key() != getattr(self, "_loaded_sku_key", None):
+                self.sku = self.resolve_sku()
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "sku"}
+        super().save(*args, **kwargs)
+        self._loaded_sku_key = self.sku_key()
+
+    def resolve_sku(self):
+        """
+        SKU de las variantes elegidas, con una consulta sobre el índice
+        (product, signature). None para cursos o combinaciones sin SKU.
+        """
+        if not self.content_type_id or not self.object_id:
+            return None
+        if ContentType.objects.get_for_id(self.content_type_id).model != 'product':
+            return None
+        return ProductVariant.objects.lookup(
+            self.object_id,
+            **{field: getattr(self, f"{field}_id") for field in VARIANT_OPTION_FIELDS},
+        )
+
     def time_in_cart(self) -> timedelta:
         """
         Tiempo transcurrido desde que el ítem fue agregado.
@@ -338,6 +382,10 @@ class CartItem(models.Model):
         """
         from decimal import Decimal
 
+        # El SKU ya tiene el precio de la combinación calculado
+        if self.sku_id:
+            return self.sku.price.quantize(Decimal('0.01'))
+
         prod = self.item
         if not prod:
             return Decimal('0.00')
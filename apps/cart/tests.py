@@ -1,3 +1,107 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.products.models import Color, Product, ProductVariant, Size
+from apps.products.pricing import lines_from_query_params, resolve_cart_lines
+from .models import Cart, CartItem
+
+API_KEY = "test-api-key"
+
+
+class CartItemSkuTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            title="Camisa", slug="camisa", price=Decimal("20.00"), status="published",
+        )
+        cls.red = Color.objects.create(product=cls.product, title="Rojo", hex="#f00", price=Decimal("1.00"), stock=5)
+        cls.blue = Color.objects.create(product=cls.product, title="Azul", hex="#00f", price=Decimal("2.00"), stock=5)
+        cls.red_sku = ProductVariant.objects.create(product=cls.product, color=cls.red, stock=3)
+        cls.blue_sku = ProductVariant.objects.create(product=cls.product, color=cls.blue, stock=3)
+        cls.cart = Cart.objects.create()
+
+    def create_item(self, color):
+        return CartItem.objects.create(
+            cart=self.cart, content_type=ContentType.objects.get_for_model(Product),
+            object_id=self.product.id, color=color,
+        )
+
+    def test_new_item_resolves_its_sku(self):
+        self.assertEqual(self.create_item(self.red).sku, self.red_sku)
+
+    def test_count_update_does_not_resolve_sku_again(self):
+        item = CartItem.objects.get(pk=self.create_item(self.red).pk)
+        item.count += 1
+        with self.assertNumQueries(1):
+            item.save()
+        with self.assertNumQueries(1):
+            item.count += 1
+            item.save(update_fields=["count"])
+        item.refresh_from_db()
+        self.assertEqual((item.count, item.sku_id), (3, self.red_sku.id))
+
+    def test_option_change_resolves_sku_again(self):
+        item = CartItem.objects.get(pk=self.create_item(self.red).pk)
+        item.color = self.blue
+        item.save(update_fields=["color"])
+        item.refresh_from_db()
+        self.assertEqual(item.sku_id, self.blue_sku.id)
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class CartLinesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = Product.objects.create(title="Camisa", slug="camisa", price=Decimal("20.00"), status="published")
+        cls.red = Color.objects.create(product=cls.shirt, title="Rojo", hex="#f00", price=Decimal("1.00"), stock=5)
+        cls.blue = Color.objects.create(product=cls.shirt, title="Azul", hex="#00f", price=Decimal("2.00"), stock=5)
+        cls.large = Size.objects.create(product=cls.shirt, title="L", price=Decimal("3.00"), stock=5)
+        cls.mug = Product.objects.create(title="Taza", slug="taza", price=Decimal("8.00"), status="published")
+        cls.draft = Product.objects.create(title="Borrador", slug="borrador", price=Decimal("5.00"), status="draft")
+
+    def query(self):
+        query = QueryDict(mutable=True)
+        query.setlist("product_ids", [str(self.shirt.pk), str(self.mug.pk), str(self.draft.pk), str(self.shirt.pk)])
+        # El color de la camisa no es de la taza y "x" no es un UUID: ambos se ignoran
+        query.setlist("color_id", [str(self.red.pk), str(self.red.pk), "", str(self.blue.pk)])
+        query.setlist("size_id", [str(self.large.pk), "x"])
+        query.setlist("count", ["2", "tres", "1", "4"])
+        return query
+
+    def test_resolves_lines_in_request_order(self):
+        resolved = resolve_cart_lines(lines_from_query_params(self.query()))
+
+        self.assertEqual(
+            [(product.slug, line["count"], {param: v.title for param, v in selected.items()})
+             for line, product, selected in resolved],
+            [
+                ("camisa", 2, {"color_id": "Rojo", "size_id": "L"}),
+                ("taza", 1, {}),
+                ("camisa", 4, {"color_id": "Azul"}),
+            ],
+        )
+
+    def test_view_prices_each_item_in_order_with_constant_queries(self):
+        def fetch(query):
+            return self.client.get(
+                f"/api/products/list-cartitem-by-id/?{query.urlencode()}", HTTP_API_KEY=API_KEY,
+            ).json()["results"]
+
+        single = QueryDict(mutable=True)
+        single.setlist("product_ids", [str(self.mug.pk)])
+        with CaptureQueriesContext(connection) as context:
+            fetch(single)
+        with self.assertNumQueries(len(context.captured_queries)):
+            items = fetch(self.query())
+
+        self.assertEqual(
+            [(item["product"]["slug"], item["unit_price"], item["count"], item["total_price"]) for item in items],
+            [("camisa", 24.0, 2, 48.0), ("taza", 8.0, 1, 8.0), ("camisa", 22.0, 4, 88.0)],
+        )
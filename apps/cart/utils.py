@@ -61,37 +61,27 @@ def purge_old_carts(self, *args, **options):
 def get_recommendations_for_cart(cart, num=5):
     """
     Recomendaciones genéricas a partir de los ítems en el carrito.
-    Por ahora sólo maneja productos: sugiere hasta `num` productos
-    de la misma categoría que los que ya están en el carrito.
+    Por ahora sólo maneja productos: suma los vecinos precalculados de cada
+    producto del carrito (ver apps.products.recommendations) y completa con
+    productos de las mismas categorías. Devuelve una lista de Product en orden.
     """
+    import uuid
+
     from django.contrib.contenttypes.models import ContentType
     from apps.products.models import Product
+    from apps.products.recommendations import recommend_product_ids
 
-    # 1) Recolectar todos los CartItem
-    items = cart.items.all().select_related('content_type')
-
-    # 2) Filtrar sólo los de modelo "product"
+    # 1) IDs de los productos del carrito
     product_ct = ContentType.objects.get_for_model(Product)
-    prod_items = [ci for ci in items if ci.content_type_id == product_ct.id]
-
-    # 3) Sacar IDs de categoría de los productos en carrito
-    cat_ids = {
-        ci.item.category_id
-        for ci in prod_items
-        if getattr(ci.item, 'category_id', None) is not None
-    }
-
-    # 4) Base queryset de Product
-    qs = Product.postobjects.all()
-
-    # 5) Si tenemos categorías, filtrar por ellas
-    if cat_ids:
-        qs = qs.filter(category_id__in=cat_ids)
+    in_cart_ids = list(
+        cart.items.filter(content_type=product_ct).values_list("object_id", flat=True).distinct()
+    )
 
-    # 6) Excluir los productos ya en el carrito
-    in_cart_ids = [ci.object_id for ci in prod_items]
-    if in_cart_ids:
-        qs = qs.exclude(id__in=in_cart_ids)
+    # 2) Carrito vacío: los productos publicados más recientes
+    if not in_cart_ids:
+        return list(Product.postobjects.order_by("-created_at")[:num])
 
-    # 7) Devolver hasta `num` ítems (aleatorio para variabilidad)
-    return qs.order_by('?')[:num]
\ No newline at end of file
+    # 3) Vecinos de redis (o relleno por categoría), ya sin los del carrito
+    ids = [uuid.UUID(product_id) for product_id in recommend_product_ids(in_cart_ids, num)]
+    products = Product.postobjects.in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
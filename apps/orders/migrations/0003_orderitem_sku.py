@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_productvariant'),
+        ('orders', '0002_order_tracking_number_order_tracking_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.productvariant'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='sku_code',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -127,6 +127,12 @@ class OrderItem(models.Model):
     material_title  = models.CharField(max_length=100, blank=True)
     color_title     = models.CharField(max_length=100, blank=True)
     flavor_title    = models.CharField(max_length=100, blank=True)
+    # SKU de la combinación vendida (y su código, por si el SKU se borra)
+    sku             = models.ForeignKey('products.ProductVariant',
+                                        on_delete=models.SET_NULL,
+                                        null=True, blank=True,
+                                        related_name='+')
+    sku_code        = models.CharField(max_length=64, blank=True)
 
     class Meta:
         ordering = ['order', 'item_name']
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+import stripe
+
+from apps.cart.models import Cart, CartItem
+from apps.products import inventory
+from apps.products.models import Color, Product, ProductVariant, Size
+from .models import Order
+
+API_KEY = "test-api-key"
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ProcessStripePaymentViewTests(TestCase):
+    url = "/api/orders/process_stripe_payment/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            "cliente@example.com", "password", username="cliente",
+            first_name="Test", last_name="User", is_active=True, stripe_customer_id="cus_1",
+        )
+        cls.shirt = Product.objects.create(
+            title="Camisa", slug="camisa", price=Decimal("20.00"), status="published", stock=10,
+        )
+        cls.red = Color.objects.create(product=cls.shirt, title="Rojo", hex="#f00", price=Decimal("1.00"), stock=5)
+        cls.medium = Size.objects.create(product=cls.shirt, title="M", price=Decimal("2.00"), stock=5)
+        cls.sku = ProductVariant.objects.create(product=cls.shirt, color=cls.red, size=cls.medium, stock=3)
+        cls.mug = Product.objects.create(
+            title="Taza", slug="taza", price=Decimal("8.00"), status="published", stock=4,
+        )
+
+        cart = Cart.objects.get(user=cls.user.id)
+        product_type = ContentType.objects.get_for_model(Product)
+        CartItem.objects.create(
+            cart=cart, content_type=product_type, object_id=cls.shirt.id, count=2, color=cls.red, size=cls.medium,
+        )
+        CartItem.objects.create(cart=cart, content_type=product_type, object_id=cls.mug.id, count=1)
+
+    def setUp(self):
+        # Los contadores de redis sobreviven al rollback de cada test
+        inventory.redis_client.delete(
+            inventory.unit_key("product", self.shirt.pk), inventory.unit_key("product", self.mug.pk),
+            inventory.unit_key("color", self.red.pk), inventory.unit_key("size", self.medium.pk),
+            inventory.unit_key("sku", self.sku.pk),
+        )
+
+    def pay(self):
+        headers = {"HTTP_API_KEY": API_KEY, "HTTP_AUTHORIZATION": f"JWT {AccessToken.for_user(self.user)}"}
+        with mock.patch("stripe.Customer.retrieve", return_value=mock.Mock(id="cus_1")), \
+                mock.patch("stripe.PaymentMethod.attach"), \
+                mock.patch("stripe.Customer.modify"), \
+                mock.patch("stripe.PaymentIntent.create", return_value=stripe.PaymentIntent.construct_from(
+                    {"id": "pi_1", "status": "succeeded"}, "sk_test")):
+            return self.client.post(self.url, {"payment_method_id": "pm_1"}, **headers)
+
+    def test_payment_decrements_every_stock_column(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get().status, Order.PAID)
+
+        self.assertEqual(Product.objects.get(pk=self.shirt.pk).stock, 8)
+        self.assertEqual(Product.objects.get(pk=self.mug.pk).stock, 3)
+        self.assertEqual(Color.objects.get(pk=self.red.pk).stock, 3)
+        self.assertEqual(Size.objects.get(pk=self.medium.pk).stock, 3)
+        self.assertEqual(ProductVariant.objects.get(pk=self.sku.pk).stock, 1)
+        self.assertEqual(inventory.product_available_stock(self.shirt.pk), 6)
@@ -4,12 +4,14 @@ from django.db.models import Q
 from rest_framework import permissions, status, serializers
 from rest_framework_api.views import StandardAPIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.db.models import F
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 import stripe
 
 from apps.products.models import ProductInteraction
+from apps.products import inventory
+from apps.products.cards import refresh_product_cards
+from apps.products.cache_tags import invalidate_product
 from utils.ip_utils import get_client_ip, get_device_type
 from apps.cart.models import Cart
 from .models import Order, OrderItem
@@ -111,8 +113,13 @@ class ProcessStripePaymentView(StandardAPIView):
         tax_amount      = (taxable * tax_rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         total_amount    = (taxable + shipping_cost + tax_amount).quantize(Decimal("0.01"))
 
-        # 4) Crear objeto Order (en estado pending)
-        order = Order.objects.create(
+        # 4) Reservar el stock del carrito (atómico en redis; 409 si no alcanza)
+        #    y crear el objeto Order (en estado pending) con el mismo id que la reserva
+        items = list(cart.items.select_related("content_type","size","weight","material","color","flavor","sku"))
+        units = inventory.cart_item_units(items)
+        # Product.stock baja también en las líneas con SKU u opciones (no se reserva)
+        unreserved = inventory.cart_item_product_units(items)
+        order = Order(
             user=user,
             shipping_address=cart.shipping_address,
             shipping_method=cart.shipping_method,
@@ -125,8 +132,12 @@ class ProcessStripePaymentView(StandardAPIView):
             total=total_amount,
             status=Order.PENDING,
         )
+        reservation_id = str(order.id)
+        inventory.reserve(reservation_id, units)
+        order.save()
+
         # Volcar CartItems a OrderItems
-        for ci in cart.items.select_related("content_type","size","weight","material","color","flavor"):
+        for ci in items:
             OrderItem.objects.create(
                 order=order,
                 content_type=ci.content_type,
@@ -141,6 +152,8 @@ class ProcessStripePaymentView(StandardAPIView):
                 material_title=getattr(ci.material, "title", ""),
                 color_title=getattr(ci.color, "title", ""),
                 flavor_title=getattr(ci.flavor, "title", ""),
+                sku=ci.sku,
+                sku_code=getattr(ci.sku, "sku", None) or "",
             )
 
         # 5) Crear y confirmar PaymentIntent en Stripe
@@ -167,6 +180,7 @@ class ProcessStripePaymentView(StandardAPIView):
             )
         except stripe.error.CardError as e:
             # Pago rechazado por la tarjeta
+            inventory.release(reservation_id)
             order.status = Order.FAILED
             order.save(update_fields=["status"])
             return self.response(
@@ -176,6 +190,7 @@ class ProcessStripePaymentView(StandardAPIView):
             )
         except stripe.error.StripeError as e:
             # Cualquier otro error de Stripe
+            inventory.release(reservation_id)
             order.status = Order.FAILED
             order.save(update_fields=["status"])
             return self.response(
@@ -189,24 +204,12 @@ class ProcessStripePaymentView(StandardAPIView):
         order.status            = Order.PAID
         order.save(update_fields=["payment_reference", "status"])
 
-        # --- 7) Ajustar stock de productos y variantes ---
-        for ci in cart.items.select_related(
-            "content_type", "size", "weight", "material", "color", "flavor"
-        ):
-            # Sólo nos importa Product
-            if ci.content_type.model == "product":
-                # Reducir stock en cada variante
-                for attr in ("size", "weight", "material", "color", "flavor"):
-                    variant = getattr(ci, attr)
-                    if variant and hasattr(variant, "stock"):
-                        variant.stock = F("stock") - ci.count
-                        variant.save(update_fields=["stock"])
-
-                # (Opcional) Reducir stock global del producto
-                prod = ci.item  # instancia de Product
-                if hasattr(prod, "stock"):
-                    prod.stock = F("stock") - ci.count
-                    prod.save(update_fields=["stock"])
+        # --- 7) Confirmar la reserva: descuenta el stock reservado en redis y en la base de datos ---
+        inventory.commit(reservation_id, units, unreserved)
+        product_ids = {ci.object_id for ci in items if ci.content_type.model == "product"}
+        refresh_product_cards(product_ids)
+        for product_id in product_ids:
+            invalidate_product(product_id)
 
         # --- 8) Registrar uso de cupón ---
         if cart.coupon:
@@ -7,7 +7,7 @@ from django.forms import NumberInput
 from .models import (
     Product, ProductInteraction, ProductAnalytics,
     Detail, Requisite, Benefit, WhoIsFor,
-    Color, Size, Material, Weight, Flavor,
+    Color, Size, Material, Weight, Flavor, ProductVariant,
     Category, CategoryInteraction, CategoryAnalytics
 )
 from .forms import ProductAdminForm
@@ -123,6 +123,13 @@ class FlavorInline(admin.TabularInline):
     show_id.short_description = "ID"
 
 
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 0
+    fields = ('sku', 'color', 'size', 'material', 'weight', 'flavor', 'price', 'compare_price', 'stock', 'is_active')
+    readonly_fields = ('price', 'compare_price')
+
+
 class ChildCategoryInline(admin.TabularInline):
     model = Category
     fk_name = "parent"
@@ -267,6 +274,7 @@ class ProductAdmin(admin.ModelAdmin):
         MaterialInline,
         WeightInline,
         FlavorInline,
+        ProductVariantInline,
     ]
 
     fieldsets = (
@@ -0,0 +1,102 @@
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from utils.cache_utils import invalidate_tags
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+# Listados de productos (dependen de cualquier producto publicado)
+CATALOG_TAG = "catalog"
+# Listados ordenados por analíticas (los invalida invalidate_analytics_caches)
+ANALYTICS_TAG = "analytics"
+# Listados ordenados por tendencia (los invalida la tarea de decaimiento)
+TRENDING_TAG = "trending"
+# Endpoints que serializan categorías (cada una incluye padre, hijos y hermanos)
+CATEGORIES_TAG = "categories"
+
+# Valores de ?sorting= de ListProductView que ordenan por ProductAnalytics
+ANALYTICS_SORTINGS = ("views", "likes", "shares", "wishlist", "purchases", "revenue")
+# Productos con analíticas cambiadas pendientes de invalidar y marca de tarea programada
+ANALYTICS_PENDING_KEY = "cache:analytics:pending"
+ANALYTICS_SCHEDULED_KEY = "cache:analytics:scheduled"
+
+
+def product_tag(product_id):
+    return f"product:{product_id}"
+
+
+def sorting_tags(request):
+    """
+    Tags extra de un listado según su orden: los ordenados por analíticas o
+    por tendencia cambian sin que cambie ningún producto.
+    """
+    sorting = request.query_params.get("sorting")
+    if sorting in ANALYTICS_SORTINGS:
+        return [ANALYTICS_TAG]
+    if sorting == "trending":
+        return [TRENDING_TAG]
+    return []
+
+
+def product_list_tags(request, data):
+    return [CATALOG_TAG, *sorting_tags(request)]
+
+
+def product_detail_tags(request, data):
+    product = data.get("results") or {}
+    return [product_tag(product.get("id")), CATEGORIES_TAG]
+
+
+def category_tags(request, data):
+    return [CATEGORIES_TAG]
+
+
+def invalidate_on_commit(*tags):
+    """
+    Invalida los tags cuando se confirma la transacción, para que ninguna
+    petición vuelva a cachear los datos anteriores entre el cambio y el commit.
+    """
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def invalidate_product(product_id, catalog=True):
+    tags = [product_tag(product_id)]
+    if catalog:
+        tags.append(CATALOG_TAG)
+    invalidate_on_commit(*tags)
+
+
+def invalidate_categories():
+    invalidate_on_commit(CATEGORIES_TAG, CATALOG_TAG)
+
+
+def schedule_analytics_invalidation(product_id):
+    """
+    Las analíticas se guardan en cada interacción: en vez de invalidar cada vez,
+    se anota el producto y una sola tarea invalida todos los anotados pasados
+    ANALYTICS_CACHE_DEBOUNCE segundos.
+    """
+    from .tasks import invalidate_analytics_caches
+
+    delay = settings.ANALYTICS_CACHE_DEBOUNCE
+    redis_client.sadd(ANALYTICS_PENDING_KEY, str(product_id))
+    # La marca vence sola por si la tarea nunca llega a ejecutarse
+    if redis_client.set(ANALYTICS_SCHEDULED_KEY, 1, nx=True, ex=delay * 2):
+        invalidate_analytics_caches.apply_async(countdown=delay)
+
+
+def flush_analytics_invalidation():
+    """
+    Invalida el detalle de los productos anotados y los listados ordenados por
+    analíticas. La marca se borra en la misma transacción en que se leen los
+    productos: lo que se anote después programa otra tarea.
+    """
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(ANALYTICS_SCHEDULED_KEY)
+    pipe.smembers(ANALYTICS_PENDING_KEY)
+    pipe.delete(ANALYTICS_PENDING_KEY)
+    _, product_ids, _ = pipe.execute()
+    if product_ids:
+        invalidate_tags(ANALYTICS_TAG, *(product_tag(product_id.decode()) for product_id in product_ids))
+    return len(product_ids)
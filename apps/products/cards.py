@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from apps.assets.models import Media
+from .models import Product, ProductCard
+from .serializers import (
+    ColorSerializer, SizeSerializer, MaterialSerializer, WeightSerializer, FlavorSerializer,
+)
+
+VARIANT_SERIALIZERS = {
+    "colors": ColorSerializer,
+    "sizes": SizeSerializer,
+    "materials": MaterialSerializer,
+    "weights": WeightSerializer,
+    "flavors": FlavorSerializer,
+}
+
+CARD_COPY_FIELDS = (
+    "author", "title", "short_description", "slug",
+    "price", "compare_price", "discount", "discount_until",
+    "limited_edition", "condition", "packaging",
+    "category_id", "sub_category_id", "topic_id", "created_at",
+)
+
+CARD_UPDATE_FIELDS = [
+    "author", "title", "short_description", "slug",
+    "price", "compare_price", "discount", "discount_until",
+    "limited_edition", "condition", "packaging",
+    "category", "sub_category", "topic", "created_at",
+    "min_price", "min_compare_price", "total_stock", "thumbnail_key",
+    "average_rating", "review_count", "variants", "refreshed_at",
+]
+
+
+def card_source_queryset():
+    """
+    Productos publicados con todo lo necesario para construir su tarjeta
+    en un número fijo de consultas.
+    """
+    return (
+        Product.postobjects
+        .select_related("thumbnail", "product_analytics")
+        .prefetch_related(
+            Prefetch("images", queryset=Media.objects.order_by("pk")),
+            *VARIANT_SERIALIZERS.keys(),
+        )
+    )
+
+
+def build_product_card(product):
+    """
+    Construye (sin guardar) el ProductCard de un producto ya prefetcheado.
+    """
+    card = ProductCard(product=product)
+    for field in CARD_COPY_FIELDS:
+        setattr(card, field, getattr(product, field))
+
+    # Precio mínimo: precio base + la variante más barata de cada tipo
+    cheapest = Decimal("0.00")
+    total_stock = 0
+    variants = {}
+    for rel, serializer_class in VARIANT_SERIALIZERS.items():
+        attrs = list(getattr(product, rel).all())
+        prices = [a.price for a in attrs if a.price]
+        if prices:
+            cheapest += min(prices)
+        total_stock += sum((a.stock or 0) for a in attrs)
+        variants[rel] = serializer_class(attrs, many=True).data
+
+    card.min_price = (product.price or Decimal("0.00")) + cheapest
+    card.min_compare_price = (product.compare_price or Decimal("0.00")) + cheapest
+    card.total_stock = total_stock
+    card.variants = variants
+
+    image = product.thumbnail
+    if image is None:
+        images = list(product.images.all())
+        image = images[0] if images else None
+    card.thumbnail_key = getattr(image, "key", None) or None
+
+    analytics = getattr(product, "product_analytics", None)
+    card.average_rating = analytics.average_rating if analytics else 0.0
+    card.review_count = analytics.review_count if analytics else 0
+    return card
+
+
+def refresh_product_cards(product_ids):
+    """
+    Recalcula las tarjetas de los productos indicados con un UPSERT.
+    Los productos que ya no están publicados pierden su tarjeta.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+
+    products = list(card_source_queryset().filter(id__in=product_ids))
+    cards = [build_product_card(product) for product in products]
+    if cards:
+        ProductCard.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=CARD_UPDATE_FIELDS,
+        )
+
+    stale = product_ids - {product.id for product in products}
+    if stale:
+        ProductCard.objects.filter(product_id__in=stale).delete()
+    return len(cards)
+
+
+def refresh_card_rating(product_id, average_rating, review_count):
+    """
+    Actualiza sólo las columnas de valoración (un UPDATE, sin recalcular la tarjeta).
+    """
+    return ProductCard.objects.filter(product_id=product_id).update(
+        average_rating=average_rating,
+        review_count=review_count,
+        refreshed_at=timezone.now(),
+    )
+
+
+def rebuild_all_product_cards(chunk_size=500):
+    """
+    Reconstruye todas las tarjetas por lotes y elimina las huérfanas.
+    """
+    ids = list(Product.postobjects.values_list("id", flat=True))
+    refreshed = 0
+    for start in range(0, len(ids), chunk_size):
+        refreshed += refresh_product_cards(ids[start:start + chunk_size])
+    ProductCard.objects.exclude(product_id__in=Product.postobjects.values("id")).delete()
+    return refreshed
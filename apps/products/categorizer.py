@@ -0,0 +1,237 @@
+import unicodedata
+import uuid
+from collections import Counter, defaultdict, deque
+
+from django.utils import timezone
+
+from utils.cache_utils import invalidate_tags
+from .cache_tags import CATALOG_TAG, product_tag
+from .cards import refresh_product_cards
+from .models import Category, Product
+from .search import TOKEN_RE
+
+# Campos del producto que se puntúan y su peso
+FIELD_WEIGHTS = (("title", 3), ("keywords", 2), ("description", 1))
+# Niveles del árbol que se guardan en el producto (raíz, subcategoría, tema)
+CATEGORY_LEVELS = ("category", "sub_category", "topic")
+# Puntuación mínima de la rama elegida (una palabra suelta en el título ya alcanza)
+MIN_SCORE = 3
+DEFAULT_CHUNK_SIZE = 1000
+# Asignaciones y productos sin coincidencias que se incluyen en el reporte
+REPORT_SAMPLE_SIZE = 50
+
+# Palabras que no identifican una categoría por sí solas
+STOPWORDS = {
+    "de", "del", "la", "las", "el", "los", "y", "e", "o", "u", "para", "con", "en", "por", "sin",
+    "the", "and", "or", "for", "of", "with", "in",
+}
+
+
+def normalize_token(token):
+    """
+    Minúsculas, sin tildes y sin la "s" final del plural (zapatillas -> zapatilla).
+    """
+    token = unicodedata.normalize("NFKD", token.lower())
+    token = "".join(char for char in token if not unicodedata.combining(char))
+    if len(token) > 3 and token.endswith("s"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [normalize_token(token) for token in TOKEN_RE.findall(text or "")]
+
+
+class KeywordMatcher:
+    """
+    Autómata de Aho-Corasick sobre tokens: encuentra en una sola pasada por el
+    texto todas las apariciones de todos los patrones (frases de uno o más tokens).
+    Trabajar con tokens y no con caracteres evita coincidencias dentro de otras
+    palabras ("ropa" en "europa").
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, tokens, value):
+        node = 0
+        for token in tokens:
+            child = self.goto[node].get(token)
+            if child is None:
+                child = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][token] = child
+            node = child
+        self.output[node].append(value)
+
+    def build(self):
+        """
+        Calcula los enlaces de fallo por niveles (BFS). Hay que llamarlo tras el último add().
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and token not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        return self
+
+    def iter_matches(self, tokens):
+        node = 0
+        for token in tokens:
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            yield from self.output[node]
+
+
+class Categorizer:
+    """
+    Elige la categoría de un producto a partir de sus textos.
+
+    Cada categoría aporta como patrones su nombre, título y slug completos
+    (peso 2 por token) y cada palabra de los que tienen varias (peso 1).
+    Cada patrón suma una vez por campo: su peso por el del campo (FIELD_WEIGHTS).
+    Gana la rama con más puntos sumando los de todos sus ancestros y,
+    a igualdad, la más profunda.
+    """
+
+    def __init__(self, categories, min_score=MIN_SCORE):
+        self.min_score = min_score
+        self.nodes = {category.pk: category for category in categories}
+        self.paths = {
+            pk: [self.nodes[uuid.UUID(part)] for part in category.path.split("/")[:-1] if uuid.UUID(part) in self.nodes]
+            for pk, category in self.nodes.items()
+        }
+
+        # patrón -> (categoría, peso); un patrón repetido en nombre y slug cuenta una vez
+        self.patterns = []
+        self.matcher = KeywordMatcher()
+        for category in sorted(self.nodes.values(), key=lambda category: category.path):
+            phrases = {}
+            for text in (category.name, category.title, (category.slug or "").replace("-", " ")):
+                tokens = tuple(tokenize(text))
+                if not tokens:
+                    continue
+                phrases[tokens] = 2 * len(tokens)
+                if len(tokens) > 1:
+                    for token in tokens:
+                        if len(token) > 2 and token not in STOPWORDS:
+                            phrases.setdefault((token,), 1)
+            for tokens, weight in phrases.items():
+                self.matcher.add(tokens, len(self.patterns))
+                self.patterns.append((category.pk, weight))
+        self.matcher.build()
+
+    def score(self, product):
+        """
+        {categoría: puntos} de las categorías mencionadas en los textos del producto.
+        """
+        scores = defaultdict(int)
+        for field, field_weight in FIELD_WEIGHTS:
+            for pattern in set(self.matcher.iter_matches(tokenize(getattr(product, field)))):
+                category_id, weight = self.patterns[pattern]
+                scores[category_id] += field_weight * weight
+        return scores
+
+    def classify(self, product):
+        """
+        (rama desde la raíz, puntos) de la mejor categoría, o None si ninguna llega a min_score.
+        """
+        scores = self.score(product)
+        best, best_key = None, None
+        for category_id in scores:
+            path = self.paths[category_id]
+            key = (sum(scores.get(node.pk, 0) for node in path), len(path), path[-1].path)
+            if best_key is None or key > best_key:
+                best, best_key = path, key
+        if best is None or best_key[0] < self.min_score:
+            return None
+        return best, best_key[0]
+
+
+def save_assignments(products):
+    """
+    Guarda las categorías de `products` con un bulk_update y hace lo que harían
+    las signals de Product: tarjetas e invalidación de caché.
+    """
+    now = timezone.now()
+    for product in products:
+        product.updated_at = now
+    Product.objects.bulk_update(products, [*CATEGORY_LEVELS, "updated_at"])
+    product_ids = [product.id for product in products]
+    refresh_product_cards(product_ids)
+    invalidate_tags(CATALOG_TAG, *(product_tag(product_id) for product_id in product_ids))
+
+
+def auto_categorize(dry_run=False, overwrite=False, chunk_size=DEFAULT_CHUNK_SIZE, min_score=MIN_SCORE):
+    """
+    Asigna category, sub_category y topic a los productos sin categoría (o a
+    todos con `overwrite`) recorriéndolos con .iterator() y guardando por lotes.
+    Con `dry_run` no escribe nada. Devuelve un reporte serializable a JSON.
+    """
+    categorizer = Categorizer(
+        Category.objects.only("id", "name", "title", "slug", "path"), min_score=min_score
+    )
+    queryset = Product.objects.only(
+        "id", "title", "keywords", "description", *(f"{level}_id" for level in CATEGORY_LEVELS),
+    ).order_by()
+    if not overwrite:
+        queryset = queryset.filter(category__isnull=True)
+
+    report = {
+        "dry_run": dry_run,
+        "overwrite": overwrite,
+        "scanned": 0,
+        "matched": 0,
+        "unmatched": 0,
+        "changed": 0,
+        "by_category": Counter(),
+        "assignments": [],
+        "unmatched_products": [],
+    }
+    pending = []
+    for product in queryset.iterator(chunk_size=chunk_size):
+        report["scanned"] += 1
+        result = categorizer.classify(product)
+        if result is None:
+            report["unmatched"] += 1
+            if len(report["unmatched_products"]) < REPORT_SAMPLE_SIZE:
+                report["unmatched_products"].append({"id": str(product.id), "title": product.title})
+            continue
+
+        path, score = result
+        report["matched"] += 1
+        branch = "/".join(node.slug for node in path[:len(CATEGORY_LEVELS)])
+        report["by_category"][branch] += 1
+
+        assignment = [node.pk for node in path[:len(CATEGORY_LEVELS)]]
+        assignment += [None] * (len(CATEGORY_LEVELS) - len(assignment))
+        if [getattr(product, f"{level}_id") for level in CATEGORY_LEVELS] == assignment:
+            continue
+        for level, category_id in zip(CATEGORY_LEVELS, assignment):
+            setattr(product, f"{level}_id", category_id)
+        report["changed"] += 1
+        if len(report["assignments"]) < REPORT_SAMPLE_SIZE:
+            report["assignments"].append({
+                "id": str(product.id), "title": product.title, "category": branch, "score": score,
+            })
+
+        if not dry_run:
+            pending.append(product)
+            if len(pending) >= chunk_size:
+                save_assignments(pending)
+                pending = []
+
+    if pending:
+        save_assignments(pending)
+    report["by_category"] = dict(report["by_category"].most_common())
+    return report
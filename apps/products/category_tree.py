@@ -0,0 +1,171 @@
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.db.models import DecimalField, F, IntegerField, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import Category
+
+
+def attach_children(node, children):
+    """
+    Rellena el caché de prefetch de `node.children` para que
+    `node.children.all()` no vuelva a consultar la base de datos.
+    """
+    qs = node.children.all()
+    qs._result_cache = list(children)
+    qs._prefetch_done = True
+    node.__dict__.setdefault("_prefetched_objects_cache", {})["children"] = qs
+
+
+def build_category_tree(categories):
+    """
+    Arma el árbol en memoria a partir de una lista plana de categorías.
+    Devuelve las raíces (nodos cuyo padre no está en la lista) y deja
+    `children` y `parent` resueltos en cada nodo.
+    """
+    nodes = {category.pk: category for category in categories}
+    children = {pk: [] for pk in nodes}
+    roots = []
+    for category in categories:
+        parent = nodes.get(category.parent_id)
+        if parent is None:
+            roots.append(category)
+            continue
+        children[parent.pk].append(category)
+        Category.parent.field.set_cached_value(category, parent)
+    for pk, node in nodes.items():
+        attach_children(node, children[pk])
+    return roots
+
+
+def load_category_tree(root=None, queryset=None):
+    """
+    Carga el árbol completo (o el subárbol de `root`) en una sola consulta.
+    """
+    qs = queryset if queryset is not None else Category.objects.all()
+    if root is not None:
+        qs = qs.filter(path__startswith=root.path)
+    return build_category_tree(list(qs.order_by("name")))
+
+
+def with_analytics(queryset):
+    """
+    Anota las métricas de CategoryAnalytics (0 si aún no existen) con el
+    nombre que espera CategorySerializer.
+    """
+    return queryset.annotate(
+        analytics_views=Coalesce(
+            F("category_analytics__views"), Value(0), output_field=IntegerField()
+        ),
+        analytics_likes=Coalesce(
+            F("category_analytics__likes"), Value(0), output_field=IntegerField()
+        ),
+        analytics_shares=Coalesce(
+            F("category_analytics__shares"), Value(0), output_field=IntegerField()
+        ),
+        analytics_wishlist=Coalesce(
+            F("category_analytics__wishlist_count"), Value(0), output_field=IntegerField()
+        ),
+        analytics_add_to_cart=Coalesce(
+            F("category_analytics__add_to_cart_count"), Value(0), output_field=IntegerField()
+        ),
+        analytics_purchases=Coalesce(
+            F("category_analytics__purchases"), Value(0), output_field=IntegerField()
+        ),
+        analytics_revenue=Coalesce(
+            F("category_analytics__revenue_generated"),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def load_category_relations(categories):
+    """
+    Carga en una sola consulta todo lo que CategorySerializer necesita de
+    `categories`: sus subárboles completos, sus padres y sus hermanos, con
+    thumbnail y analytics. Devuelve las instancias del árbol en el mismo
+    orden, con `children` y `parent` ya resueltos en memoria.
+    """
+    if not categories:
+        return []
+
+    condition = Q()
+    parent_ids = set()
+    for category in categories:
+        condition |= Q(path__startswith=category.path)
+        if category.parent_id:
+            parent_ids.add(category.parent_id)
+    if parent_ids:
+        condition |= Q(pk__in=parent_ids) | Q(parent_id__in=parent_ids)
+
+    nodes = list(
+        with_analytics(Category.objects.select_related("thumbnail"))
+        .filter(condition)
+        .order_by("name")
+    )
+    build_category_tree(nodes)
+
+    # Sólo los subárboles y los padres tienen todos sus hijos cargados;
+    # a los hermanos se les quita el caché para no devolver hijos incompletos.
+    prefixes = tuple(category.path for category in categories)
+    for node in nodes:
+        if node.pk not in parent_ids and not node.path.startswith(prefixes):
+            node._prefetched_objects_cache.pop("children", None)
+
+    by_id = {node.pk: node for node in nodes}
+    return [by_id.get(category.pk, category) for category in categories]
+
+
+def resolve_categories(identifiers):
+    """
+    Resuelve una lista de UUIDs o slugs en categorías con una sola consulta.
+    """
+    ids, slugs = [], []
+    for identifier in identifiers:
+        try:
+            ids.append(uuid.UUID(identifier))
+        except ValueError:
+            slugs.append(identifier)
+    return list(Category.objects.filter(Q(id__in=ids) | Q(slug__in=slugs)).only("id", "path"))
+
+
+def subtree_q(identifiers, prefix=""):
+    """
+    Q que selecciona filas cuya category, sub_category o topic está dentro
+    del subárbol de alguno de los `identifiers`. `prefix` permite aplicarlo
+    desde otros modelos (p. ej. "product__").
+    """
+    nodes = resolve_categories(identifiers)
+    if not nodes:
+        return Q(pk__in=[])
+    subtree = Category.objects.filter(
+        reduce(or_, (Q(path__startswith=node.path) for node in nodes))
+    ).values("id")
+    return (
+        Q(**{f"{prefix}category_id__in": subtree})
+        | Q(**{f"{prefix}sub_category_id__in": subtree})
+        | Q(**{f"{prefix}topic_id__in": subtree})
+    )
+
+
+def attach_category_relations(objects, fields=("category", "sub_category", "topic")):
+    """
+    Sustituye las categorías (ya cargadas con select_related) de `objects` por
+    nodos de load_category_relations, para serializarlas sin consultas por nodo.
+    """
+    categories = {}
+    for obj in objects:
+        for field in fields:
+            category = getattr(obj, field)
+            if category is not None:
+                categories[category.pk] = category
+    nodes = {node.pk: node for node in load_category_relations(list(categories.values()))}
+    for obj in objects:
+        for field in fields:
+            category_id = getattr(obj, f"{field}_id")
+            if category_id in nodes:
+                setattr(obj, field, nodes[category_id])
+    return objects
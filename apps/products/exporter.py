@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+
+from django.db.models import Prefetch
+
+from apps.assets.models import Media
+from .importer import (
+    BOOLEAN_FIELDS, CATEGORY_FIELDS, CHOICE_FIELDS, CSV_LIST_SEPARATOR, DATETIME_FIELDS, DECIMAL_FIELDS,
+    OPTION_RELATIONS, TEXT_FIELDS,
+)
+from .models import Product, ProductVariant
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+DEFAULT_CHUNK_SIZE = 500
+
+# Métricas de ProductAnalytics que se exportan
+EXPORT_ANALYTICS_FIELDS = (
+    "impressions", "clicks", "views", "likes", "shares", "wishlist_count",
+    "add_to_cart_count", "purchases", "conversion_rate", "revenue_generated",
+    "average_rating", "review_count",
+)
+
+# Columnas del CSV: las de import_products (las listas van como texto JSON
+# o separadas por `|`) más ids, nombres de categoría y analíticas
+CSV_COLUMNS = (
+    "id", "slug", "author", *TEXT_FIELDS, *DECIMAL_FIELDS, *BOOLEAN_FIELDS, *DATETIME_FIELDS,
+    *CHOICE_FIELDS, "stock", "total_stock", "updated_at",
+    *(column for field in CATEGORY_FIELDS for column in (field, f"{field}_name")),
+    "thumbnail", "images", *OPTION_RELATIONS, "skus",
+    *(f"analytics_{field}" for field in EXPORT_ANALYTICS_FIELDS),
+)
+
+
+def export_queryset(updated_since=None):
+    """
+    Productos publicados con un plan de carga fijo: select_related de categorías,
+    miniatura y analíticas, y un prefetch por relación. Con .iterator(chunk_size)
+    los prefetch se hacen por lote, así la memoria no crece con el catálogo.
+    """
+    queryset = (
+        Product.postobjects
+        .defer("search_vector")
+        .select_related(*CATEGORY_FIELDS, "thumbnail", "product_analytics")
+        .prefetch_related(
+            Prefetch("images", queryset=Media.objects.order_by("pk")),
+            *OPTION_RELATIONS,
+            Prefetch("skus", queryset=ProductVariant.objects.order_by("signature")),
+        )
+        .order_by("created_at", "id")
+    )
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return queryset
+
+
+def json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def export_record(product):
+    """
+    Registro de exportación de un producto ya cargado con export_queryset.
+    Usa las mismas claves que import_products, así un volcado se puede reimportar.
+    """
+    record = {"id": str(product.id), "slug": product.slug, "author": str(product.author)}
+    for field in (*TEXT_FIELDS, *DECIMAL_FIELDS, *BOOLEAN_FIELDS, *DATETIME_FIELDS, *CHOICE_FIELDS, "stock", "updated_at"):
+        record[field] = json_value(getattr(product, field))
+
+    for field in CATEGORY_FIELDS:
+        category = getattr(product, field)
+        record[field] = category.slug if category else None
+        record[f"{field}_name"] = category.name if category else None
+
+    record["thumbnail"] = product.thumbnail.key if product.thumbnail else None
+    record["images"] = [image.key for image in product.images.all()]
+
+    titles = {}
+    total_stock = 0
+    for rel, field in OPTION_RELATIONS.items():
+        options = []
+        for option in getattr(product, rel).all():
+            titles[option.pk] = option.title
+            total_stock += option.stock or 0
+            entry = {
+                "id": str(option.pk),
+                "title": option.title,
+                "price": json_value(option.price),
+                "stock": option.stock,
+                "order": option.order,
+            }
+            if rel == "colors":
+                entry["hex"] = option.hex
+            options.append(entry)
+        record[rel] = options
+    record["total_stock"] = total_stock
+
+    record["skus"] = [
+        {
+            "id": str(variant.pk),
+            "sku": variant.sku,
+            "price": json_value(variant.price),
+            "compare_price": json_value(variant.compare_price),
+            "stock": variant.stock,
+            "is_active": variant.is_active,
+            **{
+                field: titles.get(getattr(variant, f"{field}_id"))
+                for field in OPTION_RELATIONS.values()
+                if getattr(variant, f"{field}_id")
+            },
+        }
+        for variant in product.skus.all()
+    ]
+
+    analytics = getattr(product, "product_analytics", None)
+    record["analytics"] = {
+        field: json_value(getattr(analytics, field)) if analytics else None
+        for field in EXPORT_ANALYTICS_FIELDS
+    }
+    return record
+
+
+def csv_row(record):
+    row = dict(record)
+    row["images"] = CSV_LIST_SEPARATOR.join(record["images"])
+    for column in (*OPTION_RELATIONS, "skus"):
+        row[column] = json.dumps(record[column])
+    for field, value in record["analytics"].items():
+        row[f"analytics_{field}"] = value
+    return row
+
+
+def iter_export(queryset, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Genera el volcado en bloques de bytes, uno por lote de `chunk_size` productos
+    leídos con un cursor de servidor.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+
+    for index, product in enumerate(queryset.iterator(chunk_size=chunk_size), start=1):
+        record = export_record(product)
+        if writer is not None:
+            writer.writerow(csv_row(record))
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False))
+            buffer.write("\n")
+        if index % chunk_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Si el Accept-Encoding admite gzip respetando los pesos: `gzip;q=0` lo
+    rechaza y, si gzip no aparece, decide el comodín `*`.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
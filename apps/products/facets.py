@@ -0,0 +1,133 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Case, CharField, Value, When
+
+from .models import Category, ProductCard
+
+# Límites superiores de los rangos de precio (sobre ProductCard.min_price)
+DEFAULT_PRICE_BUCKETS = (25, 50, 100, 200)
+
+FACET_COLUMNS = (
+    "category_id",
+    "sub_category_id",
+    "topic_id",
+    "condition",
+    "packaging",
+    "discount",
+    "price_bucket",
+)
+
+
+def get_price_buckets():
+    """
+    Devuelve [(etiqueta, min, max), ...]; el último rango no tiene máximo.
+    """
+    limits = getattr(settings, "PRODUCT_FACET_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS)
+    buckets = []
+    lower = 0
+    for upper in limits:
+        buckets.append((f"{lower}-{upper}", lower, upper))
+        lower = upper
+    buckets.append((f"{lower}+", lower, None))
+    return buckets
+
+
+def price_bucket_expression():
+    whens = [
+        When(min_price__lt=Decimal(upper), then=Value(label))
+        for label, _, upper in get_price_buckets() if upper is not None
+    ]
+    return Case(*whens, default=Value(get_price_buckets()[-1][0]), output_field=CharField())
+
+
+def compute_facets(queryset):
+    """
+    Calcula todos los facets de un queryset de ProductCard en una sola consulta
+    usando GROUPING SETS (un conjunto por facet más el total).
+    """
+    assert queryset.model is ProductCard
+    inner = (
+        queryset
+        .annotate(price_bucket=price_bucket_expression())
+        .order_by()
+        .values(*FACET_COLUMNS)
+    )
+    counts = {column: {} for column in FACET_COLUMNS}
+    try:
+        inner_sql, params = inner.query.sql_with_params()
+    except EmptyResultSet:
+        # Filtros que no pueden devolver nada (búsqueda sin términos, subárbol inexistente)
+        return _format_facets(0, counts)
+
+    columns = ", ".join(FACET_COLUMNS)
+    grouping_sets = ", ".join(f"({column})" for column in FACET_COLUMNS)
+    sql = (
+        f"SELECT {columns}, GROUPING({columns}) AS grouping_id, COUNT(*) "
+        f"FROM ({inner_sql}) AS filtered "
+        f"GROUP BY GROUPING SETS ({grouping_sets}, ())"
+    )
+
+    # GROUPING() devuelve un bit por columna (1 = no agrupada, la primera es el bit más alto)
+    total_bits = len(FACET_COLUMNS)
+    all_bits = (1 << total_bits) - 1
+    facet_by_grouping = {
+        all_bits ^ (1 << (total_bits - 1 - index)): column
+        for index, column in enumerate(FACET_COLUMNS)
+    }
+
+    total = 0
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            grouping_id, count = row[-2], row[-1]
+            if grouping_id == all_bits:
+                total = count
+                continue
+            column = facet_by_grouping.get(grouping_id)
+            if column is None:
+                continue
+            value = row[FACET_COLUMNS.index(column)]
+            if value is not None:
+                counts[column][value] = count
+
+    return _format_facets(total, counts)
+
+
+def _format_facets(total, counts):
+    category_ids = set(counts["category_id"]) | set(counts["sub_category_id"]) | set(counts["topic_id"])
+    categories = Category.objects.only("id", "name", "slug").in_bulk(category_ids)
+
+    def category_facet(column):
+        return [
+            {
+                "id": str(category_id),
+                "name": categories[category_id].name,
+                "slug": categories[category_id].slug,
+                "count": count,
+            }
+            for category_id, count in sorted(counts[column].items(), key=lambda item: -item[1])
+            if category_id in categories
+        ]
+
+    def value_facet(column):
+        return [
+            {"value": value, "count": count}
+            for value, count in sorted(counts[column].items(), key=lambda item: -item[1])
+        ]
+
+    return {
+        "total": total,
+        "categories": category_facet("category_id"),
+        "sub_categories": category_facet("sub_category_id"),
+        "topics": category_facet("topic_id"),
+        "condition": value_facet("condition"),
+        "packaging": value_facet("packaging"),
+        "discount": value_facet("discount"),
+        "price": [
+            {"value": label, "min": lower, "max": upper, "count": counts["price_bucket"].get(label, 0)}
+            for label, lower, upper in get_price_buckets()
+        ],
+    }
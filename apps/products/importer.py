@@ -0,0 +1,722 @@
+import codecs
+import csv
+import json
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_slug
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from faker import Faker
+
+from apps.assets.models import Media
+from utils.cache_utils import invalidate_tags
+from . import inventory
+from .cache_tags import CATALOG_TAG, product_tag
+from .cards import refresh_product_cards
+from .models import Category, Product, ProductAnalytics, ProductVariant, VARIANT_OPTION_FIELDS, variant_signature
+from .pricing import VARIANT_PARAMS
+from .search import update_search_vector
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 1000
+# Errores de fila que se guardan en el reporte (el resto sólo se cuenta)
+MAX_REPORTED_ERRORS = 100
+# Separador de listas en columnas CSV (p. ej. images=key1|key2)
+CSV_LIST_SEPARATOR = "|"
+
+# Campos de Product que se pueden importar, por tipo
+TEXT_FIELDS = ("title", "short_description", "description", "keywords")
+DECIMAL_FIELDS = ("price", "compare_price")
+BOOLEAN_FIELDS = ("discount", "hidden", "banned", "can_delete", "limited_edition")
+DATETIME_FIELDS = ("discount_until", "created_at")
+CHOICE_FIELDS = ("condition", "packaging", "status")
+CATEGORY_FIELDS = ("category", "sub_category", "topic")
+
+# Relación de opciones del producto -> campo de ProductVariant (colors -> color)
+OPTION_RELATIONS = {rel: param[:-len("_id")] for param, rel in VARIANT_PARAMS}
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "si", "sí"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+
+
+class RowError(ValueError):
+    """
+    Fila inválida: se reporta con su número de línea y no se importa.
+    """
+
+
+def read_rows(stream, fmt):
+    """
+    Lee un archivo binario CSV (con cabecera) o JSON Lines fila a fila, sin
+    cargarlo en memoria. Devuelve (número de línea, fila); las líneas JSON
+    inválidas llegan como RowError para reportarlas como cualquier otra fila.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f"JSON inválido: {e}")
+
+
+def guess_format(filename):
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"ndjson": "jsonl", "json": "jsonl"}.get(extension, extension)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_decimal(value, field, max_digits):
+    try:
+        amount = Decimal(str(value).strip()).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise RowError(f"'{field}' debe ser un número.")
+    if amount < 0 or amount >= Decimal(10) ** (max_digits - 2):
+        raise RowError(f"'{field}' está fuera de rango.")
+    return amount
+
+
+def parse_int(value, field):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise RowError(f"'{field}' debe ser un entero.")
+
+
+def parse_bool(value, field):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f"'{field}' debe ser verdadero o falso.")
+
+
+def parse_datetime_value(value, field):
+    try:
+        parsed = parse_datetime(str(value).strip())
+    except ValueError:
+        # Bien formada pero imposible (p. ej. 2024-02-30)
+        parsed = None
+    if parsed is None:
+        raise RowError(f"'{field}' debe ser una fecha ISO 8601.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_list(value, field):
+    """
+    Lista de una columna: lista JSON (JSONL) o texto separado por `|` (CSV).
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(CSV_LIST_SEPARATOR) if item.strip()]
+    raise RowError(f"'{field}' debe ser una lista.")
+
+
+def parse_objects(value, field):
+    """
+    Lista de objetos de una columna de variantes: lista JSON o, en CSV, su texto JSON.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise RowError(f"'{field}' debe ser una lista JSON.")
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise RowError(f"'{field}' debe ser una lista de objetos.")
+    return value
+
+
+def parse_text(value, field, max_length):
+    text = str(value)
+    if max_length and len(text) > max_length:
+        raise RowError(f"'{field}' supera los {max_length} caracteres.")
+    return text
+
+
+def split_identifiers(identifiers):
+    ids, others = [], []
+    for identifier in identifiers:
+        try:
+            ids.append(uuid.UUID(str(identifier)))
+        except ValueError:
+            others.append(str(identifier))
+    return ids, others
+
+
+def fake_product_rows(count, media_ids, variants=False, faker=None):
+    """
+    Filas de importación con datos de prueba (GenerateFakeProductsView y
+    benchmark_product_import). Con `variants` cada producto trae 2 colores,
+    2 tallas y sus 4 SKUs.
+    """
+    faker = faker or Faker()
+    media_ids = [str(media_id) for media_id in media_ids]
+    now = timezone.now()
+    for number in range(1, count + 1):
+        title = faker.sentence(nb_words=4)
+        row = {
+            "slug": f"{slugify(title)[:40]}-{uuid.uuid4().hex[:8]}",
+            "author": "ac68ca5f-07fe-4906-be85-cb5e1da6b8fb",
+            "title": title,
+            "short_description": faker.sentence()[:169],
+            "description": faker.text(max_nb_chars=300),
+            "keywords": ", ".join(faker.words(5)),
+            "thumbnail": random.choice(media_ids) if media_ids else "",
+            "images": random.sample(media_ids, k=min(len(media_ids), random.randint(1, 3))),
+            "price": round(random.uniform(2, 100), 2),
+            "compare_price": round(random.uniform(100, 150), 2),
+            "discount": random.choice([True, False]),
+            "discount_until": (now + timedelta(days=random.randint(1, 30))).isoformat(),
+            "stock": random.randint(0, 100),
+            "hidden": False,
+            "banned": False,
+            "can_delete": True,
+            "limited_edition": random.choice([True, False]),
+            "condition": random.choice(["new", "used", "broken"]),
+            "packaging": random.choice(["normal", "gift"]),
+            "status": random.choice(["draft", "published"]),
+        }
+        if variants:
+            colors = [("Negro", "#000000"), ("Blanco", "#FFFFFF")]
+            sizes = ["M", "L"]
+            row["colors"] = [
+                {"title": name, "hex": hex_code, "price": "0.00", "stock": random.randint(0, 20)}
+                for name, hex_code in colors
+            ]
+            row["sizes"] = [
+                {"title": size, "price": f"{index}.00", "stock": random.randint(0, 20), "order": index}
+                for index, size in enumerate(sizes)
+            ]
+            row["skus"] = [
+                {"color": name, "size": size, "stock": random.randint(0, 10)}
+                for name, _ in colors for size in sizes
+            ]
+        yield number, row
+
+
+class ImportReport:
+    """
+    Progreso acumulado de una importación.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.valid = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.chunks = 0
+        self.errors = []
+        self.chunk_errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def add_chunk_error(self, chunk, message):
+        """
+        Error de un lote entero (no de una fila): se anota el número de lote y
+        su primera y última línea.
+        """
+        lines = [line for line, _ in chunk]
+        if len(self.chunk_errors) < MAX_REPORTED_ERRORS:
+            self.chunk_errors.append({
+                "chunk": self.chunks + 1,
+                "lines": [lines[0], lines[-1]] if lines else [],
+                "error": message,
+            })
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.elapsed, 1) if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": self.rows_per_second,
+            "errors": self.errors,
+            "chunk_errors": self.chunk_errors,
+        }
+
+
+class ProductImporter:
+    """
+    Importa productos por lotes con upsert por slug.
+
+    Cada lote se valida fila a fila (las filas inválidas se reportan y se omiten)
+    y se escribe en una transacción con bulk_create: productos, ProductAnalytics,
+    enlaces de imágenes, opciones (colors, sizes...) y SKUs. Como bulk_create no
+    dispara signals, al confirmar el lote se hace en bloque lo que harían ellas:
+    vector de búsqueda, precios de SKUs, tarjetas, contadores de inventario y caché.
+
+    Columnas: slug (obligatoria), los campos simples de Product, category/sub_category/
+    topic (UUID o slug), thumbnail e images (UUID o key de Media), author (UUID),
+    una lista por tipo de opción ([{"title", "price", "stock", "order", "hex"}]) y
+    skus ([{"sku", "stock", "is_active", "color": "<title>", ...}]). En CSV las
+    listas de opciones y SKUs van como texto JSON y images separadas por `|`.
+    Una columna ausente no se toca en los productos existentes; una lista de
+    opciones, imágenes o SKUs presente reemplaza la actual (las opciones se
+    conservan por título y los SKUs por combinación).
+
+    Con sync_cache=False no se tocan los contadores de inventario ni los tags de
+    caché de redis (p. ej. en benchmark_product_import, que revierte lo escrito).
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, sync_cache=True):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.sync_cache = sync_cache
+        self.report = ImportReport()
+        # Caché de búsquedas entre lotes: identificador -> id (None si no existe)
+        self.categories = {}
+        self.media = {}
+
+    def run(self, rows, progress=None):
+        for report in self.iter_chunks(rows):
+            if progress is not None:
+                progress(report)
+        return self.report
+
+    def iter_chunks(self, rows):
+        """
+        Importa `rows` ((línea, fila)) y devuelve el reporte tras cada lote.
+        Un error inesperado en un lote queda en report.chunk_errors y se sigue
+        con el siguiente; si lo que falla es la lectura del archivo, se termina ahí.
+        """
+        try:
+            for chunk in chunked(rows, self.chunk_size):
+                try:
+                    self.import_chunk(chunk)
+                except Exception as e:
+                    logger.exception("Falló el lote %s de la importación", self.report.chunks + 1)
+                    self.report.add_chunk_error(chunk, f"No se pudo importar el lote: {e}")
+                self.report.chunks += 1
+                self.report.elapsed = time.monotonic() - self.report.started
+                yield self.report
+        except (UnicodeDecodeError, csv.Error) as e:
+            self.report.add_chunk_error([], f"No se pudo leer el archivo: {e}")
+            self.report.elapsed = time.monotonic() - self.report.started
+
+    # --- Validación ---
+
+    def load_lookups(self, chunk):
+        """
+        Resuelve con una consulta por modelo las categorías y medios del lote
+        que aún no están en caché.
+        """
+        categories, media = set(), set()
+        for _, row in chunk:
+            if not isinstance(row, dict):
+                continue
+            categories.update(str(row[field]).strip() for field in CATEGORY_FIELDS if not is_blank(row.get(field)))
+            if not is_blank(row.get("thumbnail")):
+                media.add(str(row["thumbnail"]).strip())
+            if not is_blank(row.get("images")):
+                try:
+                    media.update(str(item) for item in parse_list(row["images"], "images"))
+                except RowError:
+                    pass
+        self.resolve(Category, categories - set(self.categories), "slug", self.categories)
+        self.resolve(Media, media - set(self.media), "key", self.media)
+
+    @staticmethod
+    def resolve(model, identifiers, field, cache):
+        if not identifiers:
+            return
+        ids, others = split_identifiers(identifiers)
+        rows = model.objects.filter(Q(id__in=ids) | Q(**{f"{field}__in": others})).values_list("id", field)
+        found = {}
+        for pk, value in rows:
+            found[str(pk)] = pk
+            found.setdefault(value, pk)
+        for identifier in identifiers:
+            try:
+                cache[identifier] = found.get(str(uuid.UUID(identifier)))
+            except ValueError:
+                cache[identifier] = found.get(identifier)
+
+    def lookup(self, cache, value, field):
+        identifier = str(value).strip()
+        pk = cache.get(identifier)
+        if pk is None:
+            raise RowError(f"'{field}': no existe '{identifier}'.")
+        return pk
+
+    def parse_row(self, row):
+        """
+        Valida una fila y devuelve {"slug", "fields", "images", "options", "skus"}.
+        `fields` sólo trae las columnas presentes en la fila.
+        """
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError("La fila debe ser un objeto.")
+
+        slug = str(row.get("slug") or "").strip()
+        if not slug:
+            raise RowError("'slug' es obligatorio.")
+        try:
+            validate_slug(slug)
+        except DjangoValidationError:
+            raise RowError(f"'{slug}' no es un slug válido.")
+        if len(slug) > Product._meta.get_field("slug").max_length:
+            raise RowError("'slug' es demasiado largo.")
+
+        fields = {}
+        for field in TEXT_FIELDS:
+            if field in row:
+                value = row[field]
+                fields[field] = None if is_blank(value) else parse_text(
+                    value, field, Product._meta.get_field(field).max_length
+                )
+        for field in DECIMAL_FIELDS:
+            if field in row:
+                fields[field] = None if is_blank(row[field]) else parse_decimal(row[field], field, 6)
+        for field in BOOLEAN_FIELDS:
+            if field in row:
+                fields[field] = (
+                    Product._meta.get_field(field).get_default() if is_blank(row[field])
+                    else parse_bool(row[field], field)
+                )
+        for field in DATETIME_FIELDS:
+            if field in row:
+                if is_blank(row[field]):
+                    if field == "created_at":
+                        continue
+                    fields[field] = None
+                else:
+                    fields[field] = parse_datetime_value(row[field], field)
+        for field in CHOICE_FIELDS:
+            if field in row:
+                model_field = Product._meta.get_field(field)
+                value = model_field.get_default() if is_blank(row[field]) else str(row[field]).strip()
+                if value not in dict(model_field.choices):
+                    raise RowError(f"'{field}' no admite el valor '{value}'.")
+                fields[field] = value
+        if "stock" in row:
+            fields["stock"] = None if is_blank(row["stock"]) else parse_int(row["stock"], "stock")
+        if not is_blank(row.get("author")):
+            try:
+                fields["author"] = uuid.UUID(str(row["author"]).strip())
+            except ValueError:
+                raise RowError("'author' debe ser un UUID.")
+        for field in CATEGORY_FIELDS:
+            if field in row:
+                fields[f"{field}_id"] = (
+                    None if is_blank(row[field]) else self.lookup(self.categories, row[field], field)
+                )
+        if "thumbnail" in row:
+            fields["thumbnail_id"] = (
+                None if is_blank(row["thumbnail"]) else self.lookup(self.media, row["thumbnail"], "thumbnail")
+            )
+
+        images = None
+        if "images" in row:
+            raw = [] if is_blank(row["images"]) else parse_list(row["images"], "images")
+            images = list(dict.fromkeys(self.lookup(self.media, item, "images") for item in raw))
+
+        options = {}
+        for rel in OPTION_RELATIONS:
+            if rel in row:
+                options[rel] = self.parse_options(rel, row[rel])
+
+        skus = None
+        if "skus" in row:
+            skus = self.parse_skus(row["skus"], options)
+
+        return {"slug": slug, "fields": fields, "images": images, "options": options, "skus": skus}
+
+    def parse_options(self, rel, value):
+        entries = [] if is_blank(value) else parse_objects(value, rel)
+        parsed = {}
+        for entry in entries:
+            title = str(entry.get("title") or "").strip()
+            if not title:
+                raise RowError(f"Cada opción de '{rel}' necesita 'title'.")
+            if len(title) > 255:
+                raise RowError(f"'{rel}': el título '{title[:20]}…' es demasiado largo.")
+            option = {
+                "title": title,
+                "price": Decimal("0.00") if is_blank(entry.get("price")) else parse_decimal(entry["price"], f"{rel}.price", 10),
+                "stock": None if is_blank(entry.get("stock")) else parse_int(entry["stock"], f"{rel}.stock"),
+                "order": None if is_blank(entry.get("order")) else parse_int(entry["order"], f"{rel}.order"),
+            }
+            if rel == "colors":
+                option["hex"] = parse_text(entry.get("hex") or "", "colors.hex", 7)
+            parsed[title] = option
+        return list(parsed.values())
+
+    def parse_skus(self, value, options):
+        entries = [] if is_blank(value) else parse_objects(value, "skus")
+        parsed, combinations = [], set()
+        for entry in entries:
+            selected = {}
+            for rel, field in OPTION_RELATIONS.items():
+                title = entry.get(field)
+                if is_blank(title):
+                    continue
+                title = str(title).strip()
+                if rel not in options:
+                    raise RowError(f"El SKU usa '{field}' pero la fila no trae '{rel}'.")
+                if title not in {option["title"] for option in options[rel]}:
+                    raise RowError(f"El SKU usa '{field}' = '{title}', que no está en '{rel}'.")
+                selected[field] = title
+            combination = tuple(sorted(selected.items()))
+            if combination in combinations:
+                raise RowError("Hay dos SKUs con la misma combinación de opciones.")
+            combinations.add(combination)
+            code = None if is_blank(entry.get("sku")) else parse_text(str(entry["sku"]).strip(), "skus.sku", 64)
+            parsed.append({
+                "sku": code,
+                "stock": 0 if is_blank(entry.get("stock")) else parse_int(entry["stock"], "skus.stock"),
+                "is_active": True if is_blank(entry.get("is_active")) else parse_bool(entry["is_active"], "skus.is_active"),
+                "options": selected,
+            })
+        return parsed
+
+    # --- Escritura ---
+
+    def import_chunk(self, chunk):
+        self.report.rows += len(chunk)
+        self.load_lookups(chunk)
+
+        items = {}
+        for line, row in chunk:
+            try:
+                item = self.parse_row(row)
+            except RowError as e:
+                self.report.add_error(line, str(e))
+                continue
+            except Exception as e:
+                logger.exception("Fila %s de la importación inválida", line)
+                self.report.add_error(line, f"Fila inválida: {e}")
+                continue
+            # El mismo slug dos veces en un lote: gana la última fila
+            if item["slug"] in items:
+                self.report.duplicates += 1
+            items[item["slug"]] = dict(item, line=line)
+        items = list(items.values())
+        self.report.valid += len(items)
+        if not items or self.dry_run:
+            return
+
+        try:
+            with transaction.atomic():
+                product_ids, units, option_products = self.write(items)
+        except Exception as e:
+            # La transacción se revirtió: ninguna fila del lote se guardó
+            self.report.valid -= len(items)
+            for item in items:
+                self.report.add_error(item["line"], f"No se pudo guardar el lote: {e}")
+            return
+
+        refresh_product_cards(product_ids)
+        if self.sync_cache:
+            inventory.set_many_on_hand(units)
+            inventory.forget_product_units(*option_products)
+            invalidate_tags(CATALOG_TAG, *(product_tag(product_id) for product_id in product_ids))
+
+    def write(self, items):
+        """
+        Escribe un lote ya validado. Devuelve los ids de los productos, el stock
+        de las unidades de inventario tocadas ({(tipo, id): stock}) y los
+        productos cuyas opciones cambiaron.
+        """
+        slugs = [item["slug"] for item in items]
+        existing = set(Product.objects.filter(slug__in=slugs).values_list("slug", flat=True))
+
+        # Un bulk_create por conjunto de columnas: las ausentes no se sobrescriben
+        groups = defaultdict(list)
+        for item in items:
+            groups[frozenset(item["fields"])].append(Product(slug=item["slug"], **item["fields"]))
+        for fields, products in groups.items():
+            update_fields = {Product._meta.get_field(field).name for field in fields} | {"updated_at"}
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=["slug"],
+                update_fields=sorted(update_fields),
+            )
+
+        # Los productos existentes conservan su id; el precio guardado se usa para los SKUs
+        saved = {
+            product.slug: product
+            for product in Product.objects.filter(slug__in=slugs).only("id", "slug", "price", "compare_price")
+        }
+        ids = {slug: product.id for slug, product in saved.items()}
+        product_ids = [ids[slug] for slug in slugs]
+        self.report.created += len(slugs) - len(existing)
+        self.report.updated += len(existing)
+
+        ProductAnalytics.objects.bulk_create(
+            [ProductAnalytics(product_id=product_id) for product_id in product_ids],
+            ignore_conflicts=True,
+        )
+
+        self.write_images(items, ids)
+        units = {("product", ids[item["slug"]]): item["fields"]["stock"] for item in items if "stock" in item["fields"]}
+        options, option_products = self.write_options(items, ids, units)
+        self.write_skus(items, saved, options, units)
+
+        update_search_vector(Product.objects.filter(id__in=product_ids))
+        # Los SKUs que no vienen en el archivo dependen de precios que pueden haber cambiado
+        repriced = [
+            ids[item["slug"]] for item in items
+            if item["skus"] is None and (item["options"] or set(item["fields"]) & set(DECIMAL_FIELDS))
+        ]
+        if repriced:
+            ProductVariant.objects.filter(product_id__in=repriced).refresh_prices()
+        return product_ids, units, option_products
+
+    def write_images(self, items, ids):
+        through = Product.images.through
+        links = {ids[item["slug"]]: item["images"] for item in items if item["images"] is not None}
+        if not links:
+            return
+        through.objects.filter(product_id__in=list(links)).delete()
+        through.objects.bulk_create(
+            [
+                through(product_id=product_id, media_id=media_id)
+                for product_id, media_ids in links.items()
+                for media_id in media_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+    def write_options(self, items, ids, units):
+        """
+        Reemplaza las opciones de cada relación presente en la fila, conservando
+        (y actualizando) las que tienen el mismo título. Devuelve
+        {(producto, campo, título): opción} y los productos tocados.
+        """
+        options = {}
+        touched = set()
+        for rel, field in OPTION_RELATIONS.items():
+            targets = {ids[item["slug"]]: item["options"][rel] for item in items if rel in item["options"]}
+            if not targets:
+                continue
+            model = Product._meta.get_field(rel).related_model
+            current = defaultdict(dict)
+            stale = []
+            for option in model.objects.filter(product_id__in=list(targets)):
+                if option.title in current[option.product_id]:
+                    stale.append(option.pk)
+                else:
+                    current[option.product_id][option.title] = option
+
+            to_create, to_update = [], []
+            for product_id, entries in targets.items():
+                wanted = {entry["title"] for entry in entries}
+                stale.extend(
+                    option.pk for title, option in current[product_id].items() if title not in wanted
+                )
+                for entry in entries:
+                    option = current[product_id].get(entry["title"])
+                    if option is None:
+                        option = model(product_id=product_id)
+                        to_create.append(option)
+                    else:
+                        to_update.append(option)
+                    for name, value in entry.items():
+                        setattr(option, name, value)
+                    options[(product_id, field, entry["title"])] = option
+                    units[(field, option.pk)] = option.stock
+
+            if stale:
+                # Borrado normal: sus signals limpian SKUs, tarjetas e inventario
+                model.objects.filter(pk__in=stale).delete()
+            model.objects.bulk_create(to_create)
+            model.objects.bulk_update(
+                to_update, ["order", "price", "stock", *(["hex"] if rel == "colors" else [])],
+            )
+            touched.update(targets)
+        return options, touched
+
+    def write_skus(self, items, saved, options, units):
+        """
+        Reemplaza los SKUs de los productos con columna skus (upsert por combinación),
+        con el precio ya calculado a partir del producto y las opciones guardadas.
+        """
+        targets = {saved[item["slug"]]: item["skus"] for item in items if item["skus"] is not None}
+        if not targets:
+            return
+
+        variants = []
+        for product, entries in targets.items():
+            for entry in entries:
+                variant = ProductVariant(
+                    product=product, sku=entry["sku"], stock=entry["stock"], is_active=entry["is_active"],
+                )
+                for field, title in entry["options"].items():
+                    setattr(variant, field, options[(product.id, field, title)])
+                variant.signature = variant_signature({
+                    field: getattr(variant, f"{field}_id") for field in VARIANT_OPTION_FIELDS
+                })
+                variant.compute_prices()
+                variants.append(variant)
+
+        wanted = {(variant.product_id, variant.signature) for variant in variants}
+        product_ids = [product.id for product in targets]
+        current = ProductVariant.objects.filter(product_id__in=product_ids).values_list("pk", "product_id", "signature")
+        stale = [pk for pk, product_id, signature in current if (product_id, signature) not in wanted]
+        if stale:
+            ProductVariant.objects.filter(pk__in=stale).delete()
+
+        ProductVariant.objects.bulk_create(
+            variants,
+            update_conflicts=True,
+            unique_fields=["product", "signature"],
+            update_fields=["sku", "price", "compare_price", "stock", "is_active", "updated_at"],
+        )
+        # Las combinaciones que ya existían conservan su id
+        stock = {(variant.product_id, variant.signature): variant.stock for variant in variants}
+        rows = ProductVariant.objects.filter(product_id__in=product_ids).values_list("pk", "product_id", "signature")
+        for pk, product_id, signature in rows:
+            units[("sku", pk)] = stock[(product_id, signature)]
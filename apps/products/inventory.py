@@ -0,0 +1,415 @@
+import logging
+import time
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Product, ProductVariant, VARIANT_OPTION_FIELDS
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+# Cada unidad de inventario (producto, opción o SKU) es un hash con
+# on_hand (espejo de la columna stock), reserved (reservas activas) y
+# version (sube con cada cambio de stock, ver reconcile).
+UNIT_KEY_PREFIX = "inventory:unit"
+# Set con las unidades de opciones de un producto (para ProductStockView)
+PRODUCT_UNITS_KEY_PREFIX = "inventory:units"
+PRODUCT_UNITS_LOADED = "__loaded__"
+# Hash {unidad: cantidad} de una reserva y sorted set de reservas por vencimiento
+RESERVATION_KEY_PREFIX = "inventory:reservation"
+RESERVATIONS_KEY = "inventory:reservations"
+
+UNIT_MODELS = {
+    "product": Product,
+    "sku": ProductVariant,
+    **{field: ProductVariant._meta.get_field(field).related_model for field in VARIANT_OPTION_FIELDS},
+}
+UNIT_KINDS = {model: kind for kind, model in UNIT_MODELS.items()}
+
+
+class InsufficientStock(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "No hay stock suficiente para completar la compra."
+    default_code = "insufficient_stock"
+
+
+# Reserva todas las unidades o ninguna.
+# KEYS: unidades..., hash de la reserva, sorted set de reservas
+# ARGV: cantidades..., id de la reserva, vencimiento
+# Devuelve {1} reservada, {2} ya existía, {0, i} sin stock, {-1, i} contador sin cargar
+RESERVE_SCRIPT = redis_client.register_script("""
+local n = #KEYS - 2
+if redis.call('EXISTS', KEYS[n + 1]) == 1 then
+  return {2}
+end
+for i = 1, n do
+  local on_hand = redis.call('HGET', KEYS[i], 'on_hand')
+  if not on_hand then
+    return {-1, i}
+  end
+  local reserved = tonumber(redis.call('HGET', KEYS[i], 'reserved') or '0')
+  if tonumber(on_hand) - reserved < tonumber(ARGV[i]) then
+    return {0, i}
+  end
+end
+for i = 1, n do
+  redis.call('HINCRBY', KEYS[i], 'reserved', ARGV[i])
+  redis.call('HSET', KEYS[n + 1], KEYS[i], ARGV[i])
+end
+redis.call('ZADD', KEYS[n + 2], ARGV[n + 2], ARGV[n + 1])
+return {1}
+""")
+
+# Cierra una reserva. KEYS: hash de la reserva, sorted set; ARGV: id, "1" si se
+# vendió (descuenta on_hand) o "0" si se libera. Devuelve [unidad, cantidad, ...].
+FINISH_SCRIPT = redis_client.register_script("""
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+  redis.call('HINCRBY', entries[i], 'reserved', -tonumber(entries[i + 1]))
+  if ARGV[2] == '1' then
+    redis.call('HINCRBY', entries[i], 'on_hand', -tonumber(entries[i + 1]))
+    redis.call('HINCRBY', entries[i], 'version', 1)
+  end
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return entries
+""")
+
+# Vuelve a alinear on_hand con la base de datos y reserved con las reservas activas.
+# KEYS: unidades..., sorted set; ARGV: stock de cada unidad ("" = ya no existe),
+# versión de cada unidad al leer ese stock, prefijo de reservas. Las unidades
+# cuya versión cambió desde entonces conservan on_hand (el stock leído ya es viejo).
+RECONCILE_SCRIPT = redis_client.register_script("""
+local n = #KEYS - 1
+local reserved = {}
+for i = 1, n do
+  reserved[KEYS[i]] = 0
+end
+for _, id in ipairs(redis.call('ZRANGE', KEYS[n + 1], 0, -1)) do
+  local entries = redis.call('HGETALL', ARGV[2 * n + 1] .. ':' .. id)
+  for j = 1, #entries, 2 do
+    if reserved[entries[j]] ~= nil then
+      reserved[entries[j]] = reserved[entries[j]] + tonumber(entries[j + 1])
+    end
+  end
+end
+local skipped = 0
+for i = 1, n do
+  if (redis.call('HGET', KEYS[i], 'version') or '0') ~= ARGV[n + i] then
+    skipped = skipped + 1
+    redis.call('HSET', KEYS[i], 'reserved', reserved[KEYS[i]])
+  elseif ARGV[i] == '' then
+    redis.call('DEL', KEYS[i])
+  else
+    redis.call('HSET', KEYS[i], 'on_hand', ARGV[i], 'reserved', reserved[KEYS[i]])
+  end
+end
+return skipped
+""")
+
+
+# Descuenta on_hand de las unidades vendidas sin reserva que ya están en redis
+# (las demás se cargan de la base de datos al usarlas). KEYS: unidades; ARGV: cantidades
+DECREMENT_SCRIPT = redis_client.register_script("""
+for i = 1, #KEYS do
+  if redis.call('EXISTS', KEYS[i]) == 1 then
+    redis.call('HINCRBY', KEYS[i], 'on_hand', -tonumber(ARGV[i]))
+    redis.call('HINCRBY', KEYS[i], 'version', 1)
+  end
+end
+return #KEYS
+""")
+
+
+def unit_key(kind, pk):
+    return f"{UNIT_KEY_PREFIX}:{kind}:{pk}"
+
+
+def parse_unit_key(key):
+    if isinstance(key, bytes):
+        key = key.decode()
+    kind, pk = key.split(":")[-2:]
+    return kind, pk
+
+
+def reservation_key(reservation_id):
+    return f"{RESERVATION_KEY_PREFIX}:{reservation_id}"
+
+
+def product_units_key(product_id):
+    return f"{PRODUCT_UNITS_KEY_PREFIX}:{product_id}"
+
+
+def fetch_db_stock(keys):
+    """
+    {unidad: stock} leído de la base de datos (una consulta por tipo de unidad).
+    Las unidades que ya no existen o no controlan stock (stock nulo) no aparecen.
+    """
+    ids_by_kind = defaultdict(dict)
+    for key in keys:
+        kind, pk = parse_unit_key(key)
+        ids_by_kind[kind][pk] = key
+    stock = {}
+    for kind, ids in ids_by_kind.items():
+        rows = UNIT_MODELS[kind].objects.filter(pk__in=list(ids)).values_list("pk", "stock")
+        for pk, value in rows:
+            if value is not None:
+                stock[ids[str(pk)]] = value
+    return stock
+
+
+def load_counters(keys):
+    """
+    Crea (sin pisar) los contadores de las unidades que aún no están en redis.
+    """
+    stock = fetch_db_stock(keys)
+    pipe = redis_client.pipeline()
+    for key, value in stock.items():
+        pipe.hsetnx(key, "on_hand", value)
+    pipe.execute()
+    return stock
+
+
+def set_on_hand(kind, pk, stock):
+    """
+    Refleja en redis un cambio de la columna stock (p. ej. reposición desde el admin).
+    """
+    set_many_on_hand({(kind, pk): stock})
+
+
+def set_many_on_hand(stocks):
+    """
+    Igual que set_on_hand para muchas unidades ({(tipo, id): stock}) en un solo pipeline.
+    """
+    if not stocks:
+        return
+    pipe = redis_client.pipeline()
+    for (kind, pk), stock in stocks.items():
+        if stock is None:
+            pipe.delete(unit_key(kind, pk))
+        else:
+            pipe.hset(unit_key(kind, pk), "on_hand", stock)
+            pipe.hincrby(unit_key(kind, pk), "version", 1)
+    pipe.execute()
+
+
+def bump_versions(keys):
+    pipe = redis_client.pipeline()
+    for key in keys:
+        pipe.hincrby(key, "version", 1)
+    pipe.execute()
+
+
+def forget_product_units(*product_ids):
+    """
+    Olvida el set de opciones de los productos; se vuelve a cargar en la siguiente lectura.
+    """
+    if product_ids:
+        redis_client.delete(*(product_units_key(product_id) for product_id in product_ids))
+
+
+def product_cart_items(items):
+    """
+    Los CartItems de productos y {producto: stock} de sus productos (una consulta).
+    """
+    items = [ci for ci in items if ci.content_type.model == "product"]
+    product_stock = dict(
+        Product.objects.filter(pk__in={ci.object_id for ci in items}).values_list("pk", "stock")
+    )
+    return items, product_stock
+
+
+def reserves_product(ci):
+    """
+    Si el ítem reserva el stock del producto: sólo sin SKU ni opciones con stock.
+    """
+    return not ci.sku_id and not any(
+        getattr(ci, field) is not None and getattr(ci, field).stock is not None
+        for field in VARIANT_OPTION_FIELDS
+    )
+
+
+def cart_item_units(items):
+    """
+    {unidad: cantidad} a reservar para los CartItems de productos. Cada ítem reserva
+    su SKU (si tiene) y además las opciones elegidas con stock, así las ventas por
+    SKU también descuentan las opciones que cubren, que son las que suma
+    product_available_stock. Sin SKU ni opciones con stock, reserva el del producto.
+    """
+    items, product_stock = product_cart_items(items)
+    units = defaultdict(int)
+    for ci in items:
+        if ci.sku_id:
+            units[unit_key("sku", ci.sku_id)] += ci.count
+        for field in VARIANT_OPTION_FIELDS:
+            option = getattr(ci, field)
+            if option is not None and option.stock is not None:
+                units[unit_key(field, option.pk)] += ci.count
+        if reserves_product(ci) and product_stock.get(ci.object_id) is not None:
+            units[unit_key("product", ci.object_id)] += ci.count
+    return dict(units)
+
+
+def cart_item_product_units(items):
+    """
+    {unidad de producto: cantidad} que se vende sin reservarla: la de los ítems
+    con SKU u opciones. La columna Product.stock baja igual con cada venta (ver
+    commit), porque la siguen leyendo el admin, el exportador y los productos sin opciones.
+    """
+    items, product_stock = product_cart_items(items)
+    units = defaultdict(int)
+    for ci in items:
+        if not reserves_product(ci) and product_stock.get(ci.object_id) is not None:
+            units[unit_key("product", ci.object_id)] += ci.count
+    return dict(units)
+
+
+def reserve(reservation_id, units, ttl=None):
+    """
+    Reserva atómicamente `units` ({unidad: cantidad}) bajo `reservation_id`.
+    Lanza InsufficientStock si alguna unidad no alcanza; la reserva vence a los
+    `ttl` segundos (ver release_expired) si no se confirma o libera antes.
+    """
+    if not units:
+        return
+    ttl = ttl or settings.INVENTORY_RESERVATION_TTL
+    keys = list(units)
+    for _ in range(2):
+        result = RESERVE_SCRIPT(
+            keys=[*keys, reservation_key(reservation_id), RESERVATIONS_KEY],
+            args=[*(units[key] for key in keys), reservation_id, time.time() + ttl],
+        )
+        if result[0] in (1, 2):
+            return
+        if result[0] == 0:
+            raise InsufficientStock()
+        # Algún contador aún no estaba en redis: se carga y se reintenta una vez
+        load_counters(keys)
+    raise InsufficientStock()
+
+
+def release(reservation_id):
+    """
+    Devuelve al disponible lo retenido por la reserva (pago fallido o vencido).
+    """
+    FINISH_SCRIPT(keys=[reservation_key(reservation_id), RESERVATIONS_KEY], args=[reservation_id, "0"])
+
+
+def commit(reservation_id, units=None, unreserved=None):
+    """
+    Confirma la venta: descuenta las unidades de la reserva en redis y en la
+    columna stock. Si la reserva ya venció, se descuentan las `units` indicadas.
+    `unreserved` son unidades vendidas sin reservarlas (ver cart_item_product_units):
+    se descuentan igual, en redis sólo si su contador ya está cargado.
+    La versión de las unidades sube otra vez al confirmarse la transacción, así
+    reconcile descarta el stock que haya leído antes de ver la venta.
+    """
+    entries = FINISH_SCRIPT(keys=[reservation_key(reservation_id), RESERVATIONS_KEY], args=[reservation_id, "1"])
+    sold = {entries[i].decode(): int(entries[i + 1]) for i in range(0, len(entries), 2)}
+    if not sold and units:
+        logger.warning("La reserva %s venció antes de confirmarse", reservation_id)
+        sold = dict(units)
+        pipe = redis_client.pipeline()
+        for key, count in sold.items():
+            pipe.hincrby(key, "on_hand", -count)
+            pipe.hincrby(key, "version", 1)
+        pipe.execute()
+
+    decrements = defaultdict(int, sold)
+    if unreserved:
+        keys = list(unreserved)
+        DECREMENT_SCRIPT(keys=keys, args=[unreserved[key] for key in keys])
+        for key, count in unreserved.items():
+            decrements[key] += count
+
+    for key, count in decrements.items():
+        kind, pk = parse_unit_key(key)
+        UNIT_MODELS[kind].objects.filter(pk=pk).update(stock=F("stock") - count)
+    if decrements:
+        keys = list(decrements)
+        transaction.on_commit(lambda: bump_versions(keys))
+    return sold
+
+
+def release_expired(limit=500):
+    """
+    Libera las reservas vencidas. La ejecuta periódicamente una tarea de Celery.
+    """
+    expired = redis_client.zrangebyscore(RESERVATIONS_KEY, "-inf", time.time(), start=0, num=limit)
+    for reservation_id in expired:
+        release(reservation_id.decode())
+    return len(expired)
+
+
+def reconcile(batch_size=500):
+    """
+    Alinea todos los contadores con la columna stock de la base de datos y
+    recalcula lo reservado a partir de las reservas activas. La versión de cada
+    unidad se lee antes que su stock: si una venta o reposición la cambia
+    mientras tanto, su on_hand no se toca y se alinea en la siguiente pasada.
+    """
+    keys = list(redis_client.scan_iter(f"{UNIT_KEY_PREFIX}:*", count=batch_size))
+    skipped = 0
+    for start in range(0, len(keys), batch_size):
+        batch = [key.decode() for key in keys[start:start + batch_size]]
+        pipe = redis_client.pipeline()
+        for key in batch:
+            pipe.hget(key, "version")
+        versions = [(version or b"0").decode() for version in pipe.execute()]
+        stock = fetch_db_stock(batch)
+        skipped += RECONCILE_SCRIPT(
+            keys=[*batch, RESERVATIONS_KEY],
+            args=[*(stock.get(key, "") for key in batch), *versions, RESERVATION_KEY_PREFIX],
+        )
+    if skipped:
+        logger.info("reconcile omitió %s unidades que cambiaron durante la pasada", skipped)
+    return len(keys)
+
+
+def load_product_units(product_id):
+    """
+    Carga en redis las opciones con stock del producto y su set de unidades.
+    """
+    keys = []
+    for field in VARIANT_OPTION_FIELDS:
+        model = UNIT_MODELS[field]
+        ids = model.objects.filter(product_id=product_id, stock__isnull=False).values_list("pk", flat=True)
+        keys.extend(unit_key(field, pk) for pk in ids)
+    load_counters(keys)
+    redis_client.sadd(product_units_key(product_id), PRODUCT_UNITS_LOADED, *keys)
+    return keys
+
+
+def product_available_stock(product_id):
+    """
+    Stock disponible del producto (la suma de sus opciones, como Product.total_stock)
+    menos lo reservado, leído de los contadores de redis.
+    """
+    members = redis_client.smembers(product_units_key(product_id))
+    if members:
+        keys = [member.decode() for member in members if member.decode() != PRODUCT_UNITS_LOADED]
+    else:
+        keys = load_product_units(product_id)
+
+    pipe = redis_client.pipeline()
+    for key in keys:
+        pipe.hmget(key, "on_hand", "reserved")
+    counters = pipe.execute()
+
+    missing = [key for key, (on_hand, _) in zip(keys, counters) if on_hand is None]
+    if missing:
+        load_counters(missing)
+        pipe = redis_client.pipeline()
+        for key in keys:
+            pipe.hmget(key, "on_hand", "reserved")
+        counters = pipe.execute()
+
+    return sum(int(on_hand) - int(reserved or 0) for on_hand, reserved in counters if on_hand is not None)
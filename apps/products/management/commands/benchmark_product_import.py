@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.assets.models import Media
+from apps.products.cards import refresh_product_cards
+from apps.products.importer import DEFAULT_CHUNK_SIZE, ProductImporter, fake_product_rows
+from apps.products.models import Product
+
+
+def legacy_import(rows):
+    # Implementación anterior (GenerateFakeProductsView): un create + images.set por fila,
+    # con todas las signals de Product por producto
+    for _, row in rows:
+        row = dict(row)
+        images = row.pop("images")
+        thumbnail = row.pop("thumbnail")
+        product = Product.objects.create(thumbnail_id=thumbnail or None, **row)
+        product.images.set(images)
+        # Lo que esas signals dejan para on_commit (aquí no hay commit: todo se revierte).
+        # La tarjeta se recalcula dos veces, tras el create y tras images.set; los
+        # contadores de inventario y los tags de caché viven en redis y no se tocan
+        refresh_product_cards([product.id])
+        refresh_product_cards([product.id])
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la importación por lotes frente a la creación fila a fila. "
+        "Todo se hace dentro de una transacción que se revierte al terminar y sin "
+        "escribir en redis: ni contadores de inventario ni invalidación de la caché."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Filas para el importador por lotes.")
+        parser.add_argument("--legacy-rows", type=int, default=500, help="Filas para la creación fila a fila.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--variants", action="store_true", help="Cada producto con 2 colores, 2 tallas y 4 SKUs.")
+
+    def handle(self, *args, **options):
+        media_ids = list(Media.objects.filter(media_type="image").values_list("id", flat=True)[:20])
+
+        self.stdout.write("Generando filas...")
+        rows = list(fake_product_rows(options["rows"], media_ids, variants=options["variants"]))
+        legacy_rows = list(fake_product_rows(options["legacy_rows"], media_ids))
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            legacy_import(legacy_rows)
+            legacy_elapsed = time.perf_counter() - started
+            legacy_rate = len(legacy_rows) / legacy_elapsed if legacy_elapsed else 0.0
+            self.stdout.write(
+                f"{'antes (create + images.set por fila)':<40} {len(legacy_rows):>8} filas "
+                f"{legacy_elapsed:8.1f} s {legacy_rate:10.1f} filas/s"
+            )
+
+            def progress(report):
+                if report.chunks % 10 == 0:
+                    self.stdout.write(f"  {report.rows} filas ({report.rows_per_second} filas/s)")
+
+            importer = ProductImporter(chunk_size=options["chunk_size"], sync_cache=False)
+            report = importer.run(rows, progress=progress)
+            self.stdout.write(
+                f"{'después (ProductImporter)':<40} {report.rows:>8} filas "
+                f"{report.elapsed:8.1f} s {report.rows_per_second:10.1f} filas/s"
+            )
+            if report.invalid:
+                self.stderr.write(f"{report.invalid} filas inválidas: {report.errors[:5]}")
+            transaction.set_rollback(True)
+
+        if legacy_rate:
+            self.stdout.write(self.style.SUCCESS(
+                f"{report.rows_per_second / legacy_rate:.1f}x más filas por segundo "
+                f"({options['rows']} filas en {report.elapsed:.1f} s frente a ~{options['rows'] / legacy_rate:.0f} s fila a fila)."
+            ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from utils.cache_utils import get_cache_metrics, reset_cache_metrics
+
+
+class Command(BaseCommand):
+    help = "Muestra aciertos, fallos, bloqueos y tiempos de recálculo de caché por endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reinicia los contadores después de mostrarlos.")
+
+    def handle(self, *args, **options):
+        metrics = get_cache_metrics()
+        if not metrics:
+            self.stdout.write("Aún no hay métricas de caché.")
+        for prefix, values in sorted(metrics.items()):
+            self.stdout.write(
+                f"{prefix}: {values['hits']} aciertos, {values['stale']} obsoletas, "
+                f"{values['misses']} fallos (hit rate {values['hit_rate']:.2%}); "
+                f"{values['lock_contention']} esperas de lock, "
+                f"recálculo medio {values['avg_recompute_ms']} ms"
+            )
+        if options["reset"]:
+            reset_cache_metrics()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.importer import DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, ProductImporter, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa productos desde un archivo CSV o JSON Lines por lotes, con upsert por slug."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archivo a importar ('-' lee de la entrada estándar).")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Por defecto se deduce de la extensión.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Sólo valida las filas, sin escribir.")
+
+    def write_progress(self, report):
+        self.stdout.write(
+            f"Lote {report.chunks}: {report.rows} filas, {report.created} creados, "
+            f"{report.updated} actualizados, {report.invalid} inválidas ({report.rows_per_second} filas/s)"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or guess_format(path)
+        if fmt not in IMPORT_FORMATS:
+            raise CommandError(f"No se pudo deducir el formato de '{path}'; usa --format.")
+
+        importer = ProductImporter(chunk_size=options["chunk_size"], dry_run=options["dry_run"])
+        if path == "-":
+            report = importer.run(read_rows(sys.stdin.buffer, fmt), progress=self.write_progress)
+        else:
+            try:
+                stream = open(path, "rb")
+            except OSError as e:
+                raise CommandError(str(e))
+            with stream:
+                report = importer.run(read_rows(stream, fmt), progress=self.write_progress)
+
+        for error in report.errors:
+            self.stderr.write(f"Línea {error['line']}: {error['error']}")
+        if report.invalid > len(report.errors):
+            self.stderr.write(f"... y {report.invalid - len(report.errors)} filas inválidas más.")
+
+        if options["dry_run"]:
+            message = f"{report.valid} filas válidas de {report.rows} (sin escribir)."
+        else:
+            message = (
+                f"Se importaron {report.created + report.updated} productos ({report.created} nuevos, "
+                f"{report.updated} actualizados) en {report.elapsed:.1f} s ({report.rows_per_second} filas/s)."
+            )
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.cards import rebuild_all_product_cards
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el modelo de lectura ProductCard para todos los productos publicados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        refreshed = rebuild_all_product_cards(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Se reconstruyeron {refreshed} tarjetas de producto."))
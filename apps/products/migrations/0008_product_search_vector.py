@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:22
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+# Pesos del vector en este punto del esquema (ver apps.products.search)
+SEARCH_VECTOR_WEIGHTS = (
+    ('title', 'A'),
+    ('keywords', 'B'),
+    ('short_description', 'C'),
+    ('description', 'D'),
+)
+
+
+def populate_search_vector(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    config = getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'simple')
+    vector = None
+    for field, weight in SEARCH_VECTOR_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    Product.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_alter_categoryinteraction_interaction_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:27
+
+from decimal import Decimal
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+VARIANT_FIELDS = {
+    'colors': ('id', 'order', 'title', 'hex', 'price', 'stock'),
+    'sizes': ('id', 'order', 'title', 'price', 'stock'),
+    'materials': ('id', 'order', 'title', 'price', 'stock'),
+    'weights': ('id', 'order', 'title', 'price', 'stock'),
+    'flavors': ('id', 'order', 'title', 'price', 'stock'),
+}
+
+CARD_COPY_FIELDS = (
+    'author', 'title', 'short_description', 'slug',
+    'price', 'compare_price', 'discount', 'discount_until',
+    'limited_edition', 'condition', 'packaging',
+    'category_id', 'sub_category_id', 'topic_id', 'created_at',
+)
+
+
+def variant_data(attr, fields):
+    data = {}
+    for field in fields:
+        value = getattr(attr, field)
+        if field == 'id':
+            value = str(value)
+        elif field == 'price' and value is not None:
+            value = str(Decimal(value).quantize(Decimal('0.01')))
+        data[field] = value
+    return data
+
+
+def populate_product_cards(apps, schema_editor):
+    """
+    Tarjetas de los productos ya publicados, igual que las construye
+    apps.products.cards en este punto del esquema.
+    """
+    Product = apps.get_model('products', 'Product')
+    ProductCard = apps.get_model('products', 'ProductCard')
+    products = (
+        Product.objects
+        .filter(status='published', hidden=False, banned=False)
+        .select_related('thumbnail', 'product_analytics')
+        .prefetch_related('images', *VARIANT_FIELDS.keys())
+    )
+    cards = []
+    for product in products.iterator(chunk_size=500):
+        card = ProductCard(product=product)
+        for field in CARD_COPY_FIELDS:
+            setattr(card, field, getattr(product, field))
+
+        cheapest = Decimal('0.00')
+        total_stock = 0
+        variants = {}
+        for rel, fields in VARIANT_FIELDS.items():
+            attrs = list(getattr(product, rel).all())
+            prices = [a.price for a in attrs if a.price]
+            if prices:
+                cheapest += min(prices)
+            total_stock += sum((a.stock or 0) for a in attrs)
+            variants[rel] = [variant_data(a, fields) for a in attrs]
+        card.min_price = (product.price or Decimal('0.00')) + cheapest
+        card.min_compare_price = (product.compare_price or Decimal('0.00')) + cheapest
+        card.total_stock = total_stock
+        card.variants = variants
+
+        image = product.thumbnail
+        if image is None:
+            images = sorted(product.images.all(), key=lambda media: media.pk)
+            image = images[0] if images else None
+        card.thumbnail_key = getattr(image, 'key', None) or None
+
+        try:
+            analytics = product.product_analytics
+        except ObjectDoesNotExist:
+            analytics = None
+        card.average_rating = analytics.average_rating if analytics else 0.0
+        card.review_count = analytics.review_count if analytics else 0
+        cards.append(card)
+    ProductCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='products.product')),
+                ('author', models.UUIDField()),
+                ('title', models.CharField(blank=True, max_length=255, null=True)),
+                ('short_description', models.TextField(blank=True, default='', max_length=169, null=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('compare_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('discount', models.BooleanField(default=False)),
+                ('discount_until', models.DateTimeField(blank=True, null=True)),
+                ('limited_edition', models.BooleanField(default=False)),
+                ('condition', models.CharField(default='new', max_length=255)),
+                ('packaging', models.CharField(default='normal', max_length=255)),
+                ('min_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('min_compare_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('total_stock', models.IntegerField(default=0)),
+                ('thumbnail_key', models.CharField(blank=True, max_length=256, null=True)),
+                ('average_rating', models.FloatField(default=0.0)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('variants', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category')),
+                ('sub_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category')),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category')),
+            ],
+            options={
+                'ordering': ('created_at',),
+                'indexes': [models.Index(fields=['min_price'], name='products_pr_min_pri_78115b_idx'), models.Index(fields=['average_rating'], name='products_pr_average_4667cb_idx')],
+            },
+        ),
+        migrations.RunPython(populate_product_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+def populate_category_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.only('id', 'parent_id'))
+    by_id = {category.id: category for category in categories}
+    paths = {}
+
+    def resolve(category):
+        if category.id not in paths:
+            parent = by_id.get(category.parent_id)
+            prefix = resolve(parent) if parent else ''
+            paths[category.id] = f"{prefix}{category.id.hex}/"
+        return paths[category.id]
+
+    for category in categories:
+        category.path = resolve(category)
+    Category.objects.bulk_update(categories, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['text_pattern_ops']),
+        ),
+        migrations.RunPython(populate_category_paths, migrations.RunPython.noop),
+    ]
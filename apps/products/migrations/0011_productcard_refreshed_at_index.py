@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_category_path'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['refreshed_at'], name='products_pr_refresh_3cf43a_idx'),
+        ),
+    ]
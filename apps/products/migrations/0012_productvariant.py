@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:51
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_productcard_refreshed_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sku', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('signature', models.CharField(editable=False, max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10)),
+                ('compare_price', models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10)),
+                ('stock', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('color', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.color')),
+                ('flavor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.flavor')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.material')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.product')),
+                ('size', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.size')),
+                ('weight', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='products.weight')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(fields=('product', 'signature'), name='unique_product_variant_signature'),
+        ),
+    ]
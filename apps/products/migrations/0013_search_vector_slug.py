@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+# Pesos del vector en este punto del esquema (ver apps.products.search)
+SEARCH_VECTOR_WEIGHTS = (
+    ('title', 'A'),
+    ('keywords', 'B'),
+    ('short_description', 'C'),
+    ('description', 'D'),
+    ('slug', 'D'),
+)
+
+
+def populate_search_vector(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    config = getattr(settings, 'PRODUCT_SEARCH_CONFIG', 'simple')
+    vector = None
+    for field, weight in SEARCH_VECTOR_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    Product.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_productvariant'),
+    ]
+
+    operations = [
+        # El vector ahora incluye el slug (peso D)
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,12 @@ import uuid
 from datetime import timedelta
 from decimal import Decimal
 
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Min, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.conf import settings
 from django.utils.html import format_html
@@ -33,11 +38,51 @@ class Category(models.Model):
     )
     slug = models.CharField(max_length=128)
 
+    # --- Árbol materializado: ids (hex) de los ancestros y el propio, terminados en "/" ---
+    path = models.TextField(blank=True, default="", editable=False)
+
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        """
+        Mantiene `path` al crear o mover la categoría y actualiza
+        los paths de todo el subárbol con un solo UPDATE.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "parent" not in update_fields:
+            return super().save(*args, **kwargs)
+
+        old_path = self.path
+        parent_path = ""
+        if self.parent_id:
+            parent_path = Category.objects.values_list("path", flat=True).get(pk=self.parent_id)
+            if old_path and parent_path.startswith(old_path):
+                raise ValueError("Una categoría no puede moverse dentro de su propio subárbol.")
+        self.path = f"{parent_path}{self.id.hex}/"
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"path"}
+
+        super().save(*args, **kwargs)
+
+        if old_path and old_path != self.path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr("path", len(old_path) + 1))
+            )
+
+    @property
+    def depth(self):
+        return max(self.path.count("/") - 1, 0)
+
+    def get_descendants(self, include_self=False):
+        qs = Category.objects.filter(path__startswith=self.path)
+        return qs if include_self else qs.exclude(pk=self.pk)
+
+    def get_ancestor_ids(self):
+        return [uuid.UUID(part) for part in self.path.split("/")[:-2]]
     
     @admin.display(description="Thumbnail", ordering="thumbnail")
     def thumbnail_preview(self):
@@ -51,6 +96,9 @@ class Category(models.Model):
     
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(fields=["path"], name="category_path_idx", opclasses=["text_pattern_ops"]),
+        ]
 
 
 class CategoryInteraction(models.Model):
@@ -174,6 +222,80 @@ class CategoryAnalytics(models.Model):
                 update_func()
 
 
+# Relaciones de variantes de un producto (ProductAttributeBase)
+VARIANT_RELATIONS = ("colors", "sizes", "materials", "weights", "flavors")
+
+
+# Tipo de los agregados de precio de variantes
+PRICE_TOTAL_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def _variant_aggregate(self, aggregate, output_field, **filters):
+        """
+        Suma en SQL un agregado por tabla de variantes: una subconsulta
+        correlacionada por relación (0 si el producto no tiene variantes).
+        """
+        total = None
+        for rel in VARIANT_RELATIONS:
+            model = self.model._meta.get_field(rel).related_model
+            subquery = (
+                model.objects
+                .filter(product=OuterRef("pk"), **filters)
+                .order_by()
+                .values("product")
+                .annotate(value=aggregate)
+                .values("value")
+            )
+            part = Coalesce(Subquery(subquery), Value(0), output_field=output_field)
+            total = part if total is None else total + part
+        return total
+
+    def with_variant_totals(self):
+        """
+        Anota los totales de variantes que antes se calculaban en Python:
+        - variants_stock: stock de todas las variantes (Product.total_stock),
+        - variants_price: suma de sus precios (Product.total_attributes_price),
+        - min_total_price: precio base + la variante más barata con precio de cada
+          tipo (ProductListSerializer.get_min_price).
+        """
+        return self.annotate(
+            variants_stock=self._variant_aggregate(Sum("stock"), models.IntegerField()),
+            variants_price=self._variant_aggregate(Sum("price"), PRICE_TOTAL_FIELD),
+            min_total_price=(
+                Coalesce(F("price"), Value(0), output_field=PRICE_TOTAL_FIELD)
+                + self._variant_aggregate(Min("price"), PRICE_TOTAL_FIELD, price__gt=0)
+            ),
+        )
+
+    def for_cards(self):
+        """
+        Carga en un número fijo de consultas todo lo que lee ProductListSerializer:
+        thumbnail, imágenes, categorías, variantes y las anotaciones de stock,
+        precio mínimo y valoración.
+        Las relaciones de las categorías (padre, hijos, hermanos) se resuelven
+        después sobre la lista con category_tree.attach_category_relations.
+        """
+        return (
+            self
+            .with_variant_totals()
+            .select_related("thumbnail", "category", "sub_category", "topic")
+            .prefetch_related(
+                Prefetch("images", queryset=Media.objects.order_by("pk")),
+                *VARIANT_RELATIONS,
+            )
+            .annotate(
+                analytics_avg_rating=Coalesce(
+                    F("product_analytics__average_rating"), Value(0), output_field=models.FloatField()
+                ),
+                analytics_review_count=Coalesce(
+                    F("product_analytics__review_count"), Value(0), output_field=models.IntegerField()
+                ),
+            )
+        )
+
+
 class Product(Reviewable, models.Model):
     # --- Identificación básica ---
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -268,15 +390,21 @@ class Product(Reviewable, models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # --- Búsqueda (mantenido por signals.update_product_search_vector) ---
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
     # --- Managers ---
-    objects = models.Manager()
-    class PostObjects(models.Manager):
+    objects = ProductQuerySet.as_manager()
+    class PostObjects(models.Manager.from_queryset(ProductQuerySet)):
         def get_queryset(self):
             return super().get_queryset().filter(status="published", hidden=False, banned=False)
     postobjects = PostObjects()
 
     class Meta:
         ordering = ("created_at",)
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_vector_gin"),
+        ]
 
     def __str__(self):
         return self.title or "Sin título"
@@ -303,7 +431,10 @@ class Product(Reviewable, models.Model):
     def total_stock(self) -> int:
         """
         Suma el stock de todos los atributos relacionados.
+        Usa la anotación de ProductQuerySet.with_variant_totals si está disponible.
         """
+        if hasattr(self, "variants_stock"):
+            return self.variants_stock
         total = 0
         # Estas relaciones vienen de ProductAttributeBase:
         for rel in ('colors', 'sizes', 'materials', 'weights', 'flavors'):
@@ -316,7 +447,10 @@ class Product(Reviewable, models.Model):
     def total_attributes_price(self) -> Decimal:
         """
         Suma el precio de todos los atributos relacionados.
+        Usa la anotación de ProductQuerySet.with_variant_totals si está disponible.
         """
+        if hasattr(self, "variants_price"):
+            return self.variants_price
         total = Decimal('0.00')
         for rel in ('colors', 'sizes', 'materials', 'weights', 'flavors'):
             total += sum((attr.price or Decimal('0.00')) for attr in getattr(self, rel).all())
@@ -566,6 +700,58 @@ class ProductAnalytics(models.Model):
                 update_func()
 
 
+class ProductCard(models.Model):
+    """
+    Modelo de lectura desnormalizado para los listados de productos.
+    Una fila por producto publicado, mantenida por apps.products.cards.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE,
+                                   primary_key=True, related_name="card")
+    author = models.UUIDField()
+
+    # --- Copia de los campos que muestra la tarjeta ---
+    title = models.CharField(max_length=255, blank=True, null=True)
+    short_description = models.TextField(max_length=169, blank=True, null=True, default="")
+    slug = models.SlugField(unique=True)
+    price = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+    compare_price = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True)
+    discount = models.BooleanField(default=False)
+    discount_until = models.DateTimeField(blank=True, null=True)
+    limited_edition = models.BooleanField(default=False)
+    condition = models.CharField(max_length=255, default="new")
+    packaging = models.CharField(max_length=255, default="normal")
+
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, blank=True,
+                                 null=True, related_name="+")
+    sub_category = models.ForeignKey(Category, on_delete=models.SET_NULL, blank=True,
+                                     null=True, related_name="+")
+    topic = models.ForeignKey(Category, on_delete=models.SET_NULL, blank=True,
+                              null=True, related_name="+")
+
+    # --- Valores precalculados ---
+    min_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    min_compare_price = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_stock = models.IntegerField(default=0)
+    thumbnail_key = models.CharField(max_length=256, blank=True, null=True)
+    average_rating = models.FloatField(default=0.0)
+    review_count = models.PositiveIntegerField(default=0)
+    variants = models.JSONField(default=dict)  # {"colors": [...], "sizes": [...], ...}
+
+    created_at = models.DateTimeField(default=timezone.now)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("created_at",)
+        indexes = [
+            models.Index(fields=["min_price"]),
+            models.Index(fields=["average_rating"]),
+            models.Index(fields=["refreshed_at"]),
+        ]
+
+    def __str__(self):
+        return f"Card for {self.title}"
+
+
 class Detail(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     order = models.PositiveIntegerField(null=True, blank=True)
@@ -675,6 +861,117 @@ class Flavor(ProductAttributeBase):
     )
 
 
+# Opciones que forman una combinación (mismos nombres que en CartItem)
+VARIANT_OPTION_FIELDS = ("color", "size", "material", "weight", "flavor")
+
+
+def variant_signature(options):
+    """
+    Firma canónica de una combinación a partir de {opción: id}:
+    "color=<hex>;size=<hex>". Las opciones vacías no forman parte de la firma.
+    """
+    parts = []
+    for field in VARIANT_OPTION_FIELDS:
+        value = options.get(field)
+        if value:
+            parts.append(f"{field}={uuid.UUID(str(value)).hex}")
+    return ";".join(parts)
+
+
+class ProductVariantQuerySet(models.QuerySet):
+
+    def for_options(self, product_id, **options):
+        return self.filter(product_id=product_id, signature=variant_signature(options))
+
+    def lookup(self, product_id, **options):
+        """
+        SKU de la combinación `options` ({opción: id}) o None.
+        Una sola consulta sobre el índice único (product, signature).
+        """
+        try:
+            return self.for_options(product_id, **options).get()
+        except self.model.DoesNotExist:
+            return None
+
+    def refresh_prices(self):
+        """
+        Recalcula el precio precalculado de los SKUs del queryset con un solo UPDATE por lotes.
+        """
+        variants = list(self.select_related("product", *VARIANT_OPTION_FIELDS))
+        for variant in variants:
+            variant.compute_prices()
+        return self.model.objects.bulk_update(variants, ["price", "compare_price"], batch_size=500)
+
+
+class ProductVariant(models.Model):
+    """
+    SKU: una combinación concreta de opciones del producto con su propio stock
+    y su precio ya calculado (precio del producto + precio de cada opción).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="skus")
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
+    color = models.ForeignKey(Color, on_delete=models.CASCADE, blank=True, null=True, related_name="skus")
+    size = models.ForeignKey(Size, on_delete=models.CASCADE, blank=True, null=True, related_name="skus")
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, blank=True, null=True, related_name="skus")
+    weight = models.ForeignKey(Weight, on_delete=models.CASCADE, blank=True, null=True, related_name="skus")
+    flavor = models.ForeignKey(Flavor, on_delete=models.CASCADE, blank=True, null=True, related_name="skus")
+
+    # Mantenidos en save() y por signals.refresh_variant_prices
+    signature = models.CharField(max_length=255, editable=False)
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"), editable=False)
+    compare_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"), editable=False)
+
+    stock = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductVariantQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "signature"], name="unique_product_variant_signature"),
+        ]
+
+    def __str__(self):
+        options = " / ".join(str(option) for option in self.get_options().values())
+        return f"{self.product} ({options})" if options else str(self.product)
+
+    def get_options(self):
+        """
+        {opción: variante} de las opciones elegidas en este SKU.
+        """
+        return {
+            field: getattr(self, field)
+            for field in VARIANT_OPTION_FIELDS
+            if getattr(self, f"{field}_id")
+        }
+
+    def compute_prices(self):
+        """
+        Precio y precio anterior de la combinación, con las mismas reglas que ProductPriceView.
+        """
+        selected = self.get_options()
+        extra = sum((option.price or Decimal("0.00")) for option in selected.values())
+        self.price = self.product.get_price_with_selected(selected)
+        self.compare_price = ((self.product.compare_price or Decimal("0.00")) + extra).quantize(Decimal("0.01"))
+
+    def clean(self):
+        for field, option in self.get_options().items():
+            if option.product_id != self.product_id:
+                raise ValidationError({field: "La opción no pertenece a este producto."})
+
+    def save(self, *args, **kwargs):
+        # Un UPDATE parcial (p. ej. sólo stock) no recalcula firma ni precio
+        if kwargs.get("update_fields") is None:
+            self.signature = variant_signature({
+                field: getattr(self, f"{field}_id") for field in VARIANT_OPTION_FIELDS
+            })
+            self.compute_prices()
+        super().save(*args, **kwargs)
+
+
 def is_anomalous_interaction(user, product, ip_address, interaction_type, window_minutes=5, threshold=20):
     """
     Detecta si el número de interacciones recientes excede un umbral (spam).
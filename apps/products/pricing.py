@@ -0,0 +1,221 @@
+import uuid
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+# Parámetro de la petición -> relación de variantes del producto
+VARIANT_PARAMS = (
+    ("color_id", "colors"),
+    ("size_id", "sizes"),
+    ("material_id", "materials"),
+    ("weight_id", "weights"),
+    ("flavor_id", "flavors"),
+)
+
+# Máximo de líneas por cotización
+MAX_QUOTE_LINES = 200
+
+
+def parse_variant_id(raw):
+    """
+    UUID de una variante o None si no viene (o viene como "null").
+    """
+    if raw is None or str(raw).lower() in ("", "null"):
+        return None
+    try:
+        return uuid.UUID(str(raw))
+    except ValueError:
+        raise ValidationError(f"'{raw}' no es un UUID de variante válido.")
+
+
+def parse_quote_lines(lines):
+    """
+    Valida las líneas de una cotización:
+    [{"product_id", "color_id", "size_id", ..., "count"}, ...]
+    """
+    if not isinstance(lines, list) or not lines:
+        raise ValidationError("Debes enviar 'lines' como una lista no vacía.")
+    if len(lines) > MAX_QUOTE_LINES:
+        raise ValidationError(f"Como máximo {MAX_QUOTE_LINES} líneas por cotización.")
+
+    parsed = []
+    for line in lines:
+        if not isinstance(line, dict):
+            raise ValidationError("Cada línea debe ser un objeto.")
+        try:
+            product_id = uuid.UUID(str(line.get("product_id")))
+        except ValueError:
+            raise ValidationError("Cada línea necesita un 'product_id' UUID válido.")
+        try:
+            count = int(line.get("count", 1))
+        except (TypeError, ValueError):
+            raise ValidationError("'count' debe ser un entero.")
+        if count < 1:
+            raise ValidationError("'count' debe ser mayor que cero.")
+        parsed.append({
+            "product_id": product_id,
+            "variants": {param: parse_variant_id(line.get(param)) for param, _ in VARIANT_PARAMS},
+            "count": count,
+        })
+    return parsed
+
+
+def discount_is_active(product, now=None):
+    now = now or timezone.now()
+    return bool(
+        product.compare_price is not None
+        and product.discount_until
+        and now < product.discount_until
+    )
+
+
+def quote_product(product, selected, now=None):
+    """
+    Precio unitario, precio anterior y bandera de descuento de un producto
+    con las variantes `selected` ({param: variante}).
+    """
+    attrs_extra = sum((attr.price or 0) for attr in selected.values())
+    return {
+        "price": product.get_price_with_selected(selected),
+        "compare_price": (product.compare_price or 0) + attrs_extra,
+        "discount_active": discount_is_active(product, now),
+    }
+
+
+def quote_sku(product, sku, now=None):
+    """
+    Igual que quote_product pero con los precios ya calculados del SKU.
+    """
+    return {
+        "price": sku.price,
+        "compare_price": sku.compare_price,
+        "discount_active": discount_is_active(product, now),
+        "sku": {"id": sku.id, "sku": sku.sku, "stock": sku.stock},
+    }
+
+
+def sku_options(variant_ids):
+    """
+    {param: id} (color_id, size_id...) -> {opción: id} (color, size...) para ProductVariant.
+    """
+    return {param[:-len("_id")]: variant_id for param, variant_id in variant_ids.items()}
+
+
+def load_variants(lines):
+    """
+    Resuelve todas las variantes de las líneas con un in_bulk por tabla.
+    Devuelve {param: {id: variante}}.
+    """
+    variants = {}
+    for param, rel in VARIANT_PARAMS:
+        ids = {line["variants"][param] for line in lines if line["variants"][param]}
+        model = Product._meta.get_field(rel).related_model
+        variants[param] = model.objects.in_bulk(ids) if ids else {}
+    return variants
+
+
+def quote_lines(lines):
+    """
+    Cotiza todas las líneas ya validadas (ver parse_quote_lines) con una consulta
+    de productos y una por tabla de variantes con ids pedidos. Las variantes que
+    no existen o no son del producto se ignoran, como en ProductPriceView.
+    """
+    products = Product.objects.only(
+        "id", "price", "compare_price", "discount_until",
+    ).in_bulk({line["product_id"] for line in lines})
+    variants = load_variants(lines)
+    now = timezone.now()
+
+    quotes = []
+    for line in lines:
+        product = products.get(line["product_id"])
+        if product is None:
+            quotes.append({"product_id": line["product_id"], "count": line["count"], "available": False})
+            continue
+
+        selected = {}
+        for param, variant_id in line["variants"].items():
+            variant = variants[param].get(variant_id)
+            if variant is not None and variant.product_id == product.id:
+                selected[param] = variant
+
+        quote = quote_product(product, selected, now)
+        quotes.append({
+            "product_id": product.id,
+            **{param: variant.id for param, variant in selected.items()},
+            "count": line["count"],
+            "available": True,
+            **quote,
+            "total": (quote["price"] * line["count"]).quantize(Decimal("0.01")),
+        })
+    return quotes
+
+
+def lines_from_query_params(query_params):
+    """
+    Líneas posicionales de un carrito a partir de listas paralelas de query params
+    (?product_ids=..&color_id=..&count=..): la posición i de cada lista es el ítem i.
+    Variantes o cantidades inválidas se ignoran (count=1), como hasta ahora.
+    """
+    raw_ids = query_params.getlist("product_ids")
+    if not raw_ids:
+        raise ValidationError(
+            "Debes pasar al menos un parámetro 'product_ids', ej: ?product_ids=uuid1&product_ids=uuid2"
+        )
+    try:
+        product_ids = [uuid.UUID(pid) for pid in raw_ids]
+    except ValueError:
+        raise ValidationError("Todos los valores de 'product_ids' deben ser UUIDs válidos.")
+
+    columns = {param: query_params.getlist(param) for param, _ in VARIANT_PARAMS}
+    counts = query_params.getlist("count")
+
+    lines = []
+    for index, product_id in enumerate(product_ids):
+        variants = {}
+        for param, values in columns.items():
+            try:
+                variants[param] = parse_variant_id(values[index]) if index < len(values) else None
+            except ValidationError:
+                variants[param] = None
+        try:
+            count = int(counts[index]) if index < len(counts) else 1
+        except ValueError:
+            count = 1
+        lines.append({"product_id": product_id, "variants": variants, "count": count})
+    return lines
+
+
+def resolve_cart_lines(lines):
+    """
+    Resuelve las líneas de un carrito con un número fijo de consultas: una carga
+    de productos con sus variantes prefetcheadas (Product.postobjects.for_cards)
+    y búsqueda de variantes por id en memoria.
+    Devuelve [(línea, producto, {param: variante})] en el orden de `lines`,
+    omitiendo los productos que no están publicados.
+    """
+    products = Product.postobjects.for_cards().in_bulk({line["product_id"] for line in lines})
+    variants_by_product = {
+        product.id: {
+            param: {variant.id: variant for variant in getattr(product, rel).all()}
+            for param, rel in VARIANT_PARAMS
+        }
+        for product in products.values()
+    }
+
+    resolved = []
+    for line in lines:
+        product = products.get(line["product_id"])
+        if product is None:
+            continue
+        variants = variants_by_product[product.id]
+        selected = {
+            param: variants[param][variant_id]
+            for param, variant_id in line["variants"].items()
+            if variant_id in variants[param]
+        }
+        resolved.append((line, product, selected))
+    return resolved
@@ -0,0 +1,188 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Product, ProductCard, ProductInteraction
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+# Sorted set {vecino: similitud} de cada producto
+SIMILAR_KEY_PREFIX = "recommendations:similar"
+# Vecinos guardados por producto
+TOP_K = 20
+# Sólo cuentan las interacciones de los últimos días
+LOOKBACK_DAYS = 90
+# Un par necesita aparecer en al menos estas sesiones para ser vecino
+MIN_SUPPORT = 2
+# Sesiones con más productos se ignoran (bots, crawlers): su coste es cuadrático
+MAX_BASKET_SIZE = 200
+# Los vecinos caducan si la tarea deja de reconstruirlos (productos que ya no tienen pares)
+SIMILAR_TTL = 60 * 60 * 48
+# Peso de cada interacción en la sesión (se toma el mayor por producto)
+INTERACTION_WEIGHTS = {"view": 1.0, "add_to_cart": 3.0, "purchase": 5.0}
+
+
+def similar_key(product_id):
+    return f"{SIMILAR_KEY_PREFIX}:{product_id}"
+
+
+# Similitud coseno ítem a ítem sobre la matriz dispersa sesión x producto (B):
+# el self-join por sesión calcula BᵀB sólo sobre los pares que coinciden en
+# alguna sesión y la ventana se queda con los TOP_K vecinos de cada producto.
+SIMILARITY_SQL = """
+WITH basket AS (
+    SELECT COALESCE(i.user_id::text, i.session_id) AS basket, i.product_id,
+           MAX(CASE i.interaction_type {weights} END) AS weight
+    FROM {interactions} i
+    WHERE i.interaction_type IN ({types}) AND i.timestamp >= %(since)s
+      AND (i.user_id IS NOT NULL OR i.session_id IS NOT NULL)
+    GROUP BY 1, 2
+),
+norms AS (
+    SELECT product_id, SQRT(SUM(weight * weight)) AS norm FROM basket GROUP BY product_id
+),
+sized AS (
+    SELECT basket FROM basket GROUP BY basket HAVING COUNT(*) BETWEEN 2 AND %(max_basket)s
+),
+items AS (
+    SELECT basket.* FROM basket JOIN sized USING (basket)
+),
+pairs AS (
+    SELECT a.product_id, b.product_id AS neighbor_id, SUM(a.weight * b.weight) AS dot
+    FROM items a JOIN items b ON a.basket = b.basket AND a.product_id <> b.product_id
+    GROUP BY 1, 2
+    HAVING COUNT(*) >= %(min_support)s
+),
+scored AS (
+    SELECT pairs.product_id, pairs.neighbor_id,
+           pairs.dot / (na.norm * nb.norm) AS score
+    FROM pairs
+    JOIN norms na ON na.product_id = pairs.product_id
+    JOIN norms nb ON nb.product_id = pairs.neighbor_id
+    JOIN {products} p ON p.id = pairs.neighbor_id
+    WHERE p.status = 'published' AND NOT p.hidden AND NOT p.banned
+),
+ranked AS (
+    SELECT product_id, neighbor_id, score,
+           ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY score DESC, neighbor_id) AS rank
+    FROM scored
+)
+SELECT product_id, neighbor_id, score FROM ranked WHERE rank <= %(top_k)s ORDER BY product_id, rank
+"""
+
+
+def iter_similarities(lookback_days=LOOKBACK_DAYS, top_k=TOP_K, min_support=MIN_SUPPORT,
+                      max_basket=MAX_BASKET_SIZE, batch_size=2000):
+    """
+    Calcula en Postgres los vecinos de todos los productos y devuelve
+    (producto, [(vecino, similitud), ...]) leyendo el resultado por lotes.
+    """
+    weights = " ".join(f"WHEN '{kind}' THEN {weight}" for kind, weight in INTERACTION_WEIGHTS.items())
+    sql = SIMILARITY_SQL.format(
+        weights=weights,
+        types=", ".join(f"'{kind}'" for kind in INTERACTION_WEIGHTS),
+        interactions=ProductInteraction._meta.db_table,
+        products=Product._meta.db_table,
+    )
+    params = {
+        "since": timezone.now() - timedelta(days=lookback_days),
+        "max_basket": max_basket,
+        "min_support": min_support,
+        "top_k": top_k,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        current, neighbors = None, []
+        while rows := cursor.fetchmany(batch_size):
+            for product_id, neighbor_id, score in rows:
+                if product_id != current:
+                    if neighbors:
+                        yield current, neighbors
+                    current, neighbors = product_id, []
+                neighbors.append((neighbor_id, float(score)))
+        if neighbors:
+            yield current, neighbors
+
+
+def rebuild_similar_products(batch_size=500, **options):
+    """
+    Recalcula los vecinos y los guarda en redis, reemplazando cada sorted set
+    en una transacción (MULTI) para que los lectores nunca vean uno a medias.
+    """
+    stored = 0
+    pipe = redis_client.pipeline(transaction=True)
+    for product_id, neighbors in iter_similarities(**options):
+        key = similar_key(product_id)
+        pipe.delete(key)
+        pipe.zadd(key, {str(neighbor_id): score for neighbor_id, score in neighbors})
+        pipe.expire(key, SIMILAR_TTL)
+        stored += 1
+        if stored % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+    return stored
+
+
+def similar_product_scores(product_ids, limit=TOP_K, exclude=()):
+    """
+    [(producto, puntos)] recomendados para uno o varios productos: se suman las
+    similitudes de los vecinos de todos ellos (un carrito, por ejemplo).
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for product_id in product_ids:
+        pipe.zrevrange(similar_key(product_id), 0, TOP_K - 1, withscores=True)
+    scores = defaultdict(float)
+    for neighbors in pipe.execute():
+        for neighbor_id, score in neighbors:
+            scores[neighbor_id.decode()] += score
+
+    excluded = {str(product_id) for product_id in (*product_ids, *exclude)}
+    ranked = sorted(
+        ((neighbor_id, score) for neighbor_id, score in scores.items() if neighbor_id not in excluded),
+        key=lambda item: (-item[1], item[0]),
+    )
+    return ranked[:limit]
+
+
+def fallback_cards(product_ids, limit, exclude=()):
+    """
+    Relleno cuando no hay suficientes vecinos: tarjetas de las mismas
+    categorías, mejor valoradas primero (sin order_by('?')).
+    """
+    categories = (
+        Product.objects.filter(id__in=product_ids)
+        .exclude(category__isnull=True)
+        .values_list("category_id", flat=True)
+    )
+    return list(
+        ProductCard.objects.filter(category_id__in=categories)
+        .exclude(product_id__in=[*product_ids, *exclude])
+        .order_by("-average_rating", "-review_count", "-created_at")
+        .values_list("product_id", flat=True)[:limit]
+    )
+
+
+def recommend_product_ids(product_ids, limit=10, exclude=()):
+    """
+    Ids recomendados (sólo productos publicados) en orden: primero los
+    vecinos precalculados en redis y, si faltan, los de fallback_cards.
+    """
+    ranked = [neighbor_id for neighbor_id, _ in similar_product_scores(product_ids, limit * 2, exclude)]
+    published = set(
+        str(product_id)
+        for product_id in ProductCard.objects.filter(product_id__in=ranked).values_list("product_id", flat=True)
+    )
+    recommended = [neighbor_id for neighbor_id in ranked if neighbor_id in published][:limit]
+    if len(recommended) < limit:
+        recommended += [
+            str(product_id)
+            for product_id in fallback_cards(product_ids, limit - len(recommended), [*exclude, *recommended])
+        ]
+    return recommended
@@ -0,0 +1,67 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F
+
+# Campos de texto que alimentan el vector de búsqueda, con su peso:
+# title > keywords > short_description > description = slug
+SEARCH_VECTOR_WEIGHTS = (
+    ("title", "A"),
+    ("keywords", "B"),
+    ("short_description", "C"),
+    ("description", "D"),
+    ("slug", "D"),
+)
+SEARCH_VECTOR_FIELDS = tuple(field for field, _ in SEARCH_VECTOR_WEIGHTS)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def get_search_config():
+    return getattr(settings, "PRODUCT_SEARCH_CONFIG", "simple")
+
+
+def build_search_vector():
+    """
+    Expresión SQL del tsvector ponderado de un producto. Las migraciones que
+    recalculan Product.search_vector llevan su propia copia de los pesos.
+    """
+    config = get_search_config()
+    vector = None
+    for field, weight in SEARCH_VECTOR_WEIGHTS:
+        part = SearchVector(field, weight=weight, config=config)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def build_search_query(text):
+    """
+    Convierte el texto libre del usuario en un SearchQuery con prefijos
+    (`zapat` encuentra `zapatillas`). Devuelve None si no quedan términos.
+    """
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    raw = " & ".join(f"{token}:*" for token in tokens)
+    return SearchQuery(raw, search_type="raw", config=get_search_config())
+
+
+def apply_search(qs, text, vector_field="search_vector"):
+    """
+    Filtra el queryset por el índice GIN de search_vector y anota `search_rank`.
+    `vector_field` permite buscar desde modelos relacionados (p. ej. "product__search_vector").
+    """
+    query = build_search_query(text)
+    if query is None:
+        return qs.none()
+    return qs.filter(**{vector_field: query}).annotate(
+        search_rank=SearchRank(F(vector_field), query)
+    )
+
+
+def update_search_vector(queryset):
+    """
+    Recalcula el vector de búsqueda de los productos del queryset en un solo UPDATE.
+    """
+    return queryset.update(search_vector=build_search_vector())
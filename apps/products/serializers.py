@@ -2,31 +2,86 @@ from rest_framework import serializers
 from django.utils import timezone
 from decimal import Decimal
 
-from apps.assets.serializers import MediaSerializer
+from apps.assets.serializers import (
+    BatchSignedMediaMixin, BatchSignedListSerializer,
+    get_expires_in, get_media_url,
+)
 from .models import (
-    Product, ProductInteraction, ProductAnalytics, 
+    Product, ProductInteraction, ProductAnalytics, ProductCard,
     Detail, Requisite, Benefit, WhoIsFor,
     Color, Size, Material, Weight, Flavor,
     Category, CategoryInteraction, CategoryAnalytics
 )
 from apps.reviews.serializers import ReviewSerializer
 
-class CategoryNestedSerializer(serializers.ModelSerializer):
+
+def category_media_keys(category, expires_in):
+    """
+    Thumbnails de la categoría y de las relacionadas que ya están en memoria
+    (hijos prefetcheados, padre cacheado y, a través de él, hermanos), sin consultar.
+    """
+    seen = set()
+    pending = [category]
+    while pending:
+        node = pending.pop()
+        if node is None or node.pk in seen:
+            continue
+        seen.add(node.pk)
+        if Category.thumbnail.is_cached(node) and node.thumbnail:
+            yield node.thumbnail.key, expires_in
+        pending.extend(getattr(node, "_prefetched_objects_cache", {}).get("children", ()))
+        if Category.parent.is_cached(node):
+            pending.append(node.parent)
+
+
+def product_thumbnail_image(product):
+    """
+    La imagen que se muestra como miniatura: el thumbnail o, si no hay, la primera
+    imagen (como Product.get_first_image), sin consultar si las imágenes ya están
+    prefetcheadas. get_media_keys y get_thumbnail deben firmar la misma key.
+    """
+    if product.thumbnail:
+        return product.thumbnail
+    images = getattr(product, "_prefetched_objects_cache", {}).get("images")
+    if images is None:
+        return product.get_first_image()
+    return min(images, key=lambda image: image.pk, default=None)
+
+
+class CategoryNestedSerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
     thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
         # Ajusta los campos que quieras exponer en el anidado
         fields = ('id', 'name', 'slug', 'thumbnail')
+        list_serializer_class = BatchSignedListSerializer
+
+    def get_media_keys(self, obj):
+        return category_media_keys(obj, get_expires_in(self.context))
 
     def get_thumbnail(self, obj):
         if obj.thumbnail:
             # Propaga self.context (incluye expires_in si lo definiste)
-            return MediaSerializer(obj.thumbnail, context=self.context).data.get('url')
+            return get_media_url(self.context, obj.thumbnail.key)
         return None
+
+
+class CategoryTreeSerializer(CategoryNestedSerializer):
+    """
+    Nodo del árbol de categorías. Espera los hijos ya resueltos en memoria
+    (ver category_tree.load_category_tree), así que no consulta la base de datos.
+    """
+    children = serializers.SerializerMethodField()
+
+    class Meta(CategoryNestedSerializer.Meta):
+        fields = ('id', 'name', 'title', 'slug', 'thumbnail', 'children')
+
+    def get_children(self, obj):
+        return CategoryTreeSerializer(obj.children.all(), many=True, context=self.context).data
     
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
     """
     Serializer para Category; incluye thumbnail y árbol de categorías hijas.
     """
@@ -51,6 +106,10 @@ class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
+        list_serializer_class = BatchSignedListSerializer
+
+    def get_media_keys(self, obj):
+        return category_media_keys(obj, get_expires_in(self.context))
 
     def get_children(self, obj):
         qs = obj.children.all()
@@ -58,7 +117,7 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def get_thumbnail(self, obj):
         if obj.thumbnail:
-            return MediaSerializer(obj.thumbnail, context=self.context).data.get('url')
+            return get_media_url(self.context, obj.thumbnail.key)
         return None
     
     def get_related_categories(self, obj):
@@ -73,8 +132,8 @@ class CategorySerializer(serializers.ModelSerializer):
         if obj.parent:
             related.append(obj.parent)
 
-            # 2) hermanos
-            siblings = obj.parent.children.exclude(pk=obj.pk)
+            # 2) hermanos (usa los hijos del padre si ya están cargados en memoria)
+            siblings = [c for c in obj.parent.children.all() if c.pk != obj.pk]
             related.extend(siblings)
 
         # 3) hijos
@@ -187,7 +246,7 @@ class FlavorSerializer(serializers.ModelSerializer):
 
 
 # --- Serializador principal del producto con atributos anidados ---
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
     thumbnail       = serializers.SerializerMethodField()
     average_rating  = serializers.FloatField(source='analytics_avg_rating', read_only=True)
     review_count    = serializers.IntegerField(source='analytics_review_count', read_only=True)
@@ -219,15 +278,26 @@ class ProductListSerializer(serializers.ModelSerializer):
             'weights',
             'flavors',
         ]
+        list_serializer_class = BatchSignedListSerializer
+
+    def get_media_keys(self, obj):
+        expires_in = get_expires_in(self.context)
+        image = product_thumbnail_image(obj)
+        if image:
+            yield image.key, expires_in
+        for field in ('category', 'sub_category', 'topic'):
+            yield from category_media_keys(getattr(obj, field), expires_in)
 
     def get_thumbnail(self, obj):
-        image = obj.get_first_image()
+        image = product_thumbnail_image(obj)
         if not image:
             return None
-        # aquí ponemos 1 hora (3600 s)
-        return MediaSerializer(obj.thumbnail, context=self.context).data.get('url')
+        return get_media_url(self.context, image.key)
     
     def get_min_price(self, obj):
+        # Anotado en SQL por Product.postobjects.for_cards()
+        if hasattr(obj, 'min_total_price'):
+            return obj.min_total_price
         total = obj.price or Decimal('0.00')
         # Por cada tipo de atributo, sumamos el más barato
         for rel in ('colors','sizes','materials','weights','flavors'):
@@ -237,7 +307,71 @@ class ProductListSerializer(serializers.ModelSerializer):
         return total
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductCardSerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
+    """
+    Misma forma que ProductListSerializer, leída desde el modelo ProductCard.
+    """
+    id              = serializers.UUIDField(source='product_id', read_only=True)
+    thumbnail       = serializers.SerializerMethodField()
+    stock           = serializers.IntegerField(source='total_stock', read_only=True)
+    category        = CategorySerializer()
+    sub_category    = CategorySerializer()
+    topic           = CategorySerializer()
+
+    colors          = serializers.JSONField(source='variants.colors', read_only=True)
+    sizes           = serializers.JSONField(source='variants.sizes', read_only=True)
+    materials       = serializers.JSONField(source='variants.materials', read_only=True)
+    weights         = serializers.JSONField(source='variants.weights', read_only=True)
+    flavors         = serializers.JSONField(source='variants.flavors', read_only=True)
+
+    class Meta:
+        model = ProductCard
+        fields = [
+            'id', 'author',
+            'title', 'short_description',
+            'slug',
+            'price', 'compare_price', 'discount', 'discount_until',
+            'stock', 'limited_edition', 'condition',
+            'thumbnail', 'average_rating', 'review_count',
+            'category', 'sub_category', 'topic', 'min_price',
+            'colors',
+            'sizes',
+            'materials',
+            'weights',
+            'flavors',
+        ]
+        list_serializer_class = BatchSignedListSerializer
+
+    def get_media_keys(self, obj):
+        expires_in = get_expires_in(self.context)
+        yield obj.thumbnail_key, expires_in
+        for field in ('category', 'sub_category', 'topic'):
+            yield from category_media_keys(getattr(obj, field), expires_in)
+
+    def get_thumbnail(self, obj):
+        return get_media_url(self.context, obj.thumbnail_key)
+
+
+def product_has_liked(request, product_id):
+    """
+    Si el usuario de la petición (o su sesión, si es anónimo) dio like al producto.
+    """
+    user = request.user if request.user.is_authenticated else None
+    session_id = request.session.session_key
+    if not session_id:
+        request.session.save()
+        session_id = request.session.session_key
+
+    filter_kwargs = {"product_id": product_id, "interaction_type": "like"}
+    if user:
+        filter_kwargs["user"] = user
+    else:
+        filter_kwargs["session_id"] = session_id
+
+    return ProductInteraction.objects.filter(**filter_kwargs).exists()
+
+
+class ProductSerializer(BatchSignedMediaMixin, serializers.ModelSerializer):
 
     details          = DetailSerializer(many=True, required=False)
     requisites       = RequisiteSerializer(many=True, required=False)
@@ -282,44 +416,39 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         # Mantener todos los campos del modelo
         fields = '__all__'
+        list_serializer_class = BatchSignedListSerializer
+
+    THUMBNAIL_EXPIRES_IN = 60 * 60 * 24
+    IMAGES_EXPIRES_IN = 3600
+
+    def get_media_keys(self, obj):
+        image = product_thumbnail_image(obj)
+        if image:
+            yield image.key, self.THUMBNAIL_EXPIRES_IN
+        for image in obj.images.all():
+            yield image.key, self.IMAGES_EXPIRES_IN
+        for field in ('category', 'sub_category', 'topic'):
+            yield from category_media_keys(getattr(obj, field), get_expires_in(self.context))
 
     def get_thumbnail(self, obj):
-        image = obj.get_first_image()
+        image = product_thumbnail_image(obj)
         if not image:
             return None
-        ctx = { **self.context, 'expires_in': 60 * 60 * 24 }
-
-        # 3) pasamos la instancia correcta y el context
-        return MediaSerializer(image, context=ctx).data['url']
+        return get_media_url(self.context, image.key, self.THUMBNAIL_EXPIRES_IN)
 
     def get_images(self, obj):
         urls = []
-        # aquí ponemos None → sin expiración / sin firma
-        ctx = {**self.context, 'expires_in': 3600}
         for image in obj.images.all():
             if not getattr(image, 'key', None):
                 continue
-            urls.append(MediaSerializer(image, context=ctx).data['url'])
+            urls.append(get_media_url(self.context, image.key, self.IMAGES_EXPIRES_IN))
         return urls
 
     def get_has_liked(self, obj):
         request = self.context.get("request")
         if not request:
             return False
-
-        user = request.user if request.user.is_authenticated else None
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.save()
-            session_id = request.session.session_key
-
-        filter_kwargs = {"product": obj, "interaction_type": "like"}
-        if user:
-            filter_kwargs["user"] = user
-        else:
-            filter_kwargs["session_id"] = session_id
-
-        return ProductInteraction.objects.filter(**filter_kwargs).exists()
+        return product_has_liked(request, obj.pk)
     
     def get_price_with_selected(self, obj):
         # Extrae dict de atributos seleccionados desde el contexto
@@ -1,10 +1,19 @@
 import decimal
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import Product, ProductAnalytics, ProductInteraction, Category, CategoryInteraction, CategoryAnalytics
+from .models import (
+    Product, ProductAnalytics, ProductInteraction, Category, CategoryInteraction, CategoryAnalytics,
+    Color, Size, Material, Weight, Flavor, Detail, Requisite, Benefit, WhoIsFor, ProductVariant,
+    VARIANT_OPTION_FIELDS,
+)
+from .cards import refresh_product_cards, refresh_card_rating
+from .cache_tags import invalidate_product, invalidate_categories, schedule_analytics_invalidation
+from . import inventory, trending
+from .search import SEARCH_VECTOR_FIELDS, update_search_vector
 
 
 @receiver(post_save, sender=Product)
@@ -17,6 +26,215 @@ def create_product_analytics(sender, instance, created, **kwargs):
         ProductAnalytics.objects.create(product=instance)
 
 
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Mantiene actualizado Product.search_vector cuando cambian los campos de texto.
+    Se hace con un UPDATE directo para no volver a disparar post_save.
+    """
+    if update_fields is not None and not set(update_fields) & set(SEARCH_VECTOR_FIELDS):
+        return
+    update_search_vector(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def refresh_card_on_product_save(sender, instance, **kwargs):
+    """
+    Recalcula el ProductCard del producto al confirmar la transacción.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: refresh_product_cards([product_id]))
+
+
+@receiver(m2m_changed, sender=Product.images.through)
+def refresh_card_on_images_change(sender, instance, action, **kwargs):
+    """
+    La miniatura de la tarjeta puede venir de la primera imagen del producto.
+    """
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Product):
+        product_id = instance.pk
+        transaction.on_commit(lambda: refresh_product_cards([product_id]))
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Weight)
+@receiver(post_save, sender=Flavor)
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Weight)
+@receiver(post_delete, sender=Flavor)
+def refresh_card_on_variant_change(sender, instance, **kwargs):
+    """
+    Cambios en variantes alteran min_price, total_stock y la lista de variantes.
+    """
+    product_id = instance.product_id
+    transaction.on_commit(lambda: refresh_product_cards([product_id]))
+
+
+SKU_PRICE_FIELDS = {"price", "compare_price"}
+
+
+@receiver(post_save, sender=Product)
+def refresh_variant_prices_on_product_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Los SKUs guardan su precio ya calculado a partir del precio del producto.
+    """
+    if update_fields is not None and not set(update_fields) & SKU_PRICE_FIELDS:
+        return
+    product_id = instance.pk
+    transaction.on_commit(lambda: ProductVariant.objects.filter(product_id=product_id).refresh_prices())
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Weight)
+@receiver(post_save, sender=Flavor)
+def refresh_variant_prices_on_option_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Recalcula los SKUs que usan la opción cuando cambia su precio
+    (un cambio sólo de stock no los afecta).
+    """
+    if update_fields is not None and "price" not in update_fields:
+        return
+    option_filter = {f"{sender._meta.model_name}_id": instance.pk}
+    transaction.on_commit(lambda: ProductVariant.objects.filter(**option_filter).refresh_prices())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Weight)
+@receiver(post_save, sender=Flavor)
+@receiver(post_save, sender=ProductVariant)
+def sync_inventory_on_stock_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Refleja en el contador de redis los cambios de stock hechos fuera del checkout
+    (admin, importaciones). Las opciones nuevas rehacen el set de unidades del producto.
+    """
+    if update_fields is not None and "stock" not in update_fields:
+        return
+    if not isinstance(instance.stock, (int, type(None))):
+        # stock = F(...): el valor real sólo lo conoce la base de datos
+        return
+    kind, pk, stock = inventory.UNIT_KINDS[sender], instance.pk, instance.stock
+    product_id = getattr(instance, "product_id", None)
+
+    def sync():
+        inventory.set_on_hand(kind, pk, stock)
+        if created and kind in VARIANT_OPTION_FIELDS:
+            inventory.forget_product_units(product_id)
+    transaction.on_commit(sync)
+
+
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Weight)
+@receiver(post_delete, sender=Flavor)
+@receiver(post_delete, sender=ProductVariant)
+def sync_inventory_on_unit_delete(sender, instance, **kwargs):
+    kind, pk, product_id = inventory.UNIT_KINDS[sender], instance.pk, instance.product_id
+
+    def sync():
+        inventory.set_on_hand(kind, pk, None)
+        inventory.forget_product_units(product_id)
+    transaction.on_commit(sync)
+
+
+RATING_FIELDS = ("average_rating", "review_count")
+
+
+@receiver(post_init, sender=ProductAnalytics)
+def remember_analytics_rating(sender, instance, **kwargs):
+    """
+    Guarda la valoración cargada para detectar en post_save si cambió
+    (las interacciones guardan las analíticas completas en cada vista).
+    """
+    instance._saved_rating = tuple(instance.__dict__.get(field) for field in RATING_FIELDS)
+
+
+@receiver(post_save, sender=ProductAnalytics)
+def refresh_card_on_analytics_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    De las analíticas, la tarjeta sólo guarda valoración y número de reseñas;
+    sólo si cambian se actualiza la tarjeta y se invalida la caché del producto.
+    """
+    if update_fields is not None and not set(RATING_FIELDS) & set(update_fields):
+        return
+    rating = tuple(getattr(instance, field) for field in RATING_FIELDS)
+    if not created and rating == instance._saved_rating:
+        return
+    instance._saved_rating = rating
+    refresh_card_rating(instance.product_id, instance.average_rating, instance.review_count)
+    invalidate_product(instance.product_id)
+
+
+@receiver(post_save, sender=ProductAnalytics)
+def invalidate_cache_on_analytics_save(sender, instance, **kwargs):
+    """
+    Los contadores (vistas, likes, compras...) se ven en el detalle y ordenan
+    los listados por analíticas. Como se guardan en cada interacción, la
+    invalidación se agrupa (ver schedule_analytics_invalidation).
+    """
+    product_id = instance.product_id
+    transaction.on_commit(lambda: schedule_analytics_invalidation(product_id))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_cache_on_product_change(sender, instance, **kwargs):
+    invalidate_product(instance.pk)
+
+
+@receiver(m2m_changed, sender=Product.images.through)
+def invalidate_cache_on_images_change(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Product):
+        invalidate_product(instance.pk)
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_save, sender=Size)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Weight)
+@receiver(post_save, sender=Flavor)
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Size)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Weight)
+@receiver(post_delete, sender=Flavor)
+def invalidate_cache_on_variant_change(sender, instance, **kwargs):
+    """
+    Las variantes cambian precio y stock, que también se ven en los listados.
+    """
+    invalidate_product(instance.product_id)
+
+
+@receiver(post_save, sender=Detail)
+@receiver(post_save, sender=Requisite)
+@receiver(post_save, sender=Benefit)
+@receiver(post_save, sender=WhoIsFor)
+@receiver(post_delete, sender=Detail)
+@receiver(post_delete, sender=Requisite)
+@receiver(post_delete, sender=Benefit)
+@receiver(post_delete, sender=WhoIsFor)
+def invalidate_cache_on_detail_change(sender, instance, **kwargs):
+    """
+    Detalles, requisitos, beneficios y público objetivo sólo salen en el detalle.
+    """
+    invalidate_product(instance.product_id, catalog=False)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cache_on_category_change(sender, instance, **kwargs):
+    invalidate_categories()
+
+
 @receiver(post_save, sender=Category)
 def create_category_analytics(sender, instance, created, **kwargs):
     """
@@ -82,6 +300,20 @@ def update_category_analytics(sender, instance, created, **kwargs):
     analytics._update_avg_order_value()
 
 
+@receiver(post_save, sender=ProductInteraction)
+def record_trending_interaction(sender, instance, created, **kwargs):
+    """
+    Suma la interacción a los sets de tendencias de redis cuando se confirma.
+    """
+    if not created or instance.interaction_type not in trending.INTERACTION_WEIGHTS:
+        return
+    product = instance.product
+    category_ids = (product.category_id, product.sub_category_id, product.topic_id)
+    transaction.on_commit(
+        lambda: trending.record_interaction(instance.product_id, instance.interaction_type, category_ids)
+    )
+
+
 @receiver(post_save, sender=ProductInteraction)
 def update_product_analytics(sender, instance, created, **kwargs):
     """
@@ -6,6 +6,13 @@ import redis
 from django.conf import settings
 
 from .models import ProductAnalytics, Product, Category, CategoryAnalytics
+from .cards import rebuild_all_product_cards
+from .categorizer import auto_categorize
+from .recommendations import rebuild_similar_products as rebuild_similarities
+from .trending import decay_trending
+from .cache_tags import TRENDING_TAG, flush_analytics_invalidation
+from utils.cache_utils import invalidate_tags
+from . import inventory
 
 logger = logging.getLogger(__name__)
 
@@ -98,4 +105,72 @@ def sync_category_impressions_to_db():
             # Eliminar la clave de redis despues de sincronizar
             redis_client.delete(key)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
\ No newline at end of file
+            print(f"Error syncing impressions for {key}: {str(e)}")
+
+@shared_task
+def rebuild_product_cards():
+    """
+    Reconstruye todas las tarjetas de producto (red de seguridad ante señales perdidas)
+    """
+    refreshed = rebuild_all_product_cards()
+    logger.info(f"Rebuilt {refreshed} product cards")
+
+
+@shared_task
+def release_expired_inventory_reservations():
+    """
+    Libera el stock retenido por reservas de checkout vencidas
+    """
+    released = inventory.release_expired()
+    if released:
+        logger.info(f"Released {released} expired inventory reservations")
+
+
+@shared_task
+def reconcile_inventory():
+    """
+    Alinea los contadores de inventario en redis con la columna stock
+    """
+    reconciled = inventory.reconcile()
+    logger.info(f"Reconciled {reconciled} inventory counters")
+
+
+@shared_task
+def auto_categorize_products(dry_run=False, overwrite=False):
+    """
+    Asigna categorías a los productos según las palabras clave de sus textos
+    """
+    report = auto_categorize(dry_run=dry_run, overwrite=overwrite)
+    logger.info(
+        f"Auto-categorization{' (dry run)' if dry_run else ''}: "
+        f"{report['changed']} changed, {report['unmatched']} unmatched of {report['scanned']} products"
+    )
+    return report
+
+
+@shared_task
+def rebuild_similar_products():
+    """
+    Recalcula los productos similares (co-visitas y co-compras) y los guarda en redis
+    """
+    stored = rebuild_similarities()
+    logger.info(f"Stored similar products for {stored} products")
+
+
+@shared_task
+def decay_trending_products():
+    """
+    Decae y compacta los sets de tendencias de redis e invalida los listados cacheados por tendencia
+    """
+    processed = decay_trending()
+    invalidate_tags(TRENDING_TAG)
+    logger.info(f"Decayed trending sets: {processed}")
+
+
+@shared_task
+def invalidate_analytics_caches():
+    """
+    Invalida la caché de los productos cuyas analíticas cambiaron y de los listados ordenados por analíticas
+    """
+    invalidated = flush_analytics_invalidation()
+    logger.info(f"Invalidated analytics caches for {invalidated} products")
@@ -1,3 +1,1087 @@
-from django.test import TestCase
+import importlib
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import QueryDict
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.assets.models import Media
+from apps.cart.models import CartItem
+from utils.cache_utils import (
+    METRICS_KEY_PREFIX, cache_response, entry_is_fresh, get_cache_metrics, get_tag_versions, invalidate_tags,
+    make_cache_key, normalize_query_params,
+)
+from utils.pagination import KeysetPagination
+from utils.s3_utils import url_signer
+from .cache_tags import (
+    ANALYTICS_PENDING_KEY, ANALYTICS_SCHEDULED_KEY, ANALYTICS_TAG, flush_analytics_invalidation, product_tag,
+    redis_client,
+)
+from .cards import CARD_UPDATE_FIELDS, build_product_card, card_source_queryset
+from .category_tree import attach_category_relations, load_category_relations, load_category_tree
+from .exporter import accepts_gzip
+from .facets import compute_facets
+from .pricing import quote_lines
+from .recommendations import rebuild_similar_products, recommend_product_ids, similar_key, similar_product_scores
+from . import inventory, trending
+from .models import (
+    Category, Color, Product, ProductAnalytics, ProductCard, ProductInteraction, ProductVariant, Size,
+)
+from .search import apply_search, update_search_vector
+from .serializers import CategorySerializer, ProductListSerializer, ProductSerializer
+from .views import filter_product_cards
+
+API_KEY = "test-api-key"
+
+
+def create_product(index, **fields):
+    fields.setdefault("status", "published")
+    fields.setdefault("price", Decimal("50.00"))
+    return Product.objects.create(
+        title=f"Zapatillas running {index}", slug=f"zapatillas-{index}",
+        description="Zapatillas de prueba", **fields,
+    )
+
+
+def create_user(is_staff=False):
+    username = "staff" if is_staff else "cliente"
+    return get_user_model().objects.create_user(
+        f"{username}@example.com", "password", username=username,
+        first_name="Test", last_name="User", is_staff=is_staff, is_active=True,
+    )
+
+
+def auth_headers(user):
+    return {"HTTP_API_KEY": API_KEY, "HTTP_AUTHORIZATION": f"JWT {AccessToken.for_user(user)}"}
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ProductFacetsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.category = Category.objects.create(name="Calzado", slug="calzado")
+            create_product(1, category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_facets_count_matching_cards(self):
+        facets = compute_facets(filter_product_cards(ProductCard.objects.all(), QueryDict("search=zapatillas")))
+        self.assertEqual(facets["total"], 1)
+        self.assertEqual(facets["categories"][0]["slug"], "calzado")
+
+    def test_search_without_terms_returns_empty_facets(self):
+        facets = compute_facets(filter_product_cards(ProductCard.objects.all(), QueryDict("search=%21%21%21")))
+        self.assertEqual(facets["total"], 0)
+        self.assertEqual(facets["categories"], [])
+        self.assertTrue(all(bucket["count"] == 0 for bucket in facets["price"]))
+
+    def test_unknown_category_tree_returns_empty_facets(self):
+        response = self.client.get(
+            "/api/products/facets/", {"category_tree": "no-existe"}, HTTP_API_KEY=API_KEY
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"]["total"], 0)
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class DetailProductViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.product = create_product(1)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_detail(self, client):
+        response = client.get("/api/products/detail/", {"slug": self.product.slug}, HTTP_API_KEY=API_KEY)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_has_liked_is_per_session_despite_cache(self):
+        liker, other = Client(), Client()
+        self.assertFalse(self.get_detail(liker)["has_liked"])
+        ProductInteraction.objects.create(
+            product=self.product, interaction_type="like", session_id=liker.session.session_key,
+        )
+        self.assertTrue(self.get_detail(liker)["has_liked"])
+        self.assertFalse(self.get_detail(other)["has_liked"])
+
+
+class AnalyticsCacheInvalidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.product = create_product(1)
+
+    def setUp(self):
+        cache.clear()
+        redis_client.delete(ANALYTICS_PENDING_KEY, ANALYTICS_SCHEDULED_KEY)
+
+    @mock.patch("apps.products.tasks.invalidate_analytics_caches.apply_async")
+    def test_analytics_saves_are_debounced_into_one_invalidation(self, apply_async):
+        analytics = ProductAnalytics.objects.get(product=self.product)
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.views += 1
+            analytics.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.purchases += 1
+            analytics.save()
+        apply_async.assert_called_once()
+
+        tags = [product_tag(self.product.pk), ANALYTICS_TAG]
+        before = get_tag_versions(tags)
+        self.assertEqual(flush_analytics_invalidation(), 1)
+        after = get_tag_versions(tags)
+        self.assertEqual(set(after), set(tags))
+        self.assertTrue(all(after[tag] > before.get(tag, 0) for tag in tags))
+        self.assertFalse(redis_client.exists(ANALYTICS_PENDING_KEY, ANALYTICS_SCHEDULED_KEY))
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ConditionalResponseTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.product = create_product(
+                1, compare_price=Decimal("80.00"), discount=True,
+                discount_until=timezone.now() + timedelta(hours=1),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, params, etag):
+        return self.client.get(url, params, HTTP_API_KEY=API_KEY, HTTP_IF_NONE_MATCH=etag)
+
+    def get_etag(self, url, params):
+        # La primera respuesta registra las versiones de sus tags
+        self.client.get(url, params, HTTP_API_KEY=API_KEY)
+        response = self.client.get(url, params, HTTP_API_KEY=API_KEY)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.revalidate(url, params, response["ETag"]).status_code, 304)
+        return response
+
+    def test_price_etag_changes_when_discount_expires(self):
+        url, params = "/api/products/detail/price/", {"slug": self.product.slug}
+        Product.objects.filter(pk=self.product.pk).update(updated_at=timezone.now() - timedelta(hours=2))
+        first = self.get_etag(url, params)
+        self.assertTrue(first.json()["results"]["discount_active"])
+
+        # El tiempo pasa: el descuento vence sin que cambie updated_at
+        Product.objects.filter(pk=self.product.pk).update(discount_until=timezone.now() - timedelta(seconds=1))
+        response = self.revalidate(url, params, first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["results"]["discount_active"])
+
+    def test_analytics_sorted_list_etag_changes_with_analytics(self):
+        url = "/api/products/list/"
+        by_views = self.get_etag(url, {"sorting": "views"})
+        plain = self.get_etag(url, {})
+
+        # Lo que hace invalidate_analytics_caches tras un cambio de analíticas
+        invalidate_tags(ANALYTICS_TAG)
+        self.assertEqual(self.revalidate(url, {"sorting": "views"}, by_views["ETag"]).status_code, 200)
+        self.assertEqual(self.revalidate(url, {}, plain["ETag"]).status_code, 304)
+
+    def hold_cache_locks(self):
+        # Como si otra petición estuviera recalculando cada entrada
+        add = cache.add
+        return mock.patch.object(
+            cache, "add", side_effect=lambda key, *args, **kwargs: not key.endswith(":lock") and add(key, *args, **kwargs)
+        )
+
+    def test_stale_list_is_served_without_validators(self):
+        url = "/api/products/list/"
+        fresh = self.get_etag(url, {})
+        with self.hold_cache_locks(), mock.patch("utils.cache_utils.entry_is_fresh", return_value=False):
+            response = self.client.get(url, HTTP_API_KEY=API_KEY)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), fresh.json())
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_invalidated_list_is_not_served_stale(self):
+        url = "/api/products/list/"
+        self.get_etag(url, {})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "Zapatillas trail"
+            self.product.save()
+        with self.hold_cache_locks():
+            response = self.client.get(url, HTTP_API_KEY=API_KEY)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["title"], "Zapatillas trail")
+        self.assertTrue(response.has_header("ETag"))
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ProductListQueryCountTests(TestCase):
+    """
+    Los listados cargan sus productos en un número fijo de consultas,
+    sin importar cuántos productos haya.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.media = [
+            Media.objects.create(name=f"m{i}", size="1", type="image/png", key=f"media/m{i}.png", media_type="image")
+            for i in range(2)
+        ]
+        cls.root = Category.objects.create(name="Ropa", slug="ropa", thumbnail=cls.media[0])
+        cls.sub = Category.objects.create(name="Camisas", slug="camisas", parent=cls.root)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_products(self, count):
+        start = Product.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(start, start + count):
+                product = create_product(
+                    index, category=self.root, sub_category=self.sub, thumbnail=self.media[0],
+                )
+                product.images.set(self.media)
+                Color.objects.create(product=product, title="Rojo", hex="#f00", price=Decimal("1.00"), stock=2)
+                Size.objects.create(product=product, title="M", price=Decimal("2.00"), stock=3)
+        return Product.postobjects.order_by("created_at")
+
+    def assert_constant_queries(self, func, small=2, large=8):
+        """
+        Ejecuta `func(ids)` con `small` y luego con `large` productos
+        y comprueba que ambas hagan las mismas consultas.
+        """
+        ids = list(self.create_products(small).values_list("id", flat=True))
+        with CaptureQueriesContext(connection) as context:
+            func(ids)
+        ids = list(self.create_products(large - small).values_list("id", flat=True))
+        self.assertEqual(len(ids), large)
+        with self.assertNumQueries(len(context.captured_queries)):
+            func(ids)
+        return len(context.captured_queries)
+
+    def test_for_cards_serializes_in_constant_queries(self):
+        def serialize(ids):
+            products = Product.postobjects.filter(id__in=ids).for_cards()
+            data = ProductListSerializer(attach_category_relations(list(products)), many=True).data
+            self.assertEqual(len(data), len(ids))
+            self.assertEqual(len(data[0]["colors"]), 1)
+
+        self.assertLessEqual(self.assert_constant_queries(serialize), 10)
+
+    def test_list_by_id_view_in_constant_queries(self):
+        def fetch(ids):
+            response = self.client.get(
+                "/api/products/list-by-id/", {"product_ids": [str(pk) for pk in ids]}, HTTP_API_KEY=API_KEY,
+            )
+            self.assertEqual(len(response.json()["results"]), len(ids))
+
+        self.assert_constant_queries(fetch)
+
+    def test_list_view_in_constant_queries(self):
+        def fetch(ids):
+            cache.clear()
+            response = self.client.get("/api/products/list/", {"page_size": 50}, HTTP_API_KEY=API_KEY)
+            self.assertEqual(len(response.json()["results"]), len(ids))
+
+        self.assert_constant_queries(fetch)
+
+
+class InventoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = create_product(1)
+        cls.red = Color.objects.create(product=cls.product, title="Rojo", hex="#f00", price=Decimal("1.00"), stock=5)
+        cls.medium = Size.objects.create(product=cls.product, title="M", price=Decimal("2.00"), stock=5)
+        cls.sku = ProductVariant.objects.create(product=cls.product, color=cls.red, size=cls.medium, stock=3)
+
+    def setUp(self):
+        self.reservations = []
+        # Los contadores de redis sobreviven al rollback de cada test
+        inventory.redis_client.delete(
+            inventory.unit_key("color", self.red.pk), inventory.unit_key("size", self.medium.pk),
+            inventory.unit_key("sku", self.sku.pk), inventory.unit_key("product", self.product.pk),
+        )
+        inventory.forget_product_units(self.product.id)
+
+    def tearDown(self):
+        for reservation_id in self.reservations:
+            inventory.release(reservation_id)
+
+    def reserve(self, units):
+        reservation_id = str(uuid.uuid4())
+        inventory.reserve(reservation_id, units)
+        self.reservations.append(reservation_id)
+        return reservation_id
+
+    def cart_item(self, count, **options):
+        return CartItem(
+            content_type=ContentType.objects.get_for_model(Product), object_id=self.product.id,
+            count=count, **options,
+        )
+
+    def test_sku_reservations_and_sales_count_against_its_options(self):
+        inventory.forget_product_units(self.product.id)
+        self.assertEqual(inventory.product_available_stock(self.product.id), 10)
+
+        units = inventory.cart_item_units([self.cart_item(2, color=self.red, size=self.medium, sku=self.sku)])
+        self.assertEqual(units, {
+            inventory.unit_key("sku", self.sku.pk): 2,
+            inventory.unit_key("color", self.red.pk): 2,
+            inventory.unit_key("size", self.medium.pk): 2,
+        })
+        reservation_id = self.reserve(units)
+        self.assertEqual(inventory.product_available_stock(self.product.id), 6)
+
+        inventory.commit(reservation_id)
+        self.assertEqual(inventory.product_available_stock(self.product.id), 6)
+        stocks = [model.objects.get(pk=unit.pk).stock for model, unit in (
+            (Color, self.red), (Size, self.medium), (ProductVariant, self.sku),
+        )]
+        self.assertEqual(stocks, [3, 3, 1])
+
+    def test_sku_limits_reservation_of_its_combination(self):
+        units = inventory.cart_item_units([self.cart_item(4, color=self.red, size=self.medium, sku=self.sku)])
+        with self.assertRaises(inventory.InsufficientStock):
+            self.reserve(units)
+        # Nada quedó retenido: la reserva es todo o nada
+        self.assertEqual(inventory.product_available_stock(self.product.id), 10)
+
+    def test_concurrent_reservations_never_oversell(self):
+        inventory.set_on_hand("color", self.red.pk, 5)
+        units = inventory.cart_item_units([self.cart_item(1, color=self.red)])
+
+        def attempt(_):
+            try:
+                self.reserve(units)
+                return True
+            except inventory.InsufficientStock:
+                return False
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(attempt, range(20)))
+        self.assertEqual(results.count(True), 5)
+        on_hand, reserved = inventory.redis_client.hmget(inventory.unit_key("color", self.red.pk), "on_hand", "reserved")
+        self.assertEqual((int(on_hand), int(reserved)), (5, 5))
+
+    def test_reconcile_keeps_sales_committed_after_reading_stock(self):
+        key = inventory.unit_key("color", self.red.pk)
+        inventory.set_on_hand("color", self.red.pk, 5)
+        reservation_id = self.reserve({key: 2})
+        fetch_db_stock = inventory.fetch_db_stock
+
+        def sale_during_read(keys):
+            stock = fetch_db_stock(keys)
+            # La venta se confirma entre la lectura del stock y el script
+            with self.captureOnCommitCallbacks(execute=True):
+                inventory.commit(reservation_id)
+            return stock
+
+        with mock.patch.object(inventory, "fetch_db_stock", side_effect=sale_during_read):
+            inventory.reconcile()
+        on_hand, reserved = inventory.redis_client.hmget(key, "on_hand", "reserved")
+        self.assertEqual((int(on_hand), int(reserved)), (3, 0))
+
+        # La siguiente pasada ve la venta en la base de datos
+        inventory.reconcile()
+        self.assertEqual(int(inventory.redis_client.hget(key, "on_hand")), 3)
+        self.assertEqual(Color.objects.get(pk=self.red.pk).stock, 3)
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class AutoCategorizeProductsTests(TestCase):
+    url = "/api/products/auto-categorize/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = create_user(is_staff=True)
+        cls.customer = create_user()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.post(self.url, HTTP_API_KEY=API_KEY).status_code, 401)
+        self.assertEqual(self.client.post(self.url, **auth_headers(self.customer)).status_code, 403)
+        response = self.client.get(self.url, {"task_id": "x"}, **auth_headers(self.customer))
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_reports_tasks_it_enqueued(self):
+        task = mock.Mock(id=str(uuid.uuid4()))
+        with mock.patch("apps.products.views.auto_categorize_products.delay", return_value=task):
+            response = self.client.post(self.url, **auth_headers(self.staff))
+        self.assertEqual(response.status_code, 202)
+
+        response = self.client.get(self.url, {"task_id": task.id}, **auth_headers(self.staff))
+        self.assertEqual(response.status_code, 200)
+        other_task_id = str(uuid.uuid4())
+        response = self.client.get(self.url, {"task_id": other_task_id}, **auth_headers(self.staff))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ExportProductsViewTests(TestCase):
+    url = "/api/products/export/"
+
+    @classmethod
+    def setUpTestData(cls):
+        create_product(1)
+        cls.staff = create_user(is_staff=True)
+        cls.customer = create_user()
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.get(self.url, HTTP_API_KEY=API_KEY).status_code, 401)
+        self.assertEqual(self.client.get(self.url, **auth_headers(self.customer)).status_code, 403)
+
+    def test_compresses_only_when_gzip_is_accepted(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br", **auth_headers(self.staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0, br", **auth_headers(self.staff))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn(b"zapatillas-1", b"".join(response.streaming_content))
+
+    def test_accepts_gzip_honours_weights(self):
+        self.assertTrue(accepts_gzip("gzip"))
+        self.assertTrue(accepts_gzip("br;q=1.0, GZIP;q=0.5"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip(""))
+        self.assertFalse(accepts_gzip("br, deflate"))
+        self.assertFalse(accepts_gzip("gzip;q=0"))
+        self.assertFalse(accepts_gzip("gzip; q=0.000, *"))
+        self.assertFalse(accepts_gzip("*;q=0"))
+        self.assertFalse(accepts_gzip("gzipped"))
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ImportProductsViewTests(TestCase):
+    url = "/api/products/import/"
+
+    def test_requires_staff(self):
+        self.assertEqual(self.client.post(self.url, HTTP_API_KEY=API_KEY).status_code, 401)
+        response = self.client.post(self.url, **auth_headers(create_user()))
+        self.assertEqual(response.status_code, 403)
+
+    def import_rows(self, rows, **data):
+        upload = SimpleUploadedFile("products.jsonl", "\n".join(json.dumps(row) for row in rows).encode())
+        response = self.client.post(
+            self.url, {"file": upload, **data}, **auth_headers(create_user(is_staff=True))
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_reports_malformed_rows_and_failed_chunks_then_finishes(self):
+        rows = [
+            {"slug": "bueno-1", "title": "Bueno", "price": "10.00"},
+            {"slug": "fecha-imposible", "discount_until": "2024-02-30T10:00:00"},
+            {"slug": "bueno-2", "title": "Bueno 2"},
+            {"slug": "bueno-3", "title": "Bueno 3"},
+        ]
+        # La sincronización del tercer lote falla después de guardarlo
+        failures = [1, RuntimeError("redis caído"), 1]
+        with mock.patch("apps.products.importer.refresh_product_cards", side_effect=failures), \
+                self.assertLogs("apps.products.importer", "ERROR"):
+            lines = self.import_rows(rows, chunk_size=1)
+
+        summary = lines[-1]
+        self.assertTrue(summary["done"])
+        self.assertEqual((summary["chunks"], summary["created"], summary["invalid"]), (4, 3, 1))
+        self.assertEqual([error["line"] for error in summary["errors"]], [2])
+        self.assertEqual(len(summary["chunk_errors"]), 1)
+        self.assertEqual(summary["chunk_errors"][0]["chunk"], 3)
+        self.assertEqual(summary["chunk_errors"][0]["lines"], [3, 3])
+        self.assertIn("redis caído", summary["chunk_errors"][0]["error"])
+        self.assertEqual(
+            set(Product.objects.values_list("slug", flat=True)), {"bueno-1", "bueno-2", "bueno-3"}
+        )
+
+
+class DataMigrationTests(TestCase):
+    """
+    Las migraciones de datos usan modelos históricos y su propia copia de la
+    lógica: deben dar el mismo resultado que el código actual.
+    """
+
+    def run_data_migration(self, name, function):
+        migration = importlib.import_module(f"apps.products.migrations.{name}")
+        state = MigrationExecutor(connection).loader.project_state(("products", name))
+        getattr(migration, function)(state.apps, None)
+
+    def test_search_vector_backfill_matches_search_module(self):
+        create_product(1, keywords="trail montaña")
+        update_search_vector(Product.objects.all())
+        expected = Product.objects.values_list("search_vector", flat=True).get()
+        Product.objects.update(search_vector=None)
+
+        self.run_data_migration("0013_search_vector_slug", "populate_search_vector")
+        self.assertEqual(Product.objects.values_list("search_vector", flat=True).get(), expected)
+        self.assertTrue(apply_search(Product.objects.all(), "zapatillas-1").exists())
+
+    def test_card_backfill_matches_card_builder(self):
+        product = create_product(1)
+        Color.objects.create(product=product, title="Rojo", hex="#f00", price=Decimal("1.50"), stock=4)
+        Size.objects.create(product=product, title="M", price=Decimal("2.00"), stock=2)
+        create_product(2, status="draft")
+        expected = build_product_card(card_source_queryset().get(pk=product.pk))
+        ProductCard.objects.all().delete()
+
+        self.run_data_migration("0009_productcard", "populate_product_cards")
+
+        card = ProductCard.objects.get()
+        self.assertEqual(card.product_id, product.pk)
+        fields = [field for field in CARD_UPDATE_FIELDS if field != "refreshed_at"]
+        self.assertEqual(
+            {field: getattr(card, field) for field in fields},
+            {field: getattr(expected, field) for field in fields},
+        )
+
+
+class BenchmarkProductImportTests(TestCase):
+
+    def test_leaves_no_trace_in_database_or_redis(self):
+        with mock.patch("apps.products.importer.invalidate_tags") as invalidate, \
+                mock.patch.object(inventory, "set_many_on_hand") as set_many_on_hand, \
+                mock.patch.object(inventory, "set_on_hand") as set_on_hand:
+            call_command("benchmark_product_import", rows=20, legacy_rows=5, variants=True, stdout=StringIO())
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(ProductCard.objects.exists())
+        invalidate.assert_not_called()
+        set_many_on_hand.assert_not_called()
+        set_on_hand.assert_not_called()
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ProductMediaSigningTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_thumbnail_fallback_is_signed_in_the_batch(self):
+        product = create_product(1)
+        images = [
+            Media.objects.create(
+                name=f"foto-{index}", size="1", type="image/png", key=f"media/foto-{index}.png", media_type="image",
+            )
+            for index in range(2)
+        ]
+        product.images.set(images)
+        first = min(images, key=lambda image: image.pk)
+
+        def sign_many(keys, expires_in):
+            return {key: f"https://cdn.example.com/{key}?ttl={expires_in}" for key in keys}
+
+        with mock.patch.object(url_signer, "sign_many", side_effect=sign_many), \
+                mock.patch("apps.assets.serializers.get_cloudfront_signed_url", return_value="unbatched") as sign_one:
+            response = self.client.get("/api/products/detail/", {"slug": product.slug}, HTTP_API_KEY=API_KEY)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"]["thumbnail"],
+            f"https://cdn.example.com/{first.key}?ttl={ProductSerializer.THUMBNAIL_EXPIRES_IN}",
+        )
+        sign_one.assert_not_called()
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Recorrer todas las páginas por cursor, hacia adelante o hacia atrás, da el
+    mismo orden que un ORDER BY (sort_field, id) con los NULL al final.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        prices = [Decimal("20.00"), None, Decimal("10.00"), Decimal("20.00"), None]
+        cls.products = [create_product(index, price=price) for index, price in enumerate(prices)]
+
+    def expected(self, descending=False):
+        priced = sorted((p for p in self.products if p.price is not None), key=lambda p: (p.price, p.pk))
+        unpriced = sorted((p for p in self.products if p.price is None), key=lambda p: p.pk)
+        if descending:
+            priced.reverse()
+            unpriced.reverse()
+        return [p.slug for p in priced + unpriced]
+
+    def fetch(self, cursor="", descending=False):
+        request = Request(APIRequestFactory().get("/api/products/list/", {"cursor": cursor}))
+        paginator = KeysetPagination("price", descending=descending, page_size=2)
+        rows = paginator.paginate_data(Product.objects.all(), request)
+        return [row.slug for row in rows], paginator
+
+    def walk_forward(self, descending=False):
+        pages, cursor = [], ""
+        while cursor is not None:
+            rows, paginator = self.fetch(cursor, descending)
+            pages.append(rows)
+            cursor = paginator.next_cursor
+        return pages
+
+    def test_forward_pages_follow_the_ordering_with_nulls_last(self):
+        pages = self.walk_forward()
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), self.expected())
+
+    def test_descending_pages_keep_nulls_last(self):
+        self.assertEqual(sum(self.walk_forward(descending=True), []), self.expected(descending=True))
+
+    def test_backward_pages_mirror_the_forward_ones(self):
+        forward, cursor = [], ""
+        while cursor is not None:
+            rows, paginator = self.fetch(cursor)
+            forward.append(rows)
+            cursor = paginator.next_cursor
+        # Desde la última página, previous recorre las anteriores con el mismo contenido
+        backward, cursor = [], paginator.previous_cursor
+        while cursor is not None:
+            rows, paginator = self.fetch(cursor)
+            backward.insert(0, rows)
+            cursor = paginator.previous_cursor
+        self.assertEqual(backward, forward[:-1])
+
+    def test_tampered_cursor_is_rejected(self):
+        for cursor in ("no-es-base64!", "bm90IGpzb24=", "WzFd"):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.fetch(cursor)
+
+
+class CacheKeyTests(TestCase):
+
+    def key(self, query, **kwargs):
+        return make_cache_key("product_list", QueryDict(query), **kwargs)
+
+    def test_equivalent_query_strings_share_a_key(self):
+        key = self.key("category=b&category=a&search=Zapatillas%20Running")
+        self.assertEqual(key, self.key("search=zapatillas+running&category=a&category=b"))
+        self.assertEqual(key, self.key("category=a&category=b&category=a&search=  ZAPATILLAS   running "))
+        self.assertEqual(key, self.key("category=a&category=b&search=zapatillas running&condition="))
+        self.assertNotEqual(key, self.key("category=a&search=zapatillas running"))
+        self.assertNotEqual(key, make_cache_key("product_facets", QueryDict("category=a&category=b&search=zapatillas running")))
+
+    def test_only_and_defaults_filter_params(self):
+        kwargs = {"only": ("category", "p", "page_size"), "defaults": {"p": 1, "page_size": 6}}
+        self.assertEqual(
+            normalize_query_params(QueryDict("category=a&p=1&page_size=6&utm_source=mail"), **kwargs),
+            {"category": ["a"]},
+        )
+        self.assertEqual(self.key("category=a&p=1&fbclid=x", **kwargs), self.key("category=a", **kwargs))
+        self.assertNotEqual(self.key("category=a&p=2", **kwargs), self.key("category=a", **kwargs))
+
+    def test_keep_empty_params_are_not_dropped(self):
+        self.assertEqual(normalize_query_params(QueryDict("cursor=&p="), keep_empty=("cursor",)), {"cursor": [""]})
+        self.assertNotEqual(self.key("cursor=", keep_empty=("cursor",)), self.key("", keep_empty=("cursor",)))
+
+
+class FakeClock:
+    """
+    Reemplaza al módulo time en utils.cache_utils: sleep avanza el reloj y
+    ejecuta `on_sleep` (lo que hace otra petición mientras se espera).
+    """
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.on_sleep = None
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.on_sleep is not None:
+            self.on_sleep()
+
+
+class CountingView:
+    def __init__(self):
+        self.calls = 0
+
+    @cache_response("test_view", 60, tags=("test_tag",), stale_timeout=30, lock_wait=1.0)
+    def get(self, request):
+        self.calls += 1
+        return Response({"calls": self.calls})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheResponseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        self.view = CountingView()
+        self.key = make_cache_key("test_view", QueryDict(""))
+        for patcher in (
+            mock.patch("utils.cache_utils.time", self.clock),
+            mock.patch("utils.cache_utils.record_cache_metrics"),
+            # Sin expiración temprana salvo que el test la pida
+            mock.patch("utils.cache_utils.random.random", return_value=0.0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self):
+        return self.view.get(Request(APIRequestFactory().get("/")))
+
+    def hold_lock(self):
+        cache.add(f"{self.key}:lock", 1)
+
+    def test_fresh_entry_is_served_from_cache(self):
+        self.assertEqual(self.get().data, {"calls": 1})
+        self.clock.now += 59
+        self.assertEqual(self.get().data, {"calls": 1})
+        self.assertEqual(self.view.calls, 1)
+
+    def test_expired_entry_is_served_stale_while_locked_and_recomputed_otherwise(self):
+        self.get()
+        self.clock.now += 61
+        self.hold_lock()
+        response = self.get()
+        self.assertEqual(response.data, {"calls": 1})
+        self.assertTrue(response.served_stale)
+
+        cache.delete(f"{self.key}:lock")
+        self.assertEqual(self.get().data, {"calls": 2})
+
+    def test_invalidated_entry_is_never_served_stale(self):
+        self.get()
+        self.clock.now += 1
+        invalidate_tags("test_tag")
+        self.hold_lock()
+        started = self.clock.now
+        response = self.get()
+        self.assertEqual(response.data, {"calls": 2})
+        self.assertFalse(getattr(response, "served_stale", False))
+        # Esperó lock_wait a que otra petición la guardara y luego la recalculó
+        self.assertGreaterEqual(self.clock.now - started, 1.0)
+
+    def test_waits_for_the_lock_holder_entry(self):
+        self.get()
+        entry = cache.get(self.key)
+        cache.delete(self.key)
+        self.hold_lock()
+        # Quien tiene el lock guarda la entrada mientras esta petición espera
+        self.clock.on_sleep = lambda: cache.set(self.key, entry)
+        self.assertEqual(self.get().data, {"calls": 1})
+        self.assertEqual(self.view.calls, 1)
+
+    def test_probabilistic_early_expiry_grows_with_recompute_cost(self):
+        entry = {"soft_expires_at": self.clock.now + 10, "recompute_seconds": 5.0}
+        with mock.patch("utils.cache_utils.random.random", return_value=0.5):
+            # early = 5 * ln(2) ≈ 3.5 s: todavía vigente
+            self.assertTrue(entry_is_fresh(entry))
+        with mock.patch("utils.cache_utils.random.random", return_value=0.99):
+            # early = 5 * ln(100) ≈ 23 s: se da por vencida antes de tiempo
+            self.assertFalse(entry_is_fresh(entry))
+            self.assertTrue(entry_is_fresh({**entry, "recompute_seconds": 0.1}))
+        self.clock.now += 11
+        self.assertFalse(entry_is_fresh(entry))
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class CategoryTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothes = Category.objects.create(name="Ropa", slug="ropa")
+        cls.shirts = Category.objects.create(name="Camisas", slug="camisas", parent=cls.clothes)
+        cls.polos = Category.objects.create(name="Polos", slug="polos", parent=cls.shirts)
+        cls.trousers = Category.objects.create(name="Pantalones", slug="pantalones", parent=cls.clothes)
+        cls.home = Category.objects.create(name="Hogar", slug="hogar")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_tree_loads_in_one_query_and_serializes_from_memory(self):
+        with self.assertNumQueries(1):
+            node, = load_category_relations([self.shirts])
+        with self.assertNumQueries(0):
+            data = CategorySerializer(node).data
+
+        self.assertEqual(data["parent"], self.clothes.pk)
+        self.assertEqual([child["name"] for child in data["children"]], ["Polos"])
+        self.assertEqual(data["children"][0]["children"], [])
+        # Padre, hermano e hijo
+        self.assertEqual(
+            sorted(related["name"] for related in data["related_categories"]), ["Pantalones", "Polos", "Ropa"],
+        )
+
+    def test_list_nests_children_and_follows_moved_subtrees(self):
+        self.shirts.parent = self.home
+        self.shirts.save()
+        expected_path = f"{self.home.id.hex}/{self.shirts.id.hex}/{self.polos.id.hex}/"
+        self.assertEqual(Category.objects.get(pk=self.polos.pk).path, expected_path)
+
+        response = self.client.get("/api/products/categories/", HTTP_API_KEY=API_KEY)
+        tree = {
+            root["name"]: {child["name"]: [leaf["name"] for leaf in child["children"]] for child in root["children"]}
+            for root in response.json()["results"]
+        }
+        self.assertEqual(tree, {"Ropa": {"Pantalones": []}, "Hogar": {"Camisas": ["Polos"]}})
+
+        root, = load_category_tree(self.home)
+        self.assertEqual([child.name for child in root.children.all()], ["Camisas"])
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class SearchRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            for slug, title, keywords, description, price in (
+                ("mochila", "Mochila urbana", "", "Cabe un par de zapatillas", "5.00"),
+                ("zapatillas-trail", "Zapatillas trail", "", "Para montaña", "30.00"),
+                ("calcetines", "Calcetines técnicos", "zapatillas, running", "Algodón", "8.00"),
+                ("taza", "Taza de cerámica", "", "Para café", "3.00"),
+            ):
+                Product.objects.create(
+                    title=title, slug=slug, keywords=keywords, description=description,
+                    status="published", price=Decimal(price),
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, text, **params):
+        response = self.client.get("/api/products/list/", {"search": text, **params}, HTTP_API_KEY=API_KEY)
+        return [card["slug"] for card in response.json()["results"]]
+
+    def test_ranks_title_over_keywords_over_description_with_prefixes(self):
+        self.assertEqual(self.search("zapat"), ["zapatillas-trail", "calcetines", "mochila"])
+        ranked = apply_search(Product.objects.all(), "ZAPATILLAS!").order_by("-search_rank")
+        self.assertEqual(list(ranked.values_list("slug", flat=True)), ["zapatillas-trail", "calcetines", "mochila"])
+
+    def test_all_terms_must_match_and_explicit_sorting_overrides_rank(self):
+        self.assertEqual(self.search("zapatillas running"), ["calcetines"])
+        # Un orden explícito sustituye a la relevancia
+        self.assertEqual(
+            self.search("zapatillas", sorting="price", ordering="asc"), ["mochila", "calcetines", "zapatillas-trail"],
+        )
+        self.assertFalse(apply_search(Product.objects.all(), "¡¿!?").exists())
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class CacheMetricsTests(TestCase):
+    metrics_key = f"{METRICS_KEY_PREFIX}:product_list"
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            create_product(1)
+
+    def setUp(self):
+        cache.clear()
+        redis_client.delete(self.metrics_key)
+        self.addCleanup(redis_client.delete, self.metrics_key)
+
+    def test_equivalent_urls_share_one_entry_and_count_hits(self):
+        urls = (
+            "/api/products/list/?search=Zapatillas&ordering=desc&page_size=20",
+            "/api/products/list/?page_size=20&search=zapatillas",
+            "/api/products/list/?search=%20zapatillas%20&page_size=20&page_size=20",
+        )
+        bodies = [self.client.get(url, HTTP_API_KEY=API_KEY).json() for url in urls]
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(bodies[0], bodies[2])
+
+        metrics = get_cache_metrics()["product_list"]
+        self.assertEqual((metrics["misses"], metrics["hits"], metrics["recomputes"]), (1, 2, 1))
+
+        out = StringIO()
+        call_command("cache_metrics", stdout=out)
+        self.assertIn("product_list: 2 aciertos, 0 obsoletas, 1 fallos (hit rate 66.67%)", out.getvalue())
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class ProductQuoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shirt = create_product(
+            1, price=Decimal("20.00"), compare_price=Decimal("25.00"),
+            discount_until=timezone.now() + timedelta(days=1),
+        )
+        cls.red = Color.objects.create(product=cls.shirt, title="Rojo", hex="#f00", price=Decimal("1.50"), stock=2)
+        cls.large = Size.objects.create(product=cls.shirt, title="L", price=Decimal("3.00"), stock=2)
+        cls.mug = create_product(2, price=Decimal("8.00"))
+        cls.blue = Color.objects.create(product=cls.mug, title="Azul", hex="#00f", price=Decimal("0.50"), stock=2)
+
+    def line(self, product_id, count=1, **variants):
+        return {"product_id": str(product_id), "count": count, **{k: str(v) for k, v in variants.items()}}
+
+    def test_quotes_every_line_in_one_query_per_table(self):
+        body = {"lines": [
+            self.line(self.shirt.pk, 2, color_id=self.red.pk, size_id=self.large.pk),
+            # Un color de otro producto se ignora
+            self.line(self.mug.pk, 3, color_id=self.red.pk),
+            self.line(uuid.uuid4()),
+        ]}
+        # Productos, colores y tallas
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                "/api/products/quote/", body, content_type="application/json", HTTP_API_KEY=API_KEY,
+            )
+
+        shirt, mug, missing = response.json()["results"]
+        self.assertEqual(
+            (shirt["price"], shirt["compare_price"], shirt["discount_active"], shirt["total"]),
+            (24.5, 29.5, True, 49.0),
+        )
+        self.assertEqual((shirt["color_id"], shirt["size_id"]), (str(self.red.pk), str(self.large.pk)))
+        self.assertEqual((mug["price"], mug["discount_active"], mug["total"]), (8.0, False, 24.0))
+        self.assertNotIn("color_id", mug)
+        self.assertEqual(missing["available"], False)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        lines = [
+            {"product_id": self.shirt.pk, "count": 1, "variants": {
+                "color_id": self.red.pk, "size_id": None, "material_id": None, "weight_id": None, "flavor_id": None,
+            }},
+        ]
+        with self.assertNumQueries(2):
+            quote_lines(lines)
+        with self.assertNumQueries(2):
+            quotes = quote_lines(lines * 50)
+        self.assertEqual({quote["price"] for quote in quotes}, {Decimal("21.50")})
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class SimilarProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Ropa", slug="ropa")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.shirt, cls.trousers, cls.socks, cls.hat, cls.scarf = (
+                create_product(index, category=cls.category) for index in range(5)
+            )
+            cls.draft = create_product(5, status="draft")
+        ProductCard.objects.filter(product=cls.scarf).update(average_rating=Decimal("4.50"))
+
+        # Sesión -> interacciones; el peso de cada producto es el de su interacción más fuerte
+        sessions = {
+            "s1": [(cls.shirt, "view"), (cls.trousers, "purchase")],
+            "s2": [(cls.shirt, "view"), (cls.trousers, "view")],
+            "s3": [(cls.shirt, "add_to_cart"), (cls.shirt, "view"), (cls.socks, "view")],
+            "s4": [(cls.shirt, "view"), (cls.socks, "view")],
+            # Borrador: no se recomienda aunque tenga soporte
+            "s5": [(cls.shirt, "view"), (cls.draft, "view")],
+            "s6": [(cls.shirt, "view"), (cls.draft, "view")],
+            # Una sola sesión no alcanza MIN_SUPPORT
+            "s7": [(cls.shirt, "view"), (cls.hat, "view")],
+        }
+        for session_id, interactions in sessions.items():
+            for product, interaction_type in interactions:
+                ProductInteraction.objects.create(
+                    product=product, session_id=session_id, interaction_type=interaction_type,
+                )
+
+    def setUp(self):
+        products = (self.shirt, self.trousers, self.socks, self.hat, self.scarf, self.draft)
+        keys = [similar_key(product.id) for product in products]
+        redis_client.delete(*keys)
+        self.addCleanup(redis_client.delete, *keys)
+
+    def test_rebuild_stores_weighted_cosine_neighbors(self):
+        rebuild_similar_products()
+
+        neighbors = similar_product_scores([self.shirt.id])
+        self.assertEqual([neighbor_id for neighbor_id, _ in neighbors], [str(self.socks.id), str(self.trousers.id)])
+        # shirt = (1, 1, 3, 1, 1, 1, 1), socks = (0, 0, 1, 1, 0, 0, 0), trousers = (5, 1, 0, 0, 0, 0, 0)
+        self.assertAlmostEqual(neighbors[0][1], 4 / (15 ** 0.5 * 2 ** 0.5))
+        self.assertAlmostEqual(neighbors[1][1], 6 / (15 ** 0.5 * 26 ** 0.5))
+
+    def test_recommendations_fill_from_the_category_after_neighbors(self):
+        rebuild_similar_products()
+
+        self.assertEqual(
+            recommend_product_ids([self.shirt.id], limit=3),
+            [str(self.socks.id), str(self.trousers.id), str(self.scarf.id)],
+        )
+        response = self.client.get(
+            "/api/products/similar/", {"product_id": self.shirt.id, "limit": 2}, HTTP_API_KEY=API_KEY,
+        )
+        self.assertEqual([card["slug"] for card in response.json()["results"]], [self.socks.slug, self.trousers.slug])
+
+
+@override_settings(VALID_API_KEYS=[API_KEY])
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Calzado", slug="calzado")
+        cls.home = Category.objects.create(name="Hogar", slug="hogar")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.boots, cls.sandals, cls.slippers = (create_product(index, category=cls.shoes) for index in range(3))
+            cls.mug = create_product(3, category=cls.home)
+
+    def setUp(self):
+        cache.clear()
+        # Claves propias para no tocar las tendencias reales
+        for name, value in (("TRENDING_KEY_PREFIX", "test_trending"), ("DECAYED_AT_KEY", "test_trending:decayed_at")):
+            patcher = mock.patch.object(trending, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.clear_keys()
+        self.addCleanup(self.clear_keys)
+
+    def clear_keys(self):
+        for key in redis_client.scan_iter(match="test_trending:*"):
+            redis_client.delete(key)
+
+    def record(self, product, interaction_type, times=1):
+        for _ in range(times):
+            trending.record_interaction(product.id, interaction_type, (product.category_id,))
+
+    def test_decay_halves_per_half_life_and_drops_faded_products(self):
+        start = 1_700_000_000
+        trending.decay_trending(now=start)
+        self.record(self.boots, "purchase")
+        self.record(self.sandals, "view", times=3)
+        self.record(self.slippers, "view")
+
+        trending.decay_trending(now=start + 5 * 60 * 60)
+
+        # Cinco vidas medias en la ventana de una hora: 8 / 32 y 3 / 32; 1 / 32 < MIN_SCORE
+        self.assertEqual(
+            trending.trending_scores("hour"), [(str(self.boots.id), 0.25), (str(self.sandals.id), 0.09375)],
+        )
+        day_factor = 0.5 ** (5 / 24)
+        self.assertEqual([product_id for product_id, _ in trending.trending_scores("day")], [
+            str(self.boots.id), str(self.sandals.id), str(self.slippers.id),
+        ])
+        self.assertAlmostEqual(trending.trending_scores("day")[0][1], 8 * day_factor)
+
+    def test_list_sorts_by_trending_score_within_the_category(self):
+        self.record(self.mug, "purchase", times=2)
+        self.record(self.sandals, "add_to_cart")
+        self.record(self.boots, "view", times=2)
+
+        def slugs(**params):
+            response = self.client.get(
+                "/api/products/list/", {"sorting": "trending", "window": "week", **params}, HTTP_API_KEY=API_KEY,
+            )
+            return [card["slug"] for card in response.json()["results"]]
+
+        self.assertEqual(slugs(), [self.mug.slug, self.sandals.slug, self.boots.slug])
+        self.assertEqual(slugs(categories="calzado"), [self.sandals.slug, self.boots.slug])
+        self.assertEqual(slugs(categories="calzado", ordering="asc"), [self.boots.slug, self.sandals.slug])
@@ -0,0 +1,135 @@
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.db.models import Case, FloatField, Value, When
+
+from .models import Category
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+# Sorted sets {producto: puntos} por ventana y alcance:
+# trending:<ventana>:global y trending:<ventana>:category:<id>
+TRENDING_KEY_PREFIX = "trending"
+# Hash {ventana: timestamp} del último decaimiento aplicado
+DECAYED_AT_KEY = "trending:decayed_at"
+# Vida media de los puntos de cada ventana, en segundos
+TRENDING_WINDOWS = {"hour": 60 * 60, "day": 60 * 60 * 24, "week": 60 * 60 * 24 * 7}
+DEFAULT_WINDOW = "day"
+# Puntos que suma cada tipo de interacción (los demás no cuentan)
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "like": 2.0,
+    "rate": 2.0,
+    "share": 3.0,
+    "wishlist": 3.0,
+    "add_to_cart": 4.0,
+    "purchase": 8.0,
+}
+# Productos que se leen de redis para ?sorting=trending
+TRENDING_LIMIT = 500
+# Compactación: miembros con menos puntos se eliminan y cada set guarda como máximo MAX_MEMBERS
+MIN_SCORE = 0.05
+MAX_MEMBERS = 5000
+# Nombre de la anotación por la que se ordena el listado
+TRENDING_SORT_FIELD = "trending_score"
+
+
+def trending_key(window, category_id=None):
+    scope = f"category:{category_id}" if category_id else "global"
+    return f"{TRENDING_KEY_PREFIX}:{window}:{scope}"
+
+
+def record_interaction(product_id, interaction_type, category_ids=()):
+    """
+    Suma los puntos de una interacción al set global y a los de cada
+    categoría del producto (categoría, subcategoría y tema) en todas las ventanas.
+    """
+    weight = INTERACTION_WEIGHTS.get(interaction_type)
+    if not weight:
+        return
+    scopes = [None, *(category_id for category_id in category_ids if category_id)]
+    pipe = redis_client.pipeline(transaction=False)
+    for window in TRENDING_WINDOWS:
+        for category_id in scopes:
+            pipe.zincrby(trending_key(window, category_id), weight, str(product_id))
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        # Las tendencias son aproximadas: no deben romper el registro de la interacción
+        logger.warning(f"Could not record trending score for Product ID {product_id}: {str(e)}")
+
+
+def decay_trending(now=None):
+    """
+    Aplica el decaimiento exponencial desde la última ejecución y compacta los sets.
+    Cada set se multiplica por 0.5 ** (transcurrido / vida media) con ZUNIONSTORE
+    en el propio servidor, así los ZINCRBY concurrentes no se pierden.
+    Devuelve {ventana: sets procesados}.
+    """
+    now = now or time.time()
+    decayed_at = {
+        window.decode(): float(timestamp) for window, timestamp in redis_client.hgetall(DECAYED_AT_KEY).items()
+    }
+    processed = {}
+    for window, half_life in TRENDING_WINDOWS.items():
+        elapsed = max(now - decayed_at.get(window, now), 0)
+        factor = 0.5 ** (elapsed / half_life)
+        pipe = redis_client.pipeline(transaction=False)
+        processed[window] = 0
+        for key in redis_client.scan_iter(match=f"{TRENDING_KEY_PREFIX}:{window}:*", count=1000):
+            if factor < 1:
+                pipe.zunionstore(key, {key: factor})
+            pipe.zremrangebyscore(key, "-inf", f"({MIN_SCORE}")
+            pipe.zremrangebyrank(key, 0, -(MAX_MEMBERS + 1))
+            processed[window] += 1
+        pipe.hset(DECAYED_AT_KEY, window, now)
+        pipe.execute()
+    return processed
+
+
+def trending_scores(window=DEFAULT_WINDOW, category_id=None, limit=TRENDING_LIMIT):
+    """
+    [(producto, puntos)] con más puntos de la ventana, del más al menos popular.
+    """
+    rows = redis_client.zrevrange(trending_key(window, category_id), 0, limit - 1, withscores=True)
+    return [(member.decode(), score) for member, score in rows]
+
+
+def trending_category_id(query_params):
+    """
+    Categoría cuyo set se usa como candidatos: sólo cuando el listado se limita
+    a una categoría (por `categories` o `category_tree`, UUID o slug). Cada
+    producto suma en su categoría, subcategoría y tema, así que el set de un
+    nodo cubre todo su subárbol. En otro caso se usa el set global.
+    """
+    identifiers = [*query_params.getlist("categories", []), *query_params.getlist("category_tree", [])]
+    if len(set(identifiers)) != 1:
+        return None
+    try:
+        return uuid.UUID(identifiers[0])
+    except ValueError:
+        return Category.objects.filter(slug=identifiers[0]).values_list("id", flat=True).first()
+
+
+def annotate_trending(qs, query_params):
+    """
+    Limita un queryset de ProductCard a los productos en tendencia y anota
+    sus puntos como `trending_score`. El resto de filtros se aplica sobre el queryset.
+    """
+    window = query_params.get("window", DEFAULT_WINDOW)
+    if window not in TRENDING_WINDOWS:
+        raise ValueError(f"Ventana no soportada: {window}")
+    scores = trending_scores(window, trending_category_id(query_params))
+    if not scores:
+        return qs.none().annotate(**{TRENDING_SORT_FIELD: Value(0.0, output_field=FloatField())})
+    return qs.filter(product_id__in=[product_id for product_id, _ in scores]).annotate(**{
+        TRENDING_SORT_FIELD: Case(
+            *(When(product_id=product_id, then=Value(score)) for product_id, score in scores),
+            output_field=FloatField(),
+        )
+    })
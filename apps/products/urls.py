@@ -2,31 +2,43 @@ from django.urls import path
 
 from .views import (
     ListProductView,
+    ProductFacetsView,
     DetailProductView,
     UpdateProductAnalyticsView,
     GenerateFakeProductsView,
+    ImportProductsView,
+    ExportProductsView,
+    SimilarProductsView,
     ToggleLikeView,
     RegisterShareView,
     CategoryListView,
+    CategoryTreeView,
     UpdateCategoryAnalyticsView,
     AutoCategorizeProducts,
     DetailCategoryView,
     ProductStockView,
     ListProductsByIdView,
     ProductPriceView,
+    ProductQuoteView,
     ListProductsFromCartItemByIdView
 )
 
 urlpatterns = [
     path("list/", ListProductView.as_view(), name="product-list"),
+    path("facets/", ProductFacetsView.as_view(), name="product-facets"),
     path("detail/", DetailProductView.as_view(), name="product-detail"),
     path("detail/stock/", ProductStockView.as_view(), name="product-stock"),
     path("detail/price/", ProductPriceView.as_view(), name="product-price"),
+    path("quote/", ProductQuoteView.as_view(), name="product-quote"),
+    path("similar/", SimilarProductsView.as_view(), name="product-similar"),
     path("analytics/update/", UpdateProductAnalyticsView.as_view(), name="product-analytics-update"),
     path("generate-fake/", GenerateFakeProductsView.as_view(), name="generate_fake_products"),
+    path("import/", ImportProductsView.as_view(), name="product-import"),
+    path("export/", ExportProductsView.as_view(), name="product-export"),
     path("toggle-like/", ToggleLikeView.as_view(), name="toggle-product-like"),
     path("register-share/", RegisterShareView.as_view(), name="register-product-share"),
     path('categories/', CategoryListView.as_view(), name="product-categories-list"),
+    path('categories/tree/', CategoryTreeView.as_view(), name="product-categories-tree"),
     path('category/', DetailCategoryView.as_view(), name="product-category"),
     path("analytics/categories/update/", UpdateCategoryAnalyticsView.as_view(), name="category-analytics-update"),
     path("auto-categorize/", AutoCategorizeProducts.as_view()),
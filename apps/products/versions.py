@@ -0,0 +1,80 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Max
+from django.utils import timezone
+
+from utils.cache_utils import get_tag_versions
+from utils.s3_utils import url_signer
+from .cache_tags import CATALOG_TAG, CATEGORIES_TAG, product_tag, sorting_tags
+from .models import Product, ProductCard, Category
+
+
+def latest(*values):
+    """
+    El más reciente de varios datetimes o timestamps (versiones de tags), ignorando None.
+    """
+    stamps = [
+        datetime.fromtimestamp(value, tz=dt_timezone.utc) if isinstance(value, (int, float)) else value
+        for value in values if value is not None
+    ]
+    return max(stamps) if stamps else None
+
+
+def signed_url_window_start():
+    """
+    Inicio de la ventana actual de firmas de CloudFront. Los cuerpos con
+    imágenes llevan URLs firmadas que cambian con cada ventana, así que su
+    versión avanza con ella aunque los datos no cambien (no aplica con cookies firmadas).
+    """
+    if url_signer.uses_signed_cookies:
+        return None
+    return datetime.fromtimestamp(url_signer.current_window_start(), tz=dt_timezone.utc)
+
+
+def _product_row(request, *fields):
+    slug = request.query_params.get("slug")
+    if not slug:
+        return None
+    return Product.objects.filter(slug=slug).values_list("id", "updated_at", *fields).first()
+
+
+def product_detail_version(request):
+    """
+    Sello del detalle: producto, analíticas, tags del producto y categorías,
+    y ventana de firmas de las imágenes.
+    """
+    row = _product_row(request, "product_analytics__updated_at")
+    if row is None:
+        return None
+    product_id, updated_at, analytics_updated_at = row
+    tags = get_tag_versions([product_tag(product_id), CATEGORIES_TAG])
+    modified = latest(updated_at, analytics_updated_at, *tags.values(), signed_url_window_start())
+    return f"product:{product_id}", modified
+
+
+def product_state_version(request):
+    """
+    Sello del precio: producto, tag del producto (lo bumpean las variantes) y,
+    si el descuento ya venció, el instante en que venció: la bandera de
+    descuento cambia entonces sin que cambie ninguna fila.
+    """
+    row = _product_row(request, "discount_until")
+    if row is None:
+        return None
+    product_id, updated_at, discount_until = row
+    expired_at = discount_until if discount_until and discount_until <= timezone.now() else None
+    tags = get_tag_versions([product_tag(product_id)])
+    return f"product-state:{product_id}", latest(updated_at, *tags.values(), expired_at)
+
+
+def catalog_version(request):
+    """
+    Sello del listado: última tarjeta (índice sobre refreshed_at) y categoría
+    actualizadas, tags del catálogo y ventana de firmas. Ordenado por analíticas
+    o por tendencia también cambia con su tag (ver sorting_tags).
+    """
+    cards_updated_at = ProductCard.objects.aggregate(value=Max("refreshed_at"))["value"]
+    categories_updated_at = Category.objects.aggregate(value=Max("updated_at"))["value"]
+    tags = get_tag_versions([CATALOG_TAG, CATEGORIES_TAG, *sorting_tags(request)])
+    modified = latest(cards_updated_at, categories_updated_at, *tags.values(), signed_url_window_start())
+    return "catalog", modified
@@ -1,37 +1,138 @@
 from pprint import pprint
-from faker import Faker
-import random
+import json
 import uuid
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 
+from celery.result import AsyncResult
 from rest_framework_api.views import StandardAPIView
 from rest_framework.exceptions import NotFound, APIException, ValidationError
 from rest_framework import permissions, status
-from django.db import transaction
+from rest_framework.parsers import MultiPartParser
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.text import compress_sequence
 from django.conf import settings
 from django.utils import timezone
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 from django.db.models import DecimalField, FloatField, IntegerField
 from django.db.models import Q, F, Prefetch, Value
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
-from django.utils.text import slugify
 import redis
 from bs4 import BeautifulSoup
 
 from core.permissions import HasValidAPIKey
-from .models import (Product, ProductInteraction, ProductAnalytics,Category, CategoryInteraction, CategoryAnalytics)
-from .serializers import (ProductSerializer, ProductListSerializer, CategorySerializer)
+from .models import (Product, ProductInteraction, ProductAnalytics, ProductCard, ProductVariant, Category, CategoryInteraction, CategoryAnalytics)
+from .serializers import (ProductSerializer, ProductListSerializer, ProductCardSerializer, CategorySerializer, CategoryTreeSerializer, product_has_liked)
+from .search import apply_search
+from .facets import compute_facets
+from .inventory import product_available_stock
+from .tasks import auto_categorize_products
+from .exporter import (
+    DEFAULT_CHUNK_SIZE as EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, EXPORT_FORMATS, accepts_gzip, export_queryset, iter_export,
+)
+from .recommendations import recommend_product_ids
+from .trending import DEFAULT_WINDOW as TRENDING_WINDOW, TRENDING_SORT_FIELD, TRENDING_WINDOWS, annotate_trending
+from .importer import DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, ProductImporter, fake_product_rows, guess_format, read_rows
+from .pricing import (
+    VARIANT_PARAMS, lines_from_query_params, parse_quote_lines, parse_variant_id, quote_lines,
+    quote_product, quote_sku, resolve_cart_lines, sku_options,
+)
+from .cache_tags import product_list_tags, product_detail_tags, category_tags
+from .versions import catalog_version, product_detail_version, product_state_version
+from .category_tree import attach_category_relations, load_category_relations, load_category_tree, subtree_q
 from apps.assets.models import Media
 from utils.ip_utils import get_client_ip, get_device_type
+from utils.pagination import QuerysetPaginationMixin, PAGINATION_PARAMS, PAGINATION_DEFAULTS
+from utils.cache_utils import cache_response
+from utils.conditional import conditional_response
 
 redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
 
+CATALOG_FILTER_PARAMS = (
+    "search", "categories", "category_tree", "condition", "packaging",
+    "discount", "min_price", "max_price", "in_stock",
+)
 
+# Máximo de productos similares por petición
+MAX_SIMILAR_PRODUCTS = 50
 
-class ListProductView(StandardAPIView):
+# Métricas de ProductAnalytics por las que se puede ordenar el catálogo
+ANALYTICS_SORT_FIELDS = {
+    "analytics_views": ("views", IntegerField()),
+    "analytics_likes": ("likes", IntegerField()),
+    "analytics_shares": ("shares", IntegerField()),
+    "analytics_wishlist": ("wishlist_count", IntegerField()),
+    "analytics_purchases": ("purchases", IntegerField()),
+    "analytics_revenue": ("revenue_generated", DecimalField(max_digits=10, decimal_places=2)),
+}
+
+
+def filter_product_cards(qs, query_params):
+    """
+    Aplica sobre un queryset de ProductCard los filtros de catálogo comunes
+    al listado y a los facets.
+    """
+    search      = query_params.get("search", "").strip()
+    categories  = query_params.getlist("categories", [])
+    subtrees    = query_params.getlist("category_tree", [])
+    conditions  = query_params.getlist("condition", [])
+    packagings  = query_params.getlist("packaging", [])
+    discount    = query_params.get("discount")
+    min_price   = query_params.get("min_price")
+    max_price   = query_params.get("max_price")
+    in_stock    = query_params.get("in_stock")
+
+    # Búsqueda libre (full-text sobre product.search_vector)
+    if search:
+        qs = apply_search(qs, search, vector_field="product__search_vector")
+
+    # Categoría, subcategoría o tema (UUID o slug)
+    if categories:
+        q_filters = Q()
+        for identifier in categories:
+            try:
+                # Si es UUID, filtramos por los tres campos
+                uuid_val = uuid.UUID(identifier)
+                q_filters |= Q(category__id=uuid_val)
+                q_filters |= Q(sub_category__id=uuid_val)
+                q_filters |= Q(topic__id=uuid_val)
+            except ValueError:
+                # Si no es UUID, lo tratamos como slug
+                q_filters |= Q(category__slug=identifier)
+                q_filters |= Q(sub_category__slug=identifier)
+                q_filters |= Q(topic__slug=identifier)
+        qs = qs.filter(q_filters)
+
+    # Todo el subárbol de una o varias categorías (UUID o slug)
+    if subtrees:
+        qs = qs.filter(subtree_q(subtrees))
+
+    if conditions:
+        qs = qs.filter(condition__in=conditions)
+    if packagings:
+        qs = qs.filter(packaging__in=packagings)
+    if discount in ("true", "false"):
+        qs = qs.filter(discount=discount == "true")
+    if in_stock in ("true", "false"):
+        qs = qs.filter(total_stock__gt=0) if in_stock == "true" else qs.filter(total_stock__lte=0)
+
+    # Rango de precio sobre el precio mínimo de la tarjeta
+    try:
+        if min_price:
+            qs = qs.filter(min_price__gte=Decimal(min_price))
+        if max_price:
+            qs = qs.filter(min_price__lt=Decimal(max_price))
+    except InvalidOperation:
+        raise ValidationError("'min_price' y 'max_price' deben ser números.")
+
+    return qs
+
+
+
+class ListProductView(QuerysetPaginationMixin, StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
     SORTING_OPTIONS = {
@@ -41,16 +142,28 @@ class ListProductView(StandardAPIView):
         "wishlist": "analytics_wishlist",
         "purchases": "analytics_purchases",
         "revenue": "analytics_revenue",
-        "rating": "analytics_avg_rating",
+        "rating": "average_rating",
         "created_at": "created_at",
         "price": "price",
+        "min_price": "min_price",
+        "stock": "total_stock",
+        "relevance": "search_rank",
+        "trending": TRENDING_SORT_FIELD,
     }
 
-    @method_decorator(cache_page(60 * 1))
+    @conditional_response(catalog_version)
+    @cache_response(
+        "product_list", settings.CATALOG_CACHE_TIMEOUT, tags=product_list_tags,
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+        params=CATALOG_FILTER_PARAMS + ("sorting", "ordering", "window") + PAGINATION_PARAMS,
+        defaults={"ordering": "desc", "window": TRENDING_WINDOW, **PAGINATION_DEFAULTS},
+        keep_empty=("cursor",),
+    )
     def get(self, request):
         """
         Enlistar los productos, aplicando filtros, búsqueda y ordenamiento.
-        La respuesta se cachea durante 1 minuto.
+        Lee del modelo ProductCard (una fila precalculada por producto publicado).
+        La respuesta se cachea e invalida al cambiar cualquier producto del catálogo.
         """
 
         try:
@@ -58,98 +171,99 @@ class ListProductView(StandardAPIView):
             search      = request.query_params.get("search", "").strip()
             sorting     = request.query_params.get("sorting")
             ordering    = request.query_params.get("ordering", "desc").lower()
-            categories  = request.query_params.getlist("categories", [])
             
-            # --- 2) Queryset base y optimización de columnas ---
-            qs = Product.postobjects.all()
-
-            # --- 3) Limitar columnas (las que serializas explícitamente) ---
-            qs = qs.only(
-                # tus campos actuales…
-                'id', 'author',
-                'title', 'short_description',
-                'slug',
-                'price', 'compare_price', 'discount', 'discount_until',
-                'stock', 'limited_edition', 'condition',
-                # campos FK necesarios para select_related:
-                'category__id',
-                'sub_category__id',
-                'topic__id',
-                'product_analytics__id',
-            ).select_related(
+            # --- 2) Queryset base: tarjetas + categorías en JOIN ---
+            qs = ProductCard.objects.select_related(
                 'category',
                 'sub_category',
                 'topic',
-                'product_analytics',
             )
 
-            # --- 4) Anotaciones necesarias para ratings y conteo de reviews ---
-            qs = qs.annotate(
-                analytics_avg_rating=Coalesce(
-                    F('product_analytics__average_rating'),
-                    Value(0), output_field=FloatField()
-                ),
-                analytics_review_count=Coalesce(
-                    F('product_analytics__review_count'),
-                    Value(0), output_field=IntegerField()
-                ),
-            )
-
-            # --- 5) Filtro de búsqueda libre ---
-            if search:
-                qs = qs.filter(
-                    Q(title__icontains=search) |
-                    Q(short_description__icontains=search) |
-                    Q(description__icontains=search) |
-                    Q(slug__icontains=search) |
-                    Q(keywords__icontains=search)
-                )
+            # --- 3) Filtros de catálogo (búsqueda, categorías, condición, precio...) ---
+            qs = filter_product_cards(qs, request.query_params)
+            if search and not sorting:
+                sorting = "relevance"
+            elif not search and sorting == "relevance":
+                sorting = None
 
-            # --- 6) Filtro por categorías, subcategoría o tema ---
-            if categories:
-                q_filters = Q()
-                for identifier in categories:
-                    try:
-                        # Si es UUID, filtramos por los tres campos
-                        uuid_val = uuid.UUID(identifier)
-                        q_filters |= Q(category__id=uuid_val)
-                        q_filters |= Q(sub_category__id=uuid_val)
-                        q_filters |= Q(topic__id=uuid_val)
-                    except ValueError:
-                        # Si no es UUID, lo tratamos como slug
-                        q_filters |= Q(category__slug=identifier)
-                        q_filters |= Q(sub_category__slug=identifier)
-                        q_filters |= Q(topic__slug=identifier)
-                qs = qs.filter(q_filters)
-            
-            # --- 7) Ordenamiento si se especifica ---
+            # --- 4) Ordenamiento si se especifica (por defecto, Meta.ordering) ---
+            sort_field, descending = "created_at", False
             if sorting in self.SORTING_OPTIONS:
                 sort_field = self.SORTING_OPTIONS[sorting]
-                qs = qs.order_by(sort_field if ordering == "asc" else f"-{sort_field}")
-
-            # --- 8) Serialización y paginación ---
-            serialized_products = ProductListSerializer(qs, many=True).data
-            return self.paginate(request, serialized_products)
+                descending = ordering != "asc"
+            if sort_field in ANALYTICS_SORT_FIELDS:
+                source, output_field = ANALYTICS_SORT_FIELDS[sort_field]
+                qs = qs.annotate(**{sort_field: Coalesce(
+                    F(f"product__product_analytics__{source}"), Value(0), output_field=output_field
+                )})
+            elif sort_field == TRENDING_SORT_FIELD:
+                # Los productos con más puntos en redis para la ventana (?window=hour|day|week)
+                if request.query_params.get("window", TRENDING_WINDOW) not in TRENDING_WINDOWS:
+                    raise ValidationError(f"'window' debe ser uno de: {', '.join(TRENDING_WINDOWS)}.")
+                qs = annotate_trending(qs, request.query_params)
+
+            # --- 5) Paginación en base de datos y serialización de la página ---
+            return self.paginate_qs(
+                request, qs, ProductCardSerializer,
+                sort_field=sort_field, descending=descending,
+                prepare_page=attach_category_relations,
+            )
             
         except NotFound as e:
             # En caso de no encontrar nada, devolvemos 404 con lista vacía
             return self.response([], status=status.HTTP_404_NOT_FOUND)
+
+        except ValidationError:
+            raise
         
         except Exception as e:
             # Cualquier otro error levanta un APIException
             raise APIException(detail=f"An unexpected error occurred: {str(e)}")
+
+
+class ProductFacetsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    @cache_response(
+        "product_facets", settings.CATALOG_CACHE_TIMEOUT,
+        tags=product_list_tags, params=CATALOG_FILTER_PARAMS,
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+    )
+    def get(self, request):
+        """
+        Conteos por facet (categoría, subcategoría, tema, condición, empaque,
+        descuento y rango de precio) para el estado actual de búsqueda y filtros.
+        Se calculan en una sola consulta sobre ProductCard y se cachean por filtro normalizado.
+        """
+        qs = filter_product_cards(ProductCard.objects.all(), request.query_params)
+        return self.response(compute_facets(qs))
         
 
-@method_decorator(cache_page(60 * 1), name='dispatch')
 class DetailProductView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
+    @conditional_response(product_detail_version, params=("slug",))
     def get(self, request):
         """
         Devuelve los datos anotados de un producto. El registro
         de la interacción de vista lo maneja el middleware.
+        El cuerpo cacheado es el mismo para todos; `has_liked` depende del
+        usuario o de la sesión, así que se agrega después de leerlo.
         """
-
+        response = self.get_product(request)
+        if response.status_code == status.HTTP_200_OK:
+            product = dict(response.data["results"])
+            product["has_liked"] = product_has_liked(request, product["id"])
+            response.data = {**response.data, "results": product}
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    @cache_response(
+        "product_detail", settings.CATALOG_CACHE_TIMEOUT,
+        tags=product_detail_tags, params=("slug",),
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+    )
+    def get_product(self, request):
         slug = request.query_params.get("slug")
         if not slug:
             raise NotFound(detail="A valid slug must be provided")
@@ -195,7 +309,9 @@ class DetailProductView(StandardAPIView):
         product = get_object_or_404(qs, slug=slug)
 
         # 3) Serializamos
-        serialized_product = ProductSerializer(product, context={'request': request}).data
+        serializer = ProductSerializer(product, context={'request': request})
+        serializer.fields.pop("has_liked")
+        serialized_product = serializer.data
 
         # except Product.DoesNotExist:
         #     raise NotFound(detail="The requested product does not exist")
@@ -210,19 +326,23 @@ class ProductStockView(StandardAPIView):
 
     def get(self, request):
         """
-        Devuelve únicamente el stock actual del producto indicado por slug.
-        No se cachea para tener siempre datos frescos.
+        Devuelve únicamente el stock disponible del producto indicado por slug,
+        leído de los contadores de inventario en redis (descuenta las reservas
+        de checkouts en curso). Sin ETag: cambia con cada reserva.
         """
         slug = request.query_params.get("slug")
         if not slug:
             raise NotFound(detail="Debe proporcionar un slug válido")
 
-        product = get_object_or_404(Product, slug=slug)
-        return self.response(product.total_stock)
+        product_id = Product.objects.filter(slug=slug).values_list("id", flat=True).first()
+        if product_id is None:
+            raise NotFound(detail="No se encontró el producto")
+        return self.response(product_available_stock(product_id))
 
 class ProductPriceView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
+    @conditional_response(product_state_version)
     def get(self, request):
         slug = request.query_params.get("slug")
         if not slug:
@@ -230,47 +350,47 @@ class ProductPriceView(StandardAPIView):
 
         product = get_object_or_404(Product, slug=slug)
 
-        # 1) Recogemos atributos válidos...
+        # 1) IDs de las variantes pedidas (los inválidos se ignoran)
+        variant_ids = {}
+        for param, _ in VARIANT_PARAMS:
+            try:
+                variant_id = parse_variant_id(request.query_params.get(param))
+            except ValidationError:
+                continue
+            if variant_id:
+                variant_ids[param] = variant_id
+
+        # 2) Si la combinación tiene SKU, su precio ya está calculado (una consulta indexada)
+        sku = ProductVariant.objects.lookup(product.id, **sku_options(variant_ids))
+        if sku is not None:
+            return self.response(quote_sku(product, sku))
+
+        # 3) Si no, precio base + atributos, precio antiguo y bandera de descuento
         selected = {}
-        for param, rel in (
-            ("color_id", "colors"),
-            ("size_id", "sizes"),
-            ("material_id", "materials"),
-            ("weight_id", "weights"),
-            ("flavor_id", "flavors"),
-        ):
-            raw = request.query_params.get(param)
-            if raw and raw.lower() != "null":
+        for param, rel in VARIANT_PARAMS:
+            if param in variant_ids:
                 try:
-                    uuid_val = uuid.UUID(raw)
-                    selected[param] = getattr(product, rel).get(pk=uuid_val)
-                except (ValueError, getattr(product, rel).model.DoesNotExist):
+                    selected[param] = getattr(product, rel).get(pk=variant_ids[param])
+                except getattr(product, rel).model.DoesNotExist:
                     continue
+        return self.response({**quote_product(product, selected), "sku": None})
 
-        # 2) Precio base + atributos
-        price_with_attrs = product.get_price_with_selected(selected)
 
-        # 3) Precio antiguo + atributos
-        compare_base = product.compare_price or 0
-        attrs_extra = sum((attr.price or 0) for attr in selected.values())
-        old_price_with_attrs = compare_base + attrs_extra
+class ProductQuoteView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
 
-        # 4) ¿Está todavía activo el descuento?
-        now = timezone.now()
-        is_on_discount = (
-            product.compare_price is not None
-            and product.discount_until
-            and now < product.discount_until
-        )
+    def post(self, request):
+        """
+        Cotiza muchas líneas en una sola petición.
 
-        # 5) Construimos la respuesta siempre con compare_price + bandera
-        data = {
-            "price": price_with_attrs,
-            "compare_price": old_price_with_attrs,
-            "discount_active": bool(is_on_discount)
-        }
-        return self.response(data)
+        Body JSON:
+          { "lines": [ { "product_id": <uuid>, "color_id": <uuid>, "size_id": <uuid>, ..., "count": <int> }, ... ] }
 
+        Devuelve por línea (en el mismo orden) precio unitario, precio anterior,
+        bandera de descuento y total; las variantes se resuelven con un in_bulk por tabla.
+        """
+        lines = parse_quote_lines(request.data.get("lines"))
+        return self.response(quote_lines(lines))
     
 
 class UpdateProductAnalyticsView(StandardAPIView):
@@ -313,55 +433,121 @@ class GenerateFakeProductsView(StandardAPIView):
         Genera productos falsos en bulk.
         """
         count = int(request.data.get("count", 10))
-        faker = Faker()
 
         # Obtener algunas imágenes válidas para usar como thumbnails/imágenes
-        media_images = list(Media.objects.filter(media_type="image"))
+        media_ids = list(Media.objects.filter(media_type="image").values_list("id", flat=True))
 
-        if not media_images:
+        if not media_ids:
             return self.response({"error": "No hay imágenes disponibles para asignar a productos."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        created = []
-
-        for _ in range(count):
-            title = faker.sentence(nb_words=4)
-            slug = slugify(title)
-
-            product = Product.objects.create(
-                author="ac68ca5f-07fe-4906-be85-cb5e1da6b8fb",
-                title=title,
-                short_description=faker.sentence(),
-                description=faker.text(max_nb_chars=300),
-                keywords=", ".join(faker.words(5)),
-                slug=slug,
-                thumbnail=random.choice(media_images),
-                price=round(random.uniform(2, 100), 2),
-                compare_price=round(random.uniform(100, 150), 2),
-                discount=random.choice([True, False]),
-                discount_until=timezone.now() + timezone.timedelta(days=random.randint(1, 30)),
-                stock=random.randint(0, 100),
-                hidden=False,
-                banned=False,
-                can_delete=True,
-                limited_edition=random.choice([True, False]),
-                condition=random.choice(["new", "used", "broken"]),
-                packaging=random.choice(["normal", "gift"]),
-                status=random.choice(["draft", "published"]),
-            )
-
-            # Asociar 1-3 imágenes adicionales
-            images_to_add = random.sample(media_images, k=min(len(media_images), random.randint(1, 3)))
-            product.images.set(images_to_add)
-
-            created.append(product.slug)
+        rows = list(fake_product_rows(count, media_ids))
+        ProductImporter().run(rows)
+        created = [row["slug"] for _, row in rows]
 
         return self.response(
             {"message": f"Se generaron {count} productos de prueba.", "slugs": created},
             status=status.HTTP_201_CREATED
         )
+
+
+class ImportProductsView(StandardAPIView):
+    # Crea y sobrescribe productos en bloque: sólo para staff
+    permission_classes = [HasValidAPIKey, permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Importa productos desde un CSV o JSON Lines (campo `file`) con upsert por slug.
+        Responde en streaming (NDJSON): una línea con el progreso de cada lote y
+        una última con el resumen (`done: true`).
+        Parámetros opcionales: format (csv | jsonl), chunk_size y dry_run.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError("Debes enviar el archivo en el campo 'file'.")
+        fmt = request.data.get("format") or guess_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            raise ValidationError(f"Formato no soportado: usa uno de {', '.join(IMPORT_FORMATS)}.")
+        try:
+            chunk_size = min(max(int(request.data.get("chunk_size", DEFAULT_CHUNK_SIZE)), 1), 5000)
+        except ValueError:
+            raise ValidationError("'chunk_size' debe ser un entero.")
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true")
+
+        importer = ProductImporter(chunk_size=chunk_size, dry_run=dry_run)
+
+        def stream():
+            for report in importer.iter_chunks(read_rows(upload, fmt)):
+                yield json.dumps(report.as_dict()) + "\n"
+            yield json.dumps({**importer.report.as_dict(), "done": True}) + "\n"
+
+        return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
     
 
+class ExportProductsView(StandardAPIView):
+    # Incluye analíticas e ingresos: sólo para staff
+    permission_classes = [HasValidAPIKey, permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Volcado en streaming de los productos publicados con variantes, SKUs,
+        categorías y analíticas, leído por lotes con un cursor de servidor.
+        Parámetros opcionales: output (ndjson | csv), updated_since (ISO 8601)
+        y chunk_size. Se comprime con gzip si el cliente lo acepta.
+        """
+        fmt = request.query_params.get("output", "ndjson")
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError(f"'output' debe ser uno de: {', '.join(EXPORT_FORMATS)}.")
+        try:
+            chunk_size = min(max(int(request.query_params.get("chunk_size", EXPORT_CHUNK_SIZE)), 100), 5000)
+        except ValueError:
+            raise ValidationError("'chunk_size' debe ser un entero.")
+        updated_since = request.query_params.get("updated_since")
+        if updated_since:
+            updated_since = parse_datetime(updated_since)
+            if updated_since is None:
+                raise ValidationError("'updated_since' debe ser una fecha ISO 8601.")
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+
+        content = iter_export(export_queryset(updated_since), fmt, chunk_size)
+        gzip = accepts_gzip(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        response = StreamingHttpResponse(
+            compress_sequence(content) if gzip else content,
+            content_type=EXPORT_CONTENT_TYPES[fmt],
+        )
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response["Content-Disposition"] = f'attachment; filename="products-{timezone.now():%Y%m%d%H%M%S}.{fmt}"'
+        return response
+
+
+class SimilarProductsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    def get(self, request):
+        """
+        Productos similares a `product_id`: los que más se ven, añaden al carrito
+        o compran en las mismas sesiones (precalculados en redis por la tarea
+        rebuild_similar_products) y, si no alcanzan, de la misma categoría.
+        """
+        try:
+            product_id = uuid.UUID(request.query_params.get("product_id", ""))
+        except ValueError:
+            raise ValidationError("Debes pasar un 'product_id' UUID válido.")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), MAX_SIMILAR_PRODUCTS)
+        except ValueError:
+            raise ValidationError("'limit' debe ser un entero.")
+
+        ids = [uuid.UUID(pid) for pid in recommend_product_ids([product_id], limit)]
+        cards = ProductCard.objects.select_related("category", "sub_category", "topic").in_bulk(ids)
+        cards = attach_category_relations([cards[pid] for pid in ids if pid in cards])
+        return self.response(ProductCardSerializer(cards, many=True).data, status=status.HTTP_200_OK)
+
+
 class ToggleLikeView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
@@ -446,14 +632,21 @@ class RegisterShareView(StandardAPIView):
         return self.response("Share registrado", status=status.HTTP_201_CREATED)
     
 
-class CategoryListView(StandardAPIView):
+class CategoryListView(QuerysetPaginationMixin, StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
-    @method_decorator(cache_page(60 * 1))
+    @cache_response(
+        "category_list", settings.CATALOG_CACHE_TIMEOUT, tags=category_tags,
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+        params=("parent_slug", "ordering", "sorting", "search", "all") + PAGINATION_PARAMS,
+        defaults={"all": "false", **PAGINATION_DEFAULTS},
+        keep_empty=("cursor",),
+    )
     def get(self, request):
         """
         Lista categorías (filtrado por nivel, búsqueda, ordenamiento y flag 'all').
-        La respuesta se cachea 5 minutos y las impresiones se cuentan en middleware.
+        La respuesta se cachea hasta que cambie alguna categoría y las impresiones
+        se cuentan en middleware.
         """
 
         try:
@@ -464,9 +657,8 @@ class CategoryListView(StandardAPIView):
             search      = request.query_params.get("search", "").strip()
             all_flag    = request.query_params.get("all", "false").lower() == "true"
 
-            # 2) Queryset base: analytics en JOIN + prefetch de hijos
-            qs = Category.objects.select_related("category_analytics") \
-                                 .prefetch_related("children")
+            # 2) Queryset base (hijos, padre, hermanos y analytics se cargan por página)
+            qs = Category.objects.all()
 
             # 3) Filtrar por nivel (raíz o un parent concreto)
             if not all_flag:
@@ -485,11 +677,12 @@ class CategoryListView(StandardAPIView):
                 )
             
             # 5) Ordenamiento por fecha o vistas
+            sort_field, descending = "name", False
             if sorting:
                 if sorting == "newest":
-                    qs = qs.order_by("-created_at")
+                    sort_field, descending = "created_at", True
                 elif sorting == "recently_updated":
-                    qs = qs.order_by("-updated_at")
+                    sort_field, descending = "updated_at", True
                 elif sorting == "most_viewed":
                     # annotate sólo para ordenar
                     qs = qs.annotate(
@@ -498,23 +691,55 @@ class CategoryListView(StandardAPIView):
                             Value(0),
                             output_field=IntegerField()
                         )
-                    ).order_by("-popularity")
+                    )
+                    sort_field, descending = "popularity", True
 
             # 6) Orden alfabético
             if ordering:
-                qs = qs.order_by("name" if ordering == "az" else "-name")
+                sort_field, descending = "name", ordering != "az"
 
             # 7) Validación de existencia
             if not qs.exists():
                 raise NotFound("No categories found.")
 
-            # 8) Serialización y paginación
-            data = CategorySerializer(qs, many=True).data
-            return self.paginate(request, data)
+            # 8) Paginación en base de datos; el árbol de la página se arma en una consulta
+            return self.paginate_qs(
+                request, qs, CategorySerializer,
+                sort_field=sort_field, descending=descending,
+                context={"request": request},
+                prepare_page=load_category_relations,
+            )
         except NotFound as e:
             return self.response([], status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             raise APIException(detail=f"An unexpected error occurred: {str(e)}")
+
+
+class CategoryTreeView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    @cache_response(
+        "category_tree", settings.CATALOG_CACHE_TIMEOUT,
+        tags=category_tags, params=("root",),
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+    )
+    def get(self, request):
+        """
+        Devuelve el árbol completo de categorías (o el subárbol de `root`,
+        UUID o slug) cargado en una sola consulta.
+        """
+        root_identifier = request.query_params.get("root")
+        root = None
+        if root_identifier:
+            try:
+                lookup = {"id": uuid.UUID(root_identifier)}
+            except ValueError:
+                lookup = {"slug": root_identifier}
+            root = get_object_or_404(Category.objects.only("id", "path"), **lookup)
+
+        roots = load_category_tree(root, Category.objects.select_related("thumbnail"))
+        serializer = CategoryTreeSerializer(roots, many=True, context={"request": request})
+        return self.response(serializer.data)
         
 
 class UpdateCategoryAnalyticsView(StandardAPIView):
@@ -551,61 +776,60 @@ class UpdateCategoryAnalyticsView(StandardAPIView):
 
 class AutoCategorizeProducts(StandardAPIView):
     """
-    Recorre todos los productos sin categoría y trata de asignar
-    category, sub_category y topic buscando coincidencias
-    en title/keywords/description.
+    Asigna category, sub_category y topic a los productos buscando el nombre,
+    título y slug de cada categoría en su título, keywords y descripción
+    (ver categorizer). Se ejecuta como tarea de Celery. Sólo para staff.
     """
-    def post(self, request):
-        # 1) Obtener la primera categoría raíz (sin parent)
-        root = Category.objects.filter(parent__isnull=True).order_by('name').first()
-        if not root:
-            return self.response(
-                {"detail": "No se encontró ninguna categoría raíz."},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    permission_classes = [HasValidAPIKey, permissions.IsAdminUser]
 
-        # 2) Obtener la primera sub-categoría de esa raíz
-        sub = Category.objects.filter(parent=root).order_by('name').first()
-        if not sub:
-            return self.response(
-                {"detail": f"No se encontró sub-category para {root.name}."},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    # Segundos que se recuerda cada tarea encolada aquí para consultar su estado
+    TASK_RECORD_TIMEOUT = 60 * 60 * 24
 
-        # 3) Obtener el primer topic de esa sub-categoría
-        topic = Category.objects.filter(parent=sub).order_by('name').first()
-        if not topic:
-            return self.response(
-                {"detail": f"No se encontró topic para {sub.name}."},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    @staticmethod
+    def task_record_key(task_id):
+        return f"auto_categorize:task:{task_id}"
 
-        # 4) Asignar a productos huérfanos
-        to_assign = Product.objects.filter(category__isnull=True)
-        assigned = []
-
-        with transaction.atomic():
-            for prod in to_assign:
-                prod.category     = root
-                prod.sub_category = sub
-                prod.topic        = topic
-                prod.save(update_fields=['category', 'sub_category', 'topic'])
-                assigned.append(str(prod.id))
-
-        return self.response({
-            "assigned_count": len(assigned),
-            "category": root.slug,
-            "sub_category": sub.slug,
-            "topic": topic.slug,
-            "products": assigned
-        }, status=status.HTTP_200_OK)
+    def post(self, request):
+        """
+        Encola la tarea. Parámetros: dry_run (sólo reporta) y overwrite
+        (recategoriza también los productos que ya tienen categoría).
+        """
+        dry_run = str(request.data.get("dry_run", "")).lower() in ("1", "true")
+        overwrite = str(request.data.get("overwrite", "")).lower() in ("1", "true")
+        task = auto_categorize_products.delay(dry_run=dry_run, overwrite=overwrite)
+        cache.set(self.task_record_key(task.id), True, self.TASK_RECORD_TIMEOUT)
+        return self.response(
+            {"task_id": task.id, "dry_run": dry_run, "overwrite": overwrite},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    def get(self, request):
+        """
+        Estado de la tarea (?task_id=) y, al terminar, su reporte. Sólo de
+        tareas encoladas por este endpoint, no de cualquier tarea de Celery.
+        """
+        task_id = request.query_params.get("task_id")
+        if not task_id:
+            raise ValidationError("Debes pasar 'task_id'.")
+        if not cache.get(self.task_record_key(task_id)):
+            raise NotFound(detail="No se encontró la tarea")
+        result = AsyncResult(task_id)
+        data = {"task_id": task_id, "status": result.status}
+        if result.successful():
+            data["report"] = result.result
+        elif result.failed():
+            data["error"] = str(result.result)
+        return self.response(data, status=status.HTTP_200_OK)
     
 
-@method_decorator(cache_page(60), name='dispatch')
 class DetailCategoryView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
-    
+    @cache_response(
+        "category_detail", settings.CATALOG_CACHE_TIMEOUT,
+        tags=category_tags, params=("slug",),
+        stale_timeout=settings.CATALOG_CACHE_STALE_TIMEOUT,
+    )
     def get(self, request):
         """
         Devuelve datos anotados de una categoría; la interacción de 'view'
@@ -616,35 +840,11 @@ class DetailCategoryView(StandardAPIView):
         if not slug:
             raise NotFound(detail="A valid slug must be provided")
 
-        # 1) Construir queryset con sólo las anotaciones que usamos
-        qs = Category.objects.annotate(
-            analytics_views=Coalesce(
-                F("category_analytics__views"), Value(0), output_field=IntegerField()
-            ),
-            analytics_likes=Coalesce(
-                F("category_analytics__likes"), Value(0), output_field=IntegerField()
-            ),
-            analytics_shares=Coalesce(
-                F("category_analytics__shares"), Value(0), output_field=IntegerField()
-            ),
-            analytics_wishlist=Coalesce(
-                F("category_analytics__wishlist_count"), Value(0), output_field=IntegerField()
-            ),
-            analytics_add_to_cart=Coalesce(
-                F("category_analytics__add_to_cart_count"), Value(0), output_field=IntegerField()
-            ),
-            analytics_purchases=Coalesce(
-                F("category_analytics__purchases"), Value(0), output_field=IntegerField()
-            ),
-            analytics_revenue=Coalesce(
-                F("category_analytics__revenue_generated"),
-                Value(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2),
-            ),
-        )
+        # 1) Recuperar o404
+        category = get_object_or_404(Category.objects.only("id", "parent_id", "path"), slug=slug)
 
-        # 2) Recuperar o404
-        category = get_object_or_404(qs, slug=slug)
+        # 2) Cargar la categoría con su subárbol, padre, hermanos y analytics en una consulta
+        category, = load_category_relations([category])
 
         # 3) Serializar y devolver
         data = CategorySerializer(category, context={"request": request}).data
@@ -669,20 +869,13 @@ class ListProductsByIdView(StandardAPIView):
         except ValueError:
             raise ValidationError("Todos los valores de 'product_ids' deben ser UUIDs válidos.")
 
-        # 3) Construyo el queryset
-        qs = (
-            Product.postobjects
-            .filter(id__in=uuids)
-            .only(
-                "id", "author",
-                "title", "short_description", "slug",
-                "price", "compare_price", "discount", "discount_until",
-                "stock", "limited_edition", "condition"
-            )
+        # 3) Construyo el queryset (número de consultas fijo, sin importar cuántos IDs)
+        products = attach_category_relations(
+            list(Product.postobjects.filter(id__in=uuids).for_cards())
         )
 
         # 4) Serializo y retorno
-        serialized = ProductListSerializer(qs, many=True).data
+        serialized = ProductListSerializer(products, many=True).data
         return self.response(serialized, status=200)
 
 
@@ -690,75 +883,33 @@ class ListProductsFromCartItemByIdView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
 
     def get(self, request):
-        # 1) IDs de productos
-        raw_ids = request.query_params.getlist('product_ids')
-        if not raw_ids:
-            raise ValidationError(
-                "Debes pasar al menos un parámetro 'product_ids', ej: ?product_ids=uuid1&product_ids=uuid2"
-            )
-        try:
-            product_uuids = [uuid.UUID(pid) for pid in raw_ids]
-        except ValueError:
-            raise ValidationError("Todos los valores de 'product_ids' deben ser UUIDs válidos.")
-
-        # 2) IDs de atributos paralelos (misma posición que product_ids)
-        color_ids    = request.query_params.getlist('color_id')
-        size_ids     = request.query_params.getlist('size_id')
-        material_ids = request.query_params.getlist('material_id')
-        weight_ids   = request.query_params.getlist('weight_id')
-        flavor_ids   = request.query_params.getlist('flavor_id')
-        counts       = request.query_params.getlist('count')
-
-        # 3) Queryset de productos
-        products = Product.postobjects.filter(id__in=product_uuids)
-        serialized = ProductListSerializer(products, many=True).data
-
-        # 4) Empaquetar respuesta por item
+        """
+        Productos de los ítems de un carrito. Los query params son listas paralelas:
+        la posición i de product_ids, color_id, size_id, material_id, weight_id,
+        flavor_id y count describe el ítem i. Número de consultas fijo sin importar
+        cuántos ítems haya.
+        """
+        # 1) Ítems posicionales
+        lines = lines_from_query_params(request.query_params)
+
+        # 2) Productos (con variantes prefetcheadas) y variantes elegidas, en memoria
+        resolved = resolve_cart_lines(lines)
+        products = attach_category_relations(list({product.id: product for _, product, _ in resolved}.values()))
+        serialized = dict(zip(
+            (product.id for product in products),
+            ProductListSerializer(products, many=True).data,
+        ))
+
+        # 3) Empaquetar respuesta por ítem, en el orden pedido
         response_items = []
-        for idx, prod_data in enumerate(serialized):
-            prod_id = uuid.UUID(prod_data['id'])
-            product = products.get(id=prod_id)
-
-            # construir selected dict
-            selected = {}
-            # helper zip param lists
-            attr_map = [
-                (color_ids,    'colors',    'color_id'),
-                (size_ids,     'sizes',     'size_id'),
-                (material_ids, 'materials', 'material_id'),
-                (weight_ids,   'weights',   'weight_id'),
-                (flavor_ids,   'flavors',   'flavor_id'),
-            ]
-            for id_list, rel, key in attr_map:
-                if idx < len(id_list):
-                    raw = id_list[idx]
-                    if raw and raw.lower() != 'null':
-                        try:
-                            uuid_val = uuid.UUID(raw)
-                            selected[key] = getattr(product, rel).get(pk=uuid_val)
-                        except (ValueError, getattr(product, rel).model.DoesNotExist):
-                            pass
-
-            # 5) precio unitario con atributos
+        for line, product, selected in resolved:
             unit_price = product.get_price_with_selected(selected)
-
-            # 6) cantidad
-            count = 1
-            if idx < len(counts):
-                try:
-                    count = int(counts[idx])
-                except ValueError:
-                    count = 1
-
-            # 7) precio total
-            total_price = unit_price * count
-
             response_items.append({
-                'product': prod_data,
+                'product': serialized[product.id],
                 'selected': {k: str(v.id) for k, v in selected.items()},
                 'unit_price': unit_price,
-                'count': count,
-                'total_price': total_price,
+                'count': line['count'],
+                'total_price': unit_price * line['count'],
             })
 
         return self.response(response_items, status=200)
\ No newline at end of file
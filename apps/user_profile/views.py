@@ -7,14 +7,13 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.utils import timezone
-from botocore.signers import CloudFrontSigner
 
 from core.permissions import HasValidAPIKey
 from .models import UserProfile
 from apps.assets.models import Media
 from apps.authentication.serializers import UserPublicSerializer
 from .serializers import UserProfileSerializer
-from utils.s3_utils import rsa_signer
+from utils.s3_utils import get_cloudfront_signed_url
 from utils.string_utils import sanitize_string, sanitize_html, sanitize_url
 
 User = get_user_model()
@@ -71,13 +70,7 @@ class GetMyProfilePictureView(StandardAPIView):
         
         # Generate a signed URL for secure access if necessary
         if hasattr(profile.profile_picture, "key"):
-            key_id = settings.AWS_CLOUDFRONT_KEY_ID
-            signer = CloudFrontSigner(key_id, rsa_signer)
-            expire_date = timezone.now() + timedelta(seconds=60)
-            obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{profile.profile_picture.key}"
-            signed_url = signer.generate_presigned_url(
-                obj_url, date_less_than=expire_date
-            )
+            signed_url = get_cloudfront_signed_url(profile.profile_picture.key, expires_in=60)
             return self.response(signed_url)
         return self.error('Error fetching image from aws')
 
@@ -98,13 +91,7 @@ class GetMyBannerPictureView(StandardAPIView):
         
         # Generate a signed URL for secure access if necessary
         if hasattr(profile.banner_picture, "key"):
-            key_id = settings.AWS_CLOUDFRONT_KEY_ID
-            signer = CloudFrontSigner(key_id, rsa_signer)
-            expire_date = timezone.now() + timedelta(seconds=60)
-            obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{profile.banner_picture.key}"
-            signed_url = signer.generate_presigned_url(
-                obj_url, date_less_than=expire_date
-            )
+            signed_url = get_cloudfront_signed_url(profile.banner_picture.key, expires_in=60)
             return self.response(signed_url)
         return self.error('Error fetching image from aws')
 
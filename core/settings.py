@@ -37,6 +37,7 @@ DJANGO_APPS  = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 PROJECT_APPS = [
@@ -95,6 +96,7 @@ MIDDLEWARE = [
     'apps.products.middleware.IncrementViewCountMiddleware',
     "apps.products.middleware.CategoryListImpressionMiddleware",
     "apps.products.middleware.CategoryDetailImpressionMiddleware",
+    "apps.assets.middleware.CloudFrontSignedCookieMiddleware",
     # AxesMiddleware should be the last middleware in the MIDDLEWARE list.
     # It only formats user lockout messages and renders Axes lockout responses
     # on failed user authentication attempts from login views.
@@ -268,6 +270,21 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Configuración de búsqueda full-text (diccionario de PostgreSQL para el tsvector)
+PRODUCT_SEARCH_CONFIG = env.str("PRODUCT_SEARCH_CONFIG", default="simple")
+
+# TTL (segundos) de las respuestas cacheadas del catálogo; se invalidan por tags
+# (junto con el margen obsoleto, por debajo de AWS_CLOUDFRONT_URL_GRACE)
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=60 * 60)
+# Segundos extra en que una respuesta vencida se sirve mientras se recalcula
+CATALOG_CACHE_STALE_TIMEOUT = env.int("CATALOG_CACHE_STALE_TIMEOUT", default=60 * 5)
+# Segundos en que se agrupan los cambios de analíticas (vistas, likes, compras...)
+# antes de invalidar el detalle de esos productos y los listados ordenados por ellas
+ANALYTICS_CACHE_DEBOUNCE = env.int("ANALYTICS_CACHE_DEBOUNCE", default=60)
+
+# Segundos que una reserva de inventario del checkout retiene el stock antes de liberarse
+INVENTORY_RESERVATION_TTL = env.int("INVENTORY_RESERVATION_TTL", default=60 * 15)
+
 REDIS_HOST = env("REDIS_HOST")
 CACHES = {
     "default": {
@@ -302,7 +319,28 @@ CELERY_IMPORTS = (
 )
 
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-inventory-reservations": {
+        "task": "apps.products.tasks.release_expired_inventory_reservations",
+        "schedule": 60.0,
+    },
+    "reconcile-inventory": {
+        "task": "apps.products.tasks.reconcile_inventory",
+        "schedule": 60.0 * 10,
+    },
+    "rebuild-product-cards": {
+        "task": "apps.products.tasks.rebuild_product_cards",
+        "schedule": 60.0 * 60 * 6,
+    },
+    "rebuild-similar-products": {
+        "task": "apps.products.tasks.rebuild_similar_products",
+        "schedule": 60.0 * 60 * 6,
+    },
+    "decay-trending-products": {
+        "task": "apps.products.tasks.decay_trending_products",
+        "schedule": 60.0 * 5,
+    },
+}
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
@@ -323,6 +361,16 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 AWS_CLOUDFRONT_DOMAIN=env("AWS_CLOUDFRONT_DOMAIN")
 AWS_CLOUDFRONT_KEY_ID =env.str("AWS_CLOUDFRONT_KEY_ID").strip()
 AWS_CLOUDFRONT_KEY =env.str("AWS_CLOUDFRONT_KEY", multiline=True).encode("ascii").strip()
+# Las URLs firmadas caducan al final de la ventana (más el margen) en la que se piden,
+# así que son idénticas durante toda la ventana. Valen al menos expires_in + GRACE
+# segundos: las respuestas cacheadas que las incluyen no deben vivir más que eso.
+AWS_CLOUDFRONT_URL_WINDOW = env.int("AWS_CLOUDFRONT_URL_WINDOW", default=60 * 60)
+AWS_CLOUDFRONT_URL_GRACE = env.int("AWS_CLOUDFRONT_URL_GRACE", default=60 * 60 * 2)
+# "signed_url": cada URL de media se firma. "signed_cookie": las URLs van sin firmar y
+# CloudFrontSignedCookieMiddleware entrega una política firmada por cookie sobre MEDIA_LOCATION
+# (el dominio de la cookie debe cubrir el de CloudFront, p. ej. ".midominio.com").
+AWS_CLOUDFRONT_DELIVERY = env.str("AWS_CLOUDFRONT_DELIVERY", default="signed_url")
+AWS_CLOUDFRONT_COOKIE_DOMAIN = env.str("AWS_CLOUDFRONT_COOKIE_DOMAIN", default=None)
 
 # Configuraciones de AWS
 AWS_ACCESS_KEY_ID=env("AWS_ACCESS_KEY_ID")
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+TAG_KEY_PREFIX = "cache_tag"
+METRICS_KEY_PREFIX = "cache_metrics"
+
+
+def normalize_query_params(query_params, only=None, defaults=None, casefold=("search",),
+                           keep_empty=()):
+    """
+    Forma canónica de los query params para construir claves de caché:
+    - claves ordenadas y valores ordenados sin duplicados,
+    - se descartan valores vacíos y los que coinciden con su valor por defecto,
+    - los parámetros de `casefold` se normalizan (minúsculas, espacios colapsados),
+    - los de `keep_empty` se conservan aunque vengan vacíos (p. ej. `?cursor=`).
+    """
+    defaults = defaults or {}
+    normalized = {}
+    for key in sorted(query_params.keys()):
+        if only is not None and key not in only:
+            continue
+        values = set()
+        for value in query_params.getlist(key):
+            value = value.strip()
+            if key in casefold:
+                value = " ".join(value.casefold().split())
+            if value or key in keep_empty:
+                values.add(value)
+        if not values:
+            continue
+        values = sorted(values)
+        default = defaults.get(key)
+        if default is not None and values == [str(default)]:
+            continue
+        normalized[key] = values
+    return normalized
+
+
+def make_cache_key(prefix, query_params, **kwargs):
+    """
+    Clave de caché estable para un conjunto de query params.
+    """
+    normalized = normalize_query_params(query_params, **kwargs)
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def tag_cache_key(tag):
+    return f"{TAG_KEY_PREFIX}:{tag}"
+
+
+def invalidate_tags(*tags):
+    """
+    Invalida todas las entradas cacheadas con alguno de los `tags`.
+    La versión de un tag es el instante de su última invalidación; una entrada
+    es válida mientras ninguno de sus tags sea posterior a su creación.
+    """
+    if tags:
+        now = time.time()
+        cache.set_many({tag_cache_key(tag): now for tag in tags}, timeout=None)
+
+
+def get_tag_versions(tags):
+    """
+    Devuelve {tag: versión} de los tags que tienen versión registrada.
+    """
+    versions = cache.get_many([tag_cache_key(tag) for tag in tags])
+    return {tag: versions[tag_cache_key(tag)] for tag in tags if tag_cache_key(tag) in versions}
+
+
+def tags_are_fresh(tags, created_at):
+    if not tags:
+        return True
+    versions = cache.get_many([tag_cache_key(tag) for tag in tags])
+    # Un tag sin versión (p. ej. desalojado de redis) no permite validar la entrada
+    if len(versions) < len(tags):
+        return False
+    return all(version <= created_at for version in versions.values())
+
+
+def register_tags(tags, created_at):
+    """
+    Crea (sin pisar) la versión de los tags que aún no existen.
+    """
+    keys = [tag_cache_key(tag) for tag in tags]
+    existing = cache.get_many(keys)
+    for key in keys:
+        if key not in existing:
+            cache.add(key, created_at, timeout=None)
+
+
+def record_cache_metrics(prefix, **increments):
+    """
+    Acumula métricas de caché por endpoint en un hash de redis
+    (hits, misses, stale, lock_contention, recomputes, recompute_seconds).
+    """
+    try:
+        pipe = redis_client.pipeline()
+        for field, amount in increments.items():
+            if isinstance(amount, float):
+                pipe.hincrbyfloat(f"{METRICS_KEY_PREFIX}:{prefix}", field, amount)
+            else:
+                pipe.hincrby(f"{METRICS_KEY_PREFIX}:{prefix}", field, amount)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("No se pudo registrar la métrica de caché de %s: %s", prefix, e)
+
+
+def get_cache_metrics():
+    """
+    Devuelve las métricas de todos los endpoints cacheados, con hit rate
+    (las respuestas obsoletas servidas cuentan como acierto) y tiempo medio de recálculo.
+    """
+    metrics = {}
+    for key in redis_client.scan_iter(f"{METRICS_KEY_PREFIX}:*"):
+        values = {field.decode(): value for field, value in redis_client.hgetall(key).items()}
+        hits = int(values.get("hits", 0))
+        stale = int(values.get("stale", 0))
+        misses = int(values.get("misses", 0))
+        recomputes = int(values.get("recomputes", 0))
+        recompute_seconds = float(values.get("recompute_seconds", 0))
+        total = hits + stale + misses
+        prefix = key.decode().split(":", 1)[1]
+        metrics[prefix] = {
+            "hits": hits,
+            "stale": stale,
+            "misses": misses,
+            "hit_rate": round((hits + stale) / total, 4) if total else 0.0,
+            "lock_contention": int(values.get("lock_contention", 0)),
+            "recomputes": recomputes,
+            "avg_recompute_ms": round(recompute_seconds / recomputes * 1000, 2) if recomputes else 0.0,
+        }
+    return metrics
+
+
+def reset_cache_metrics():
+    for key in redis_client.scan_iter(f"{METRICS_KEY_PREFIX}:*"):
+        redis_client.delete(key)
+
+
+def entry_is_fresh(entry, beta=1.0):
+    """
+    Vigente si no pasó el TTL blando (los tags los revisa cache_response antes).
+    Cerca del vencimiento se da por vencida con probabilidad creciente y
+    proporcional al coste del último recálculo (expiración temprana
+    probabilística), para que una sola petición la renueve antes de que caduque para todas.
+    """
+    early = entry["recompute_seconds"] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry["soft_expires_at"]
+
+
+def entry_tags_are_fresh(entry):
+    return tags_are_fresh(entry["tags"], entry["created_at"])
+
+
+def wait_for_entry(key, lock_key, max_wait):
+    """
+    Espera (como máximo `max_wait` segundos) a que quien tiene el lock guarde
+    la entrada. Una entrada con tags invalidados no cuenta como guardada.
+    """
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry_tags_are_fresh(entry):
+            return entry
+        if cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def stale_response(entry):
+    """
+    Respuesta con una entrada vencida. `served_stale` le indica a
+    conditional_response que no la marque con el ETag de la versión actual.
+    """
+    response = Response(entry["data"], status=entry["status"])
+    response.served_stale = True
+    return response
+
+
+def cache_response(prefix, timeout, tags=(), params=None, defaults=None, keep_empty=(),
+                   stale_timeout=0, lock_timeout=10, lock_wait=2.0, beta=1.0):
+    """
+    Cachea las respuestas 200 de un método de un StandardAPIView con invalidación por tags.
+
+    - La clave sale de los query params normalizados (ver normalize_query_params):
+      `params` limita los parámetros que cuentan y `defaults` descarta los valores
+      por defecto, así variaciones equivalentes de la URL comparten entrada.
+    - `tags` es un iterable fijo o una función (request, data) -> iterable.
+    - `timeout` es el TTL blando. Una entrada vencida por tiempo (o por expiración
+      temprana) se sigue sirviendo hasta `stale_timeout` segundos más mientras una
+      sola petición, con un lock en redis, la recalcula. Una entrada con tags
+      invalidados nunca se sirve: como si no hubiera entrada, las demás esperan
+      hasta `lock_wait` segundos a que se guarde la nueva.
+    - Registra métricas bajo `prefix` (ver get_cache_metrics).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            key = make_cache_key(
+                prefix, request.query_params,
+                only=params, defaults=defaults, keep_empty=keep_empty,
+            )
+            lock_key = f"{key}:lock"
+
+            entry = cache.get(key)
+            if entry is not None and not entry_tags_are_fresh(entry):
+                # Sus datos cambiaron: no vale ni como respuesta obsoleta
+                entry = None
+            if entry is not None and entry_is_fresh(entry, beta):
+                record_cache_metrics(prefix, hits=1)
+                return Response(entry["data"], status=entry["status"])
+
+            locked = cache.add(lock_key, 1, timeout=lock_timeout)
+            if not locked:
+                # Otra petición ya está recalculando esta entrada
+                if entry is not None:
+                    record_cache_metrics(prefix, stale=1, lock_contention=1)
+                    return stale_response(entry)
+                if lock_wait:
+                    entry = wait_for_entry(key, lock_key, lock_wait)
+                if entry is not None:
+                    record_cache_metrics(prefix, hits=1, lock_contention=1)
+                    return Response(entry["data"], status=entry["status"])
+                record_cache_metrics(prefix, lock_contention=1)
+
+            try:
+                created_at = time.time()
+                started = time.monotonic()
+                response = method(view, request, *args, **kwargs)
+                recompute_seconds = time.monotonic() - started
+                record_cache_metrics(
+                    prefix, misses=1, recomputes=1, recompute_seconds=recompute_seconds
+                )
+                if response.status_code == 200:
+                    entry_tags = sorted(set(tags(request, response.data) if callable(tags) else tags))
+                    register_tags(entry_tags, created_at)
+                    cache.set(key, {
+                        "data": response.data,
+                        "status": response.status_code,
+                        "tags": entry_tags,
+                        "created_at": created_at,
+                        "soft_expires_at": created_at + timeout,
+                        "recompute_seconds": recompute_seconds,
+                    }, timeout + stale_timeout)
+                return response
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+        return wrapper
+    return decorator
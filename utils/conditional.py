@@ -0,0 +1,54 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from utils.cache_utils import normalize_query_params
+
+
+def conditional_response(version_func, params=None):
+    """
+    GET condicional (ETag fuerte + Last-Modified) para métodos de un StandardAPIView.
+
+    `version_func(request)` devuelve un sello barato `(identificador, datetime)`
+    o None si no se puede calcular (la vista se ejecuta normalmente, p. ej. para
+    responder 404). El ETag combina el sello con los query params normalizados,
+    así que si el cliente envía If-None-Match vigente se responde 304 sin ejecutar
+    la vista ni el serializer. Una respuesta obsoleta servida por cache_response
+    (`served_stale`) sale sin validadores: no corresponde a la versión actual.
+    """
+    def get_version(request):
+        if not hasattr(request, "_conditional_version"):
+            request._conditional_version = version_func(request)
+        return request._conditional_version
+
+    def etag_func(request, *args, **kwargs):
+        version = get_version(request)
+        if version is None:
+            return None
+        identifier, modified = version
+        query = normalize_query_params(request.query_params, only=params, keep_empty=("cursor",))
+        raw = json.dumps(
+            [request.path, identifier, modified.isoformat(), query], sort_keys=True, default=str
+        )
+        return '"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        version = get_version(request)
+        return version[1] if version else None
+
+    def decorator(func):
+        conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)(func)
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            if getattr(response, "served_stale", False):
+                del response["ETag"]
+                del response["Last-Modified"]
+            return response
+        return wrapper
+
+    return method_decorator(decorator)
@@ -0,0 +1,162 @@
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_api.pagination import CustomPagination
+from rest_framework_api.serializers import APIResponseSerializer
+
+
+# Parámetros de paginación (y sus valores por defecto) que forman parte de las claves de caché
+PAGINATION_PARAMS = ("p", "page_size", "cursor")
+PAGINATION_DEFAULTS = {"p": 1, "page_size": 6}
+
+
+class QuerysetPagination(CustomPagination):
+    """
+    Paginación LIMIT/OFFSET sobre un queryset: el total sale de un COUNT(*)
+    y sólo se materializan las filas de la página pedida.
+    """
+
+    def paginate_data(self, queryset, request):
+        self.page = request.query_params.get(self.page_query_param, 1)
+        self.page_size = self._get_page_size(request)
+        paginated_data = self.paginate_queryset(queryset, request)
+        self.count = self.page.paginator.count
+        return paginated_data
+
+
+class KeysetPagination(CustomPagination):
+    """
+    Paginación por cursor (keyset) sobre (sort_field, id).
+    El coste de cada página es O(page_size) sin importar su profundidad.
+    Los valores NULL del campo de orden siempre van al final.
+    """
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, sort_field, descending=False, page_size=6):
+        super().__init__(page_size=page_size)
+        self.sort_field = sort_field
+        self.descending = descending
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    # --- Codificación del cursor ---
+    def encode_cursor(self, obj, reverse):
+        payload = [getattr(obj, self.sort_field), obj.pk, reverse]
+        raw = json.dumps(payload, cls=DjangoJSONEncoder).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, bool(reverse)
+
+    # --- Construcción de la consulta ---
+    def _ordering(self, reverse):
+        field = F(self.sort_field)
+        descending = self.descending != reverse
+        # Al recorrer hacia atrás el orden se invierte, incluidos los NULLs
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        if descending:
+            return field.desc(**nulls), F("pk").desc()
+        return field.asc(**nulls), F("pk").asc()
+
+    def _seek(self, value, pk, reverse):
+        descending = self.descending != reverse
+        op = "lt" if descending else "gt"
+        isnull = f"{self.sort_field}__isnull"
+        if value is None:
+            after_nulls = Q(**{isnull: True, f"pk__{op}": pk})
+            # Hacia atrás, las filas no nulas están antes que la zona de NULLs
+            return after_nulls | Q(**{isnull: False}) if reverse else after_nulls
+        condition = (
+            Q(**{f"{self.sort_field}__{op}": value})
+            | Q(**{self.sort_field: value, f"pk__{op}": pk})
+        )
+        # Hacia adelante, los NULLs quedan después de cualquier valor
+        return condition if reverse else condition | Q(**{isnull: True})
+
+    def paginate_data(self, queryset, request):
+        self.request = request
+        self.page_size = self._get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        qs = queryset.order_by(*self._ordering(reverse))
+        if cursor:
+            qs = qs.filter(self._seek(cursor[0], cursor[1], reverse))
+
+        rows = list(qs[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if rows:
+            if reverse:
+                self.next_cursor = self.encode_cursor(rows[-1], reverse=False)
+                self.previous_cursor = self.encode_cursor(rows[0], reverse=True) if has_more else None
+            else:
+                self.next_cursor = self.encode_cursor(rows[-1], reverse=False) if has_more else None
+                self.previous_cursor = self.encode_cursor(rows[0], reverse=True) if cursor else None
+        return rows
+
+    def _link(self, token):
+        if token is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+
+class QuerysetPaginationMixin:
+    """
+    Pagina un queryset en la base de datos antes de serializar.
+
+    - Por defecto: LIMIT/OFFSET con los parámetros `p` y `page_size`.
+    - Con `?cursor=` (vacío para la primera página): keyset sobre (sort_field, id).
+    - `prepare_page` recibe la lista de objetos de la página y devuelve la que se
+      serializa (útil para cargar relaciones sólo de esa página).
+    """
+
+    def paginate_qs(self, request, queryset, serializer_class,
+                    sort_field="created_at", descending=False, context=None,
+                    prepare_page=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            paginator = KeysetPagination(sort_field, descending=descending)
+        else:
+            paginator = QuerysetPagination()
+            field = f"-{sort_field}" if descending else sort_field
+            queryset = queryset.order_by(field, "-pk" if descending else "pk")
+
+        page = paginator.paginate_data(queryset, request)
+        if prepare_page is not None:
+            page = prepare_page(list(page))
+        data = serializer_class(page, many=True, context=context or {}).data
+        serializer = APIResponseSerializer(
+            {
+                "success": True,
+                "status": status.HTTP_200_OK,
+                "results": data,
+                "count": paginator.count,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+            }
+        )
+        return Response(serializer.data)
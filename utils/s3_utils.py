@@ -1,8 +1,17 @@
-import logging
+import base64
 import datetime
+import functools
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
 from botocore.signers import CloudFrontSigner
 from botocore.exceptions import ClientError
 from cryptography.hazmat.backends import default_backend
@@ -35,31 +44,204 @@ def generate_presigned_url(s3_client, client_method, method_parameters, expires_
         raise
     return url
 
-def rsa_signer(message):
-    # Load the private key from the string in Django settings
-    private_key = serialization.load_pem_private_key(
+@functools.lru_cache(maxsize=1)
+def get_cloudfront_private_key():
+    """
+    Parses settings.AWS_CLOUDFRONT_KEY once per process.
+    """
+    return serialization.load_pem_private_key(
         settings.AWS_CLOUDFRONT_KEY,  # Directly use the key from settings
         password=None,  # No password is assumed; adjust if your key is password-protected
         backend=default_backend()
     )
-    # Sign the message
-    signature = private_key.sign(
+
+
+def rsa_signer(message):
+    # Sign the message with the cached private key
+    return get_cloudfront_private_key().sign(
         message,
         padding.PKCS1v15(),
         hashes.SHA1()
     )
-    # Return the base64-encoded signature
-    return signature
+
+
+# Batch signing: at most SIGNING_POOL_SIZE threads, one per SIGNING_BATCH_PER_WORKER URLs
+SIGNING_POOL_SIZE = min(os.cpu_count() or 1, 8)
+SIGNING_BATCH_PER_WORKER = 16
+
+SIGNED_URL_DELIVERY = "signed_url"
+SIGNED_COOKIE_DELIVERY = "signed_cookie"
+
+
+def cloudfront_b64encode(data):
+    # CloudFront's URL-safe base64 variant
+    return base64.b64encode(data).replace(b"+", b"-").replace(b"=", b"_").replace(b"/", b"~").decode("ascii")
+
+
+class CloudFrontURLSigner:
+    """
+    Process-wide CloudFront URL signer.
+
+    - The private key is parsed once and the CloudFrontSigner is reused.
+    - Expiry is rounded up to the end of a fixed window plus a grace period,
+      so every request for the same key inside a window gets the same URL and
+      it stays valid for at least `expires_in + grace` seconds (longer than any
+      cached response that embeds it). URLs are memoized in a local LRU and
+      shared between processes through the Django cache (redis).
+    - In signed-cookie delivery (settings.AWS_CLOUDFRONT_DELIVERY) URLs are
+      returned unsigned and access is granted by one cookie policy over the
+      whole media location (see signed_cookies()).
+    """
+    cache_prefix = "cf_signed_url"
+
+    def __init__(self, window=None, grace=None, lru_size=4096, delivery=None):
+        self.window = window or getattr(settings, "AWS_CLOUDFRONT_URL_WINDOW", 60 * 60)
+        self.grace = grace if grace is not None else getattr(settings, "AWS_CLOUDFRONT_URL_GRACE", 0)
+        self.delivery = delivery or getattr(settings, "AWS_CLOUDFRONT_DELIVERY", SIGNED_URL_DELIVERY)
+        if self.delivery not in (SIGNED_URL_DELIVERY, SIGNED_COOKIE_DELIVERY):
+            raise ValueError(f"Unknown AWS_CLOUDFRONT_DELIVERY: {self.delivery}")
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def uses_signed_cookies(self):
+        return self.delivery == SIGNED_COOKIE_DELIVERY
+
+    @functools.cached_property
+    def signer(self):
+        return CloudFrontSigner(str(settings.AWS_CLOUDFRONT_KEY_ID), rsa_signer)
+
+    def current_window_start(self):
+        return int(time.time() // self.window * self.window)
+
+    def expiry_for(self, expires_in):
+        """
+        Epoch at which a URL requested now with `expires_in` expires:
+        end of the window containing now + expires_in, plus the grace period.
+        """
+        deadline = time.time() + expires_in
+        return int(math.ceil(deadline / self.window) * self.window) + self.grace
+
+    def _memoized(self, lru_key, cache_key, expires_at, compute):
+        with self._lock:
+            value = self._lru.get(lru_key)
+            if value is not None:
+                self._lru.move_to_end(lru_key)
+                return value
+
+        value = cache.get(cache_key)
+        if value is None:
+            value = compute()
+            cache.set(cache_key, value, max(int(expires_at - time.time()), 1))
+
+        with self._lock:
+            self._lru[lru_key] = value
+            self._lru.move_to_end(lru_key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return value
+
+    def _cache_key(self, key, expires_at):
+        return f"{self.cache_prefix}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}:{expires_at}"
+
+    def _generate(self, key, expires_at):
+        return self.signer.generate_presigned_url(
+            f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}",
+            date_less_than=datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc),
+        )
+
+    def sign(self, key, expires_in=60):
+        if not key:
+            return None
+        if self.uses_signed_cookies:
+            return f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}"
+
+        expires_at = self.expiry_for(expires_in)
+        return self._memoized(
+            (key, expires_at), self._cache_key(key, expires_at), expires_at,
+            lambda: self._generate(key, expires_at),
+        )
+
+    def sign_many(self, keys, expires_in=60, max_workers=None):
+        """
+        Signs many keys in one pass: de-duplicates, resolves what it can from the
+        LRU and with a single redis MGET, and signs the rest (in a thread pool
+        when there are enough; OpenSSL releases the GIL while signing).
+        Returns {key: url}.
+        """
+        keys = {key for key in keys if key}
+        if self.uses_signed_cookies:
+            return {key: f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}" for key in keys}
+
+        expires_at = self.expiry_for(expires_in)
+        urls = {}
+        with self._lock:
+            for key in keys:
+                url = self._lru.get((key, expires_at))
+                if url is not None:
+                    urls[key] = url
+
+        missing = {self._cache_key(key, expires_at): key for key in keys - urls.keys()}
+        if missing:
+            for cache_key, url in cache.get_many(list(missing)).items():
+                urls[missing[cache_key]] = url
+
+        to_sign = [key for key in missing.values() if key not in urls]
+        if to_sign:
+            workers = max_workers or min(SIGNING_POOL_SIZE, len(to_sign) // SIGNING_BATCH_PER_WORKER)
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    signed = list(pool.map(lambda key: self._generate(key, expires_at), to_sign))
+            else:
+                signed = [self._generate(key, expires_at) for key in to_sign]
+            signed = dict(zip(to_sign, signed))
+            cache.set_many(
+                {self._cache_key(key, expires_at): url for key, url in signed.items()},
+                max(int(expires_at - time.time()), 1),
+            )
+            urls.update(signed)
+
+        with self._lock:
+            for key, url in urls.items():
+                self._lru[(key, expires_at)] = url
+                self._lru.move_to_end((key, expires_at))
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return urls
+
+    def signed_cookies(self, expires_in=60):
+        """
+        CloudFront-Policy / -Signature / -Key-Pair-Id for a custom policy over
+        every object under MEDIA_LOCATION. Returns (cookies, expires_at); the
+        policy is the same for everyone within a window, so it is signed once.
+        """
+        expires_at = self.expiry_for(expires_in)
+        resource = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{settings.MEDIA_LOCATION}/*"
+
+        def compute():
+            policy = self.signer.build_policy(
+                resource,
+                datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc),
+            ).encode("utf-8")
+            return {
+                "CloudFront-Policy": cloudfront_b64encode(policy),
+                "CloudFront-Signature": cloudfront_b64encode(rsa_signer(policy)),
+                "CloudFront-Key-Pair-Id": str(settings.AWS_CLOUDFRONT_KEY_ID),
+            }
+
+        cookies = self._memoized(
+            ("__cookies__", expires_at), f"{self.cache_prefix}:cookies:{expires_at}", expires_at, compute
+        )
+        return cookies, expires_at
+
+
+url_signer = CloudFrontURLSigner()
+
 
 def get_cloudfront_signed_url(key: str, expires_in=60):
     """
-    Generates a CloudFront signed URL for a given S3 key.
+    Generates a CloudFront signed URL for a given S3 key
+    (plain URL when media is delivered with signed cookies).
     """
-    if not key:
-        return None
-
-    url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}"
-    key_id = settings.AWS_CLOUDFRONT_KEY_ID
-    signer = CloudFrontSigner(key_id, rsa_signer)
-    expire_date = timezone.now() + datetime.timedelta(seconds=expires_in)
-    return signer.generate_presigned_url(url, date_less_than=expire_date)
\ No newline at end of file
+    return url_signer.sign(key, expires_in)